@@ -0,0 +1,54 @@
+"""Generators of synthetic ToC data, shared by the benchmark scripts."""
+
+from typing import Any, Dict, List
+
+
+def wide_toc(n_docs: int, *, fanout: int = 100) -> Dict[str, Any]:
+    """Create a ToC of ``n_docs`` documents, as a balanced tree with ``fanout``
+    entries per document.
+    """
+    root: Dict[str, Any] = {"root": "index"}
+    queue: List[Dict[str, Any]] = [root]
+    count = 1
+    while queue and count < n_docs:
+        parent = queue.pop(0)
+        entries = parent.setdefault("entries", [])
+        for _ in range(min(fanout, n_docs - count)):
+            child = {"file": f"doc{count}", "title": f"Document {count}"}
+            entries.append(child)
+            queue.append(child)
+            count += 1
+    return root
+
+
+def deep_toc(depth: int) -> Dict[str, Any]:
+    """Create a ToC nested ``depth`` levels deep, with one document per level."""
+    root: Dict[str, Any] = {"root": "index"}
+    parent = root
+    for level in range(1, depth):
+        child = {"file": f"level{level}"}
+        parent["entries"] = [child]
+        parent = child
+    return root
+
+
+def flat_toc(n_siblings: int) -> Dict[str, Any]:
+    """Create a ToC where the root has ``n_siblings`` direct children."""
+    return {
+        "root": "index",
+        "entries": [{"file": f"doc{i}"} for i in range(n_siblings)],
+    }
+
+
+def folder_toc(n_docs: int, *, per_folder: int = 100) -> Dict[str, Any]:
+    """Create a ToC where the root has ``n_docs`` children, stored in folders
+    of ``per_folder`` documents, grouped in parts of ``per_folder`` folders.
+    """
+    per_part = per_folder * per_folder
+    return {
+        "root": "index",
+        "entries": [
+            {"file": f"part{i // per_part}/folder{i // per_folder}/doc{i}"}
+            for i in range(n_docs)
+        ],
+    }
@@ -0,0 +1,91 @@
+"""Benchmark serializing a large site-map with ``SiteMap.as_json``
+and ``SiteMap.write_json``, against the previous ``dataclasses.asdict`` implementation.
+
+Run with ``python benchmarks/bench_as_json.py [n_docs]``.
+"""
+
+from dataclasses import asdict
+import io
+import json
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict
+
+from _synthetic import wide_toc
+
+from sphinx_external_toc.api import SiteMap
+from sphinx_external_toc.parsing import parse_toc_data
+
+
+def _previous_as_json(site_map: SiteMap) -> Dict[str, Any]:
+    """The implementation using ``dataclasses.asdict``."""
+    doc_dict = {k: asdict(site_map[k]) for k in sorted(site_map)}
+
+    def _replace_items(d: Dict[str, Any]) -> Dict[str, Any]:
+        for k, v in d.items():
+            if isinstance(v, dict):
+                d[k] = _replace_items(v)
+            elif isinstance(v, (list, tuple)):
+                d[k] = [
+                    (
+                        _replace_items(i)
+                        if isinstance(i, dict)
+                        else (str(i) if isinstance(i, str) else i)
+                    )
+                    for i in v
+                ]
+            elif isinstance(v, str):
+                d[k] = str(v)
+        return d
+
+    return {
+        "root": site_map.root.docname,
+        "documents": _replace_items(doc_dict),
+        "meta": site_map.meta,
+    }
+
+
+def _measure(func: Callable[[], Any]):
+    """Return the result, elapsed time and peak traced memory of a call."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main(n_docs: int = 100_000) -> None:
+    site_map = parse_toc_data(wide_toc(n_docs))
+
+    previous, previous_elapsed, previous_peak = _measure(
+        lambda: json.dumps(_previous_as_json(site_map))
+    )
+    current, current_elapsed, current_peak = _measure(
+        lambda: json.dumps(site_map.as_json())
+    )
+
+    def _write():
+        stream = io.StringIO()
+        site_map.write_json(stream)
+        return stream.getvalue()
+
+    streamed, streamed_elapsed, streamed_peak = _measure(_write)
+    assert json.loads(previous) == json.loads(current) == json.loads(streamed)
+
+    print(f"{n_docs} documents (time, peak traced memory):")
+    print(
+        f"  previous (asdict) + json.dumps: {previous_elapsed:.3f}s {previous_peak / 1e6:.0f}MB"
+    )
+    print(
+        f"  as_json + json.dumps:           {current_elapsed:.3f}s {current_peak / 1e6:.0f}MB"
+    )
+    print(
+        f"  write_json (includes output):   {streamed_elapsed:.3f}s {streamed_peak / 1e6:.0f}MB"
+    )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
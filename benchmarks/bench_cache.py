@@ -0,0 +1,38 @@
+"""Benchmark obtaining a site-map from an unchanged ToC file via the cache tiers.
+
+Run with ``python benchmarks/bench_cache.py [n_docs]``.
+"""
+
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+from _synthetic import wide_toc
+import yaml
+
+from sphinx_external_toc.cache import clear_memory_cache, parse_toc_cached
+from sphinx_external_toc.parsing import parse_toc_yaml
+
+
+def _timed(label: str, func) -> None:
+    start = time.perf_counter()
+    func()
+    print(f"{label:>14}: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+def main(n_docs: int = 40_000) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "_toc.yml"
+        path.write_text(yaml.safe_dump(wide_toc(n_docs), sort_keys=False))
+        cache_dir = Path(tmpdir) / "cache"
+        print(f"ToC file with {n_docs} documents")
+        _timed("no cache", lambda: parse_toc_yaml(path))
+        _timed("cache miss", lambda: parse_toc_cached(path, cache_dir=cache_dir))
+        clear_memory_cache()
+        _timed("on-disk hit", lambda: parse_toc_cached(path, cache_dir=cache_dir))
+        _timed("in-process hit", lambda: parse_toc_cached(path, cache_dir=cache_dir))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,44 @@
+"""Benchmark the memory and garbage-collected objects of a large parsed site-map,
+stored as a ``SiteMap`` or a ``ColumnarSiteMap``.
+
+Run with ``python benchmarks/bench_columnar.py [n_docs]``.
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+
+from _synthetic import wide_toc
+
+from sphinx_external_toc.api import SiteMap
+from sphinx_external_toc.columnar import ColumnarSiteMap
+from sphinx_external_toc.parsing import parse_toc_data
+
+
+def main(n_docs: int = 1_000_000) -> None:
+    print(f"{n_docs} documents:")
+    for site_map_class in (SiteMap, ColumnarSiteMap):
+        gc.collect()
+        objects = len(gc.get_objects())
+        tracemalloc.start()
+        start = time.perf_counter()
+        site_map = parse_toc_data(wide_toc(n_docs), site_map_class=site_map_class)
+        elapsed = time.perf_counter() - start
+        gc.collect()
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        objects = len(gc.get_objects()) - objects
+        start = time.perf_counter()
+        gc.collect()
+        gc_elapsed = time.perf_counter() - start
+        print(
+            f"  {site_map_class.__name__:>15}: parse {elapsed:.1f}s (traced), "
+            f"{size / n_docs:.0f} bytes/doc, {objects} GC-tracked objects, "
+            f"full collection {gc_elapsed:.3f}s"
+        )
+        del site_map
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,45 @@
+"""Benchmark the construction throughput of site-map objects,
+with and without field validation.
+
+Run with ``python benchmarks/bench_construct.py [n_docs]``.
+"""
+
+import sys
+import time
+
+from _synthetic import wide_toc
+
+from sphinx_external_toc._compat import trusted_construction
+from sphinx_external_toc.api import Document, FileItem, TocTree
+from sphinx_external_toc.parsing import parse_toc_data
+
+
+def construct(n_docs: int, fanout: int = 100) -> None:
+    for index in range(n_docs):
+        items = [FileItem(f"doc{index}_{child}") for child in range(fanout)]
+        Document(f"doc{index}", [TocTree(items)], title="Title")
+
+
+def main(n_docs: int = 10_000) -> None:
+    for label, trusted in (("validated", False), ("trusted", True)):
+        start = time.perf_counter()
+        if trusted:
+            with trusted_construction():
+                construct(n_docs)
+        else:
+            construct(n_docs)
+        elapsed = time.perf_counter() - start
+        print(
+            f"{label:>10}: {n_docs / elapsed:,.0f} documents/s "
+            f"(each with a toctree of 100 items)"
+        )
+
+    data = wide_toc(n_docs * 10)
+    start = time.perf_counter()
+    parse_toc_data(data)
+    elapsed = time.perf_counter() - start
+    print(f"parse_toc_data: {elapsed:.3f}s for {n_docs * 10} documents")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,121 @@
+"""Benchmark serializing a large site-map to a ToC dictionary,
+comparing ``create_toc_dict`` with the previous recursive implementation.
+
+Run with ``python benchmarks/bench_create_toc_dict.py [n_docs]``.
+"""
+
+from dataclasses import fields
+import sys
+import time
+from typing import Any, Dict, Optional, Set
+
+from _synthetic import wide_toc
+
+from sphinx_external_toc.api import (
+    Document,
+    FileItem,
+    GlobItem,
+    SiteMap,
+    TocTree,
+    UrlItem,
+)
+from sphinx_external_toc.parsing import (
+    FILE_FORMATS,
+    FILE_KEY,
+    GLOB_KEY,
+    ROOT_KEY,
+    TOCTREE_OPTIONS,
+    URL_KEY,
+    FileFormat,
+    create_toc_dict,
+    parse_toc_data,
+)
+
+
+def _previous_docitem_to_dict(
+    doc_item: Document,
+    site_map: SiteMap,
+    *,
+    depth: int,
+    file_format: FileFormat,
+    skip_defaults: bool = True,
+    is_root: bool = False,
+    parsed_docnames: Optional[Set[str]] = None,
+) -> Dict[str, Any]:
+    """The recursive implementation, before the iterative rewrite."""
+    file_key = ROOT_KEY if is_root else FILE_KEY
+    subtrees_key = file_format.get_subtrees_key(depth)
+    items_key = file_format.get_items_key(depth)
+    parsed_docnames = parsed_docnames or set()
+    if doc_item.docname in parsed_docnames:
+        raise RecursionError(f"{doc_item.docname!r} in site-map multiple times")
+    parsed_docnames.add(doc_item.docname)
+    data: Dict[str, Any] = {}
+    data[file_key] = doc_item.docname
+    if doc_item.title is not None:
+        data["title"] = doc_item.title
+    if not doc_item.subtrees:
+        return data
+
+    def _parse_item(item):
+        if isinstance(item, FileItem):
+            if item in site_map:
+                return _previous_docitem_to_dict(
+                    site_map[item],
+                    site_map,
+                    depth=depth + 1,
+                    file_format=file_format,
+                    skip_defaults=skip_defaults,
+                    parsed_docnames=parsed_docnames,
+                )
+            return {FILE_KEY: str(item)}
+        if isinstance(item, GlobItem):
+            return {GLOB_KEY: str(item)}
+        if isinstance(item, UrlItem):
+            if item.title is not None:
+                return {URL_KEY: item.url, "title": item.title}
+            return {URL_KEY: item.url}
+        raise TypeError(item)
+
+    data[subtrees_key] = []
+    _defaults = {f.name: f.default for f in fields(TocTree)}
+    for toctree in doc_item.subtrees:
+        toctree_data = {
+            key: getattr(toctree, key)
+            for key in TOCTREE_OPTIONS
+            if (not skip_defaults) or getattr(toctree, key) != _defaults[key]
+        }
+        toctree_data[items_key] = [_parse_item(s) for s in toctree.items]
+        data[subtrees_key].append(toctree_data)
+    if len(data[subtrees_key]) == 1 and items_key in data[subtrees_key][0]:
+        old_toctree_data = data.pop(subtrees_key)[0]
+        if len(old_toctree_data) > 1:
+            data["options"] = {
+                k: v for k, v in old_toctree_data.items() if k != items_key
+            }
+        data[items_key] = old_toctree_data[items_key]
+    return data
+
+
+def main(n_docs: int = 100_000, fanout: int = 10) -> None:
+    site_map = parse_toc_data(wide_toc(n_docs, fanout=fanout))
+    file_format = FILE_FORMATS["default"]
+
+    start = time.perf_counter()
+    previous = _previous_docitem_to_dict(
+        site_map.root, site_map, depth=0, file_format=file_format, is_root=True
+    )
+    previous_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    current = create_toc_dict(site_map)
+    current_elapsed = time.perf_counter() - start
+
+    assert current == previous
+    print(f"{n_docs} documents (fanout {fanout}):")
+    print(f"  previous (recursive): {previous_elapsed:.3f}s")
+    print(f"  create_toc_dict:      {current_elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,71 @@
+"""Benchmark pickling the Sphinx environment of a large book,
+which holds the site-map, as Sphinx does for ``environment.pickle``.
+
+Run with ``python benchmarks/bench_env_pickle.py [n_docs]``
+(building the environment of 20,000 documents takes several minutes).
+"""
+
+from pathlib import Path
+import pickle
+import sys
+import tempfile
+import time
+
+from _synthetic import wide_toc
+from sphinx.application import Sphinx
+import yaml
+
+
+def _timed(func, repeat: int = 5) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _report(label: str, obj) -> None:
+    data = pickle.dumps(obj, pickle.HIGHEST_PROTOCOL)
+    save = _timed(lambda: pickle.dumps(obj, pickle.HIGHEST_PROTOCOL))
+    load = _timed(lambda: pickle.loads(data))
+    print(
+        f"  {label:<8} {len(data) / 1e6:6.2f}MB, "
+        f"save {save * 1000:6.1f}ms, load {load * 1000:6.1f}ms"
+    )
+
+
+def main(n_docs: int = 20_000) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src_dir = Path(tmpdir) / "src"
+        src_dir.mkdir()
+        toc = wide_toc(n_docs)
+        src_dir.joinpath("_toc.yml").write_text(yaml.safe_dump(toc, sort_keys=False))
+        src_dir.joinpath("conf.py").write_text(
+            'extensions = ["sphinx_external_toc"]\nexternal_toc_path = "_toc.yml"\n'
+        )
+        src_dir.joinpath("index.rst").write_text("Index\n=====\n")
+        for index in range(1, n_docs):
+            title = f"Document {index}"
+            src_dir.joinpath(f"doc{index}.rst").write_text(
+                f"{title}\n{'=' * len(title)}\n"
+            )
+        app = Sphinx(
+            str(src_dir),
+            str(src_dir),
+            str(Path(tmpdir) / "out"),
+            str(Path(tmpdir) / "doctrees"),
+            "dummy",
+            status=None,
+            warningiserror=True,
+        )
+        start = time.perf_counter()
+        app.build()
+        print(f"{n_docs} documents (built in {time.perf_counter() - start:.1f}s):")
+        _report("env", app.env)
+        _report("config", app.config)
+        _report("site-map", app.env.external_site_map)
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
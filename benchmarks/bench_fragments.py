@@ -0,0 +1,56 @@
+"""Benchmark re-parsing a ToC split into include fragments, after editing one.
+
+The data loaded from each fragment is cached, so only the edited fragment is
+re-loaded, but the merged ToC data is still parsed (and validated) as a whole.
+
+Run with ``python benchmarks/bench_fragments.py [n_docs] [n_fragments]``.
+"""
+
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+from _synthetic import flat_toc
+import yaml
+
+from sphinx_external_toc.cache import parse_toc_cached
+from sphinx_external_toc.parsing import parse_toc_data, parse_toc_file
+
+
+def _timed(label: str, func) -> None:
+    start = time.perf_counter()
+    func()
+    print(f"{label:>22}: {(time.perf_counter() - start) * 1000:.1f}ms")
+
+
+def main(n_docs: int = 40_000, n_fragments: int = 40) -> None:
+    entries = flat_toc(n_docs)["entries"]
+    per_fragment = -(-len(entries) // n_fragments)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = Path(tmpdir)
+        includes = []
+        for index in range(n_fragments):
+            name = f"part{index}.yml"
+            chunk = entries[index * per_fragment : (index + 1) * per_fragment]
+            src.joinpath(name).write_text(yaml.safe_dump(chunk, sort_keys=False))
+            includes.append({"include": name})
+        path = src / "_toc.yml"
+        path.write_text(yaml.safe_dump({"root": "index", "entries": includes}))
+        cache_dir = src / "cache"
+        print(f"ToC of {n_docs} documents, in {n_fragments} fragments")
+        _timed("no cache", lambda: parse_toc_file(path, max_workers=1))
+        _timed("cache miss", lambda: parse_toc_cached(path, cache_dir=cache_dir))
+        src.joinpath("part0.yml").write_text(
+            yaml.safe_dump(entries[:per_fragment] + [{"file": "new"}])
+        )
+        _timed(
+            "one fragment edited", lambda: parse_toc_cached(path, cache_dir=cache_dir)
+        )
+        # the lower bound of re-parsing, with all fragment data already loaded
+        data = {"root": "index", "entries": entries}
+        _timed("parse_toc_data only", lambda: parse_toc_data(data))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,72 @@
+"""Benchmark deriving edited snapshots of a large site-map,
+with ``FrozenSiteMap.evolve`` against deep-copying a ``SiteMap``,
+and how the cost of a single-document edit scales with the number of documents
+(amortized O(sqrt(n))).
+
+Run with ``python benchmarks/bench_frozen.py [n_docs] [n_edits]``.
+"""
+
+import copy
+import sys
+import time
+import tracemalloc
+
+from _synthetic import wide_toc
+
+from sphinx_external_toc.api import Document, FrozenDocument, FrozenSiteMap
+from sphinx_external_toc.parsing import parse_toc_data
+
+
+def main(n_docs: int = 100_000, n_edits: int = 100) -> None:
+    site_map = parse_toc_data(wide_toc(n_docs))
+    docnames = [name for name in site_map if name != site_map.root.docname]
+    frozen = site_map.freeze()
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    copied = copy.deepcopy(site_map)
+    copied[docnames[0]] = Document(docnames[0], title="Edited")
+    copy_elapsed = time.perf_counter() - start
+    _, copy_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del copied
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    snapshots = [frozen]
+    for docname in docnames[:n_edits]:
+        snapshots.append(
+            snapshots[-1].evolve({docname: Document(docname, title="Edited")})
+        )
+    evolve_elapsed = time.perf_counter() - start
+    _, evolve_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    assert snapshots[-1][docnames[-1]] is frozen[docnames[-1]]
+
+    print(f"{n_docs} documents:")
+    print(
+        f"  deepcopy + 1 edit:           {copy_elapsed:.3f}s, {copy_peak / 1e6:.1f}MB"
+    )
+    print(
+        f"  {n_edits} snapshots of 1 edit each: {evolve_elapsed:.3f}s, "
+        f"{evolve_peak / 1e6:.1f}MB (all snapshots kept)"
+    )
+
+    print("  sequential single-document edits, by number of documents:")
+    for size in (n_docs // 100, n_docs // 10, n_docs):
+        snapshot = FrozenSiteMap(
+            {f"doc{i}": FrozenDocument(f"doc{i}") for i in range(size)}, "doc0"
+        )
+        edits = [FrozenDocument(f"doc{i % size}", title="Edited") for i in range(5000)]
+        start = time.perf_counter()
+        for doc in edits:
+            snapshot = snapshot.evolve({doc.docname: doc})
+        per_edit = (time.perf_counter() - start) / len(edits)
+        print(
+            f"    {size:>8}: {per_edit * 1e6:7.1f}us/edit, "
+            f"{per_edit * 1e9 / size**0.5:5.1f}ns/edit per sqrt(n)"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
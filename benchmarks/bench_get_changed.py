@@ -0,0 +1,61 @@
+"""Benchmark comparing large site-maps with ``SiteMap.get_changed``,
+as on a Sphinx rebuild, against the previous ``Document`` equality comparison.
+
+Run with ``python benchmarks/bench_get_changed.py [n_docs]``.
+"""
+
+import pickle
+import sys
+import time
+from typing import Set
+
+from _synthetic import wide_toc
+
+from sphinx_external_toc.api import Document, SiteMap
+from sphinx_external_toc.parsing import parse_toc_data
+
+
+def _previous_get_changed(site_map: SiteMap, previous: SiteMap) -> Set[str]:
+    """The implementation comparing every document for equality."""
+    changed_docs = set()
+    if site_map.root != previous.root:
+        changed_docs.add(site_map.root.docname)
+    for name, doc in site_map.items():
+        if name not in previous or previous[name] != doc:
+            changed_docs.add(name)
+    return changed_docs
+
+
+def main(n_docs: int = 100_000) -> None:
+    site_map = parse_toc_data(wide_toc(n_docs))
+    start = time.perf_counter()
+    site_map.content_hash()
+    hash_elapsed = time.perf_counter() - start
+    # as loaded from the cache and the environment pickle
+    current = pickle.loads(pickle.dumps(site_map))
+    previous = pickle.loads(pickle.dumps(site_map))
+
+    start = time.perf_counter()
+    assert _previous_get_changed(current, previous) == set()
+    previous_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    assert current.get_changed(previous) == set()
+    unchanged_elapsed = time.perf_counter() - start
+
+    # change the title of one document
+    docname = next(name for name in current if name != current.root.docname)
+    current[docname] = Document(docname, current[docname].subtrees, "changed")
+    start = time.perf_counter()
+    assert current.get_changed(previous) == {docname}
+    changed_elapsed = time.perf_counter() - start
+
+    print(f"{n_docs} documents:")
+    print(f"  computing hashes (once, when parsed): {hash_elapsed:.3f}s")
+    print(f"  previous (equality), unchanged:       {previous_elapsed:.3f}s")
+    print(f"  get_changed, unchanged:               {unchanged_elapsed:.6f}s")
+    print(f"  get_changed, one changed:             {changed_elapsed:.3f}s")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
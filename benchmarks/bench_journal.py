@@ -0,0 +1,48 @@
+"""Benchmark finding the changes to a large site-map after a few edits,
+with the journal of the mutation methods against ``SiteMap.diff``.
+
+Run with ``python benchmarks/bench_journal.py [n_docs] [n_edits]``.
+"""
+
+import pickle
+import sys
+import time
+
+from _synthetic import wide_toc
+
+from sphinx_external_toc.parsing import parse_toc_data
+
+
+def main(n_docs: int = 100_000, n_edits: int = 100) -> None:
+    site_map = parse_toc_data(wide_toc(n_docs))
+    previous = pickle.loads(pickle.dumps(site_map))
+    site_map.content_hash()
+    previous.content_hash()
+
+    # the parent index is built on first use
+    site_map.parent("doc1")
+    start = time.perf_counter()
+    for index in range(n_edits):
+        site_map.set_title(f"doc{index + 1}", f"Edited {index}")
+        site_map.insert_child(f"doc{index + 1}", f"new{index}")
+    edit_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    journal = site_map.clear_journal()
+    journal_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    changes = site_map.diff(previous)
+    diff_elapsed = time.perf_counter() - start
+    assert {(c.kind, c.docname) for c in changes} <= {
+        (c.kind, c.docname) for c in journal
+    }
+
+    print(f"{n_docs} documents, {n_edits} titles set and children inserted:")
+    print(f"  edits:   {edit_elapsed * 1000:8.2f}ms")
+    print(f"  journal: {journal_elapsed * 1000:8.2f}ms ({len(journal)} changes)")
+    print(f"  diff:    {diff_elapsed * 1000:8.2f}ms ({len(changes)} changes)")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
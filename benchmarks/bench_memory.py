@@ -0,0 +1,35 @@
+"""Benchmark the memory used by parsed site-maps, in bytes per document.
+
+Run with ``python benchmarks/bench_memory.py [n_docs ...]``.
+"""
+
+import gc
+import sys
+import tracemalloc
+
+from _synthetic import wide_toc
+
+from sphinx_external_toc.parsing import parse_toc_data
+
+
+def _site_map_size(n_docs: int) -> int:
+    """Return the memory retained by a parsed site-map,
+    once the loaded ToC data is released.
+    """
+    gc.collect()
+    tracemalloc.start()
+    site_map = parse_toc_data(wide_toc(n_docs))
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del site_map
+    return size
+
+
+def main(*n_docs: int) -> None:
+    for n in n_docs or (10_000, 100_000, 1_000_000):
+        print(f"{n:>9} documents: {_site_map_size(n) / n:.0f} bytes/doc")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,26 @@
+"""Benchmark parsing very deep and very wide synthetic ToCs.
+
+Run with ``python benchmarks/bench_parse.py [depth] [n_siblings]``.
+"""
+
+import sys
+import time
+
+from _synthetic import deep_toc, flat_toc
+
+from sphinx_external_toc.parsing import parse_toc_data
+
+
+def main(depth: int = 1_000, n_siblings: int = 100_000) -> None:
+    for label, data in (
+        (f"deep ({depth} levels)", deep_toc(depth)),
+        (f"wide ({n_siblings} siblings)", flat_toc(n_siblings)),
+    ):
+        start = time.perf_counter()
+        site_map = parse_toc_data(data)
+        elapsed = time.perf_counter() - start
+        print(f"{label:>26}: {elapsed:.3f}s for {len(site_map)} documents")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,60 @@
+"""Benchmark finding the documents of a large site-map by prefix and glob,
+with ``SiteMap.query`` against scanning all document names.
+
+Run with ``python benchmarks/bench_query.py [n_docs]``.
+"""
+
+from functools import partial
+from operator import methodcaller
+import sys
+import time
+
+from _synthetic import folder_toc
+from sphinx.util.matching import compile_matchers
+
+from sphinx_external_toc.parsing import parse_toc_data
+
+
+def _timed(func, repeat: int = 20) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def _scan(site_map, match) -> list:
+    return list(filter(match, site_map))
+
+
+def main(n_docs: int = 200_000) -> None:
+    site_map = parse_toc_data(folder_toc(n_docs))
+    start = time.perf_counter()
+    site_map.query(prefix="")
+    print(f"{n_docs} documents (trie built in {time.perf_counter() - start:.2f}s):")
+    for prefix, pattern in [
+        ("part1/folder150/", None),
+        ("part1/", None),
+        (None, "part1/folder150/*"),
+        (None, "part*/folder150/doc15*"),
+        (None, "**/doc15000"),
+    ]:
+        match = (
+            methodcaller("startswith", prefix)
+            if pattern is None
+            else compile_matchers([pattern])[0]
+        )
+        scan = partial(_scan, site_map, match)
+        query = partial(site_map.query, prefix=prefix, pattern=pattern)
+
+        count = len(query())
+        assert count == len(scan())
+        print(
+            f"  {prefix or pattern:<24} {count:>6} matches: "
+            f"scan {_timed(scan):7.2f}ms, query {_timed(query):7.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,73 @@
+"""Benchmark parsing a large site-map to a ``SqliteSiteMap`` database file,
+in one transaction against a transaction per document,
+and accessing its documents, with and without the cache.
+
+Run with ``python benchmarks/bench_sqlite.py [n_docs]``.
+"""
+
+from functools import partial
+from pathlib import Path
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from _synthetic import wide_toc
+
+from sphinx_external_toc.api import SiteMap
+from sphinx_external_toc.parsing import parse_toc_data
+from sphinx_external_toc.sqlite import SqliteSiteMap
+
+
+class _UnbatchedSqliteSiteMap(SqliteSiteMap):
+    """Commit each document separately, as without `SiteMap.bulk_update`."""
+
+    __slots__ = ()
+
+    bulk_update = SiteMap.bulk_update
+
+
+def _fill(site_map_class, path: Path, n_docs: int) -> float:
+    start = time.perf_counter()
+    parse_toc_data(
+        wide_toc(n_docs),
+        site_map_class=partial(site_map_class, path=path, overwrite=True),
+    )
+    return time.perf_counter() - start
+
+
+def main(n_docs: int = 200_000) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "toc.db"
+        n_unbatched = min(n_docs, 5_000)
+        unbatched = _fill(_UnbatchedSqliteSiteMap, path, n_unbatched)
+        print(
+            f"{n_unbatched} documents, a transaction per document: "
+            f"{unbatched * 1e6 / n_unbatched:.0f}us/doc"
+        )
+        elapsed = _fill(SqliteSiteMap, path, n_docs)
+        print(
+            f"{n_docs} documents, one transaction: {elapsed * 1e6 / n_docs:.0f}us/doc, "
+            f"file {path.stat().st_size / n_docs:.0f} bytes/doc"
+        )
+        site_map = SqliteSiteMap.open(path, cache_size=1000)
+        names = random.Random(0).choices(list(site_map), k=10_000)
+        hot = names[:500] * 20
+        for label, sample in [("random", names), ("cached", hot)]:
+            start = time.perf_counter()
+            for name in sample:
+                site_map[name]
+            elapsed = time.perf_counter() - start
+            print(f"  {label} access: {elapsed * 1e6 / len(sample):.1f}us/doc")
+        tracemalloc.start()
+        site_map = SqliteSiteMap.open(path, cache_size=1000)
+        for name in names[:1000]:
+            site_map[name]
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"  memory, opened with 1000 cached documents: {size / 1e6:.1f}MB")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -0,0 +1,42 @@
+"""Compare the peak memory and time of parsing a ToC file,
+with the standard and streaming parsers.
+
+Run with ``python benchmarks/bench_stream_memory.py [n_docs]``.
+"""
+
+import gc
+from pathlib import Path
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from _synthetic import wide_toc
+import yaml
+
+from sphinx_external_toc.parsing import parse_toc_yaml
+from sphinx_external_toc.streaming import parse_toc_stream
+
+
+def main(n_docs: int = 100_000) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "_toc.yml"
+        path.write_text(yaml.safe_dump(wide_toc(n_docs), sort_keys=False))
+        print(f"ToC file with {n_docs} documents")
+        for func in (parse_toc_yaml, parse_toc_stream):
+            gc.collect()
+            tracemalloc.start()
+            start = time.perf_counter()
+            site_map = func(path)
+            elapsed = time.perf_counter() - start
+            current, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            print(
+                f"{func.__name__:>16}: peak {peak / 1e6:.1f} MB, "
+                f"site-map {current / 1e6:.1f} MB, {elapsed:.2f}s"
+            )
+            del site_map
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
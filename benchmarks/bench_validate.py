@@ -0,0 +1,39 @@
+"""Benchmark the field validation of site-map objects,
+comparing the compiled validators with interpreting the field metadata.
+
+Run with ``python benchmarks/bench_validate.py [n_items]``.
+"""
+
+import sys
+import time
+
+from sphinx_external_toc import _compat
+from sphinx_external_toc.api import Document, FileItem, TocTree, UrlItem
+
+
+def construct(n_items: int) -> float:
+    items = [FileItem(f"item{index}") for index in range(10)]
+    start = time.perf_counter()
+    for index in range(n_items):
+        Document(f"doc{index}", [TocTree(items, caption="Caption")], title="Title")
+        UrlItem("https://example.com", "Example")
+    return time.perf_counter() - start
+
+
+def main(n_items: int = 100_000) -> None:
+    classes = (Document, TocTree, UrlItem)
+    for label, compiled in (("interpreted", False), ("compiled", True)):
+        _compat._COMPILED_VALIDATORS.clear()
+        if not compiled:
+            for cls in classes:
+                _compat._COMPILED_VALIDATORS[cls] = _compat._validate_fields_slow
+        elapsed = construct(n_items)
+        print(
+            f"{label:>12}: {elapsed:.3f}s for {n_items} "
+            "Document + TocTree (10 items) + UrlItem"
+        )
+    _compat._COMPILED_VALIDATORS.clear()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
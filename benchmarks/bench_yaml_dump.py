@@ -0,0 +1,47 @@
+"""Benchmark dumping a large site-map to YAML,
+comparing the pure-Python emitter with the libyaml C emitter.
+
+Run with ``python benchmarks/bench_yaml_dump.py [n_docs]``.
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+from _synthetic import wide_toc
+import yaml
+
+from sphinx_external_toc._compat import yaml_dump
+from sphinx_external_toc.parsing import parse_toc_data
+
+
+def main(n_docs: int = 50_000) -> None:
+    data = parse_toc_data(wide_toc(n_docs)).as_json()
+
+    start = time.perf_counter()
+    expected = yaml.dump(data, sort_keys=False, default_flow_style=False)
+    print(f"{'yaml.dump':>22}: {time.perf_counter() - start:.3f}s")
+
+    dumpers = [yaml.SafeDumper]
+    if hasattr(yaml, "CSafeDumper"):
+        dumpers.append(yaml.CSafeDumper)
+    for dumper in dumpers:
+        start = time.perf_counter()
+        content = yaml_dump(data, dumper=dumper)
+        print(f"{dumper.__name__:>22}: {time.perf_counter() - start:.3f}s")
+        assert content == expected
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "site_map.yml")
+            start = time.perf_counter()
+            with open(path, "w", encoding="utf8") as handle:
+                yaml_dump(data, handle, dumper=dumper)
+            elapsed = time.perf_counter() - start
+            print(f"{dumper.__name__ + ' (to file)':>22}: {elapsed:.3f}s")
+            with open(path, encoding="utf8") as handle:
+                assert handle.read() == expected
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
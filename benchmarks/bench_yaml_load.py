@@ -0,0 +1,37 @@
+"""Benchmark loading a large ToC file with the available YAML loaders.
+
+Run with ``python benchmarks/bench_yaml_load.py [n_docs]``.
+"""
+
+from pathlib import Path
+import sys
+import tempfile
+import time
+
+from _synthetic import wide_toc
+import yaml
+
+from sphinx_external_toc._compat import YamlSafeLoader, yaml_load
+from sphinx_external_toc.parsing import parse_toc_yaml
+
+
+def main(n_docs: int = 40_000) -> None:
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir) / "_toc.yml"
+        path.write_text(yaml.safe_dump(wide_toc(n_docs), sort_keys=False))
+        text = path.read_text()
+        print(f"ToC file with {n_docs} documents ({len(text) / 1e6:.1f} MB)")
+        print(f"default loader: {YamlSafeLoader.__name__}")
+        results = {}
+        for loader in {yaml.SafeLoader, YamlSafeLoader}:
+            start = time.perf_counter()
+            results[loader] = yaml_load(text, loader=loader)
+            print(f"{loader.__name__:>12}: {time.perf_counter() - start:.3f}s")
+        assert len({repr(data) for data in results.values()}) == 1
+        start = time.perf_counter()
+        parse_toc_yaml(path)
+        print(f"parse_toc_yaml: {time.perf_counter() - start:.3f}s")
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:]))
@@ -31,6 +31,7 @@ def setup(app: "Sphinx") -> dict:
     # variables
     app.add_config_value("external_toc_path", "_toc.yml", "env")
     app.add_config_value("external_toc_exclude_missing", False, "env")
+    app.add_config_value("external_toc_cache", True, "")
 
     # Register use_multitoc_numbering if not already registered (e.g., by JupyterBook)
     try:
@@ -2,12 +2,22 @@
 
 from __future__ import annotations
 
+from contextlib import contextmanager
+from contextvars import ContextVar
 import dataclasses as dc
+import json
+from operator import attrgetter
 import re
 import sys
-from typing import Any, Callable, Pattern, Type
+import time
+from types import ModuleType
+from typing import IO, Any, Callable, Iterator, Optional, Pattern, Type, Union
 
 from docutils.nodes import Element
+from sphinx.util import logging
+import yaml
+
+logger = logging.getLogger(__name__)
 
 if sys.version_info >= (3, 10):
     DC_SLOTS: dict = {"slots": True}
@@ -15,6 +25,49 @@ else:
     DC_SLOTS: dict = {}
 
 
+def add_slots(cls: type) -> type:
+    """Add ``__slots__`` to a dataclass, if it does not already have them
+    (i.e. before Python 3.10, where ``DC_SLOTS`` is empty),
+    so that instances do not have a ``__dict__``.
+
+    This should be applied after the ``dataclass`` decorator,
+    and recreates the class, as ``dataclass(slots=True)`` does.
+    Instances are pickled as a list of their field values.
+    """
+    if "__slots__" not in cls.__dict__:
+        field_names = tuple(f.name for f in dc.fields(cls))
+        cls_dict = dict(cls.__dict__)
+        cls_dict["__slots__"] = field_names
+        for name in field_names:
+            # remove the default values, which would conflict with the slots
+            cls_dict.pop(name, None)
+        cls_dict.pop("__dict__", None)
+        cls_dict.pop("__weakref__", None)
+        new_cls = type(cls)(cls.__name__, cls.__bases__, cls_dict)
+        new_cls.__qualname__ = cls.__qualname__
+        cls = new_cls
+    # the default pickling of slots is a dict of the slot names to values,
+    # and sets them with setattr, which is not allowed for frozen dataclasses
+    setattr(cls, "__getstate__", _fields_getstate)
+    setattr(cls, "__setstate__", _fields_setstate)
+    return cls
+
+
+def _fields_getstate(self):
+    # the slots are the field names, in order
+    return [getattr(self, name) for name in self.__slots__]
+
+
+def _fields_setstate(self, state):
+    if isinstance(state, tuple):
+        # the default state of slots, (None, {name: value}), of previous versions
+        for name, value in state[1].items():
+            object.__setattr__(self, name, value)
+        return
+    for name, value in zip(self.__slots__, state):
+        object.__setattr__(self, name, value)
+
+
 def field(**kwargs: Any):
     if sys.version_info < (3, 10):
         kwargs.pop("kw_only", None)
@@ -34,15 +87,205 @@ def validate_fields(inst):
 
     The validator function should take as input (inst, field, value) and
     raise an exception if the value is invalid.
+
+    The validators are compiled (see `compile_validators`)
+    the first time an instance of each class is validated.
     """
+    if _TRUSTED_CONSTRUCTION.get():
+        return
+    try:
+        validator = _COMPILED_VALIDATORS[type(inst)]
+    except KeyError:
+        validator = _COMPILED_VALIDATORS[type(inst)] = compile_validators(type(inst))
+    validator(inst)
+
+
+# dataclass -> compiled validation function
+_COMPILED_VALIDATORS: dict = {}
+
+
+def compile_validators(cls: type) -> Callable[[Any], None]:
+    """Compile the field validators of a dataclass into a single function.
+
+    Validators created by `instance_of`, `matches_re`, `optional` and
+    `deep_iterable` are composed into simple checks, and any other validators
+    are called directly. If a check fails, the original validators are run,
+    so that the same exception is raised as by the un-compiled validators.
+
+    :param cls: the dataclass
+    :return: a function taking an instance, and raising if it is invalid
+    """
+    # the type checks of all fields are run together, before any other checks
+    typed_names, typed_types = [], []
+    checks = []
+    for field in dc.fields(cls):
+        if "validator" not in field.metadata:
+            continue
+        validators = field.metadata["validator"]
+        if not isinstance(validators, list):
+            validators = [validators]
+        for validator in validators:
+            types = _checked_types(validator)
+            if types is not None:
+                typed_names.append(field.name)
+                typed_types.append(types)
+            else:
+                checks.append((field.name, _compile_validator(validator, field)))
+    get_typed = _tuple_getter(typed_names)
+    typed_types_tuple = tuple(typed_types)
+    checks_tuple = tuple(checks)
+
+    def validate(inst) -> None:
+        if all(map(isinstance, get_typed(inst), typed_types_tuple)):
+            for name, check in checks_tuple:
+                if not check(inst, getattr(inst, name)):
+                    break
+            else:
+                return
+        _validate_fields_slow(inst)
+
+    validate.__qualname__ = f"{cls.__qualname__}.<validate>"
+    return validate
+
+
+def _tuple_getter(names: list[str]) -> Callable[[Any], tuple]:
+    """Return a function getting the values of attributes as a tuple."""
+    if not names:
+        return lambda inst: ()
+    if len(names) == 1:
+        # attrgetter of a single name returns the value, not a tuple
+        getter = attrgetter(names[0])
+        return lambda inst: (getter(inst),)
+    return attrgetter(*names)
+
+
+def _compile_validator(
+    validator: ValidatorType, field: dc.Field
+) -> Callable[[Any, Any], Any]:
+    """Compile a single validator to a check of a value,
+    taking (inst, value) and returning a falsy value if the value is invalid.
+    """
+    spec = getattr(validator, "spec", None)
+    if spec is None:
+
+        def check_custom(inst, value):
+            validator(inst, field, value)
+            return True
+
+        return check_custom
+    if spec[0] == "instance_of":
+        types = spec[1]
+        return lambda inst, value: isinstance(value, types)
+    if spec[0] == "matches_re":
+        match = spec[1]
+        return lambda inst, value: match(value)
+    if spec[0] == "optional":
+        types = _checked_types(validator)
+        if types is not None:
+            return lambda inst, value: isinstance(value, types)
+        inner = _compile_validator(spec[1], field)
+        return lambda inst, value: value is None or inner(inst, value)
+    if spec[0] == "deep_iterable":
+        member_types = _checked_types(spec[1])
+        iterable_types = None if spec[2] is None else _checked_types(spec[2])
+        if member_types is not None and (spec[2] is None or iterable_types is not None):
+
+            def check_typed(inst, value):
+                if iterable_types is not None and not isinstance(value, iterable_types):
+                    return False
+                for member in value:
+                    if not isinstance(member, member_types):
+                        return False
+                return True
+
+            return check_typed
+        member_check = _compile_validator(spec[1], field)
+        iterable_check = None if spec[2] is None else _compile_validator(spec[2], field)
+
+        def check_iterable(inst, value):
+            if iterable_check is not None and not iterable_check(inst, value):
+                return False
+            for member in value:
+                if not member_check(inst, member):
+                    return False
+            return True
+
+        return check_iterable
+    raise ValueError(f"Unknown validator spec: {spec[0]!r}")
+
+
+def _checked_types(validator: ValidatorType) -> Optional[tuple]:
+    """Return the types checked by an `instance_of` validator
+    (or an `optional` one, including ``NoneType``), as a tuple,
+    or None for other validators.
+    """
+    spec = getattr(validator, "spec", None)
+    if spec is not None and spec[0] == "optional":
+        types = _checked_types(spec[1])
+        return None if types is None else types + (type(None),)
+    if spec is None or spec[0] != "instance_of":
+        return None
+    return spec[1] if isinstance(spec[1], tuple) else (spec[1],)
+
+
+def _validate_fields_slow(inst) -> None:
+    """Run the (un-compiled) validators of all fields of a dataclass instance."""
     for field in dc.fields(inst):
         if "validator" not in field.metadata:
             continue
-        if isinstance(field.metadata["validator"], list):
-            for validator in field.metadata["validator"]:
-                validator(inst, field, getattr(inst, field.name))
-        else:
-            field.metadata["validator"](inst, field, getattr(inst, field.name))
+        _run_validators(inst, field, getattr(inst, field.name))
+
+
+def validate_values(cls: type, **values: Any) -> None:
+    """Validate values for fields of a dataclass, without creating an instance.
+
+    The same exceptions are raised as when creating an instance with these values,
+    so this can be used to check values before creating instances
+    within `trusted_construction`.
+
+    :param cls: the dataclass
+    :param values: field name -> value
+    """
+    try:
+        fields = _VALIDATED_FIELDS[cls]
+    except KeyError:
+        fields = _VALIDATED_FIELDS[cls] = tuple(
+            field for field in dc.fields(cls) if "validator" in field.metadata
+        )
+    for field in fields:
+        if field.name in values:
+            _run_validators(None, field, values[field.name])
+
+
+# dataclass -> fields with validators
+_VALIDATED_FIELDS: dict = {}
+
+
+def _run_validators(inst, field: dc.Field, value: Any) -> None:
+    if isinstance(field.metadata["validator"], list):
+        for validator in field.metadata["validator"]:
+            validator(inst, field, value)
+    else:
+        field.metadata["validator"](inst, field, value)
+
+
+_TRUSTED_CONSTRUCTION: ContextVar[bool] = ContextVar(
+    "trusted_construction", default=False
+)
+
+
+@contextmanager
+def trusted_construction() -> Iterator[None]:
+    """Skip `validate_fields` for dataclasses created within this context.
+
+    This should only be used when the field values are already known to be valid,
+    e.g. they have been checked by the parser, or were loaded from a trusted cache.
+    """
+    token = _TRUSTED_CONSTRUCTION.set(True)
+    try:
+        yield
+    finally:
+        _TRUSTED_CONSTRUCTION.reset(token)
 
 
 ValidatorType = Callable[[Any, dc.Field, Any], None]
@@ -66,6 +309,7 @@ def instance_of(type: Type[Any] | tuple[Type[Any], ...]) -> ValidatorType:
                 f"'{attr.name}' must be {type!r} (got {value!r} that is a {value.__class__!r})."
             )
 
+    _validator.spec = ("instance_of", type)  # type: ignore[attr-defined]
     return _validator
 
 
@@ -102,6 +346,7 @@ def matches_re(regex: str | Pattern, flags: int = 0) -> ValidatorType:
                 f"'{attr.name}' must match regex {pattern!r} ({value!r} doesn't)"
             )
 
+    _validator.spec = ("matches_re", match_func)  # type: ignore[attr-defined]
     return _validator
 
 
@@ -118,6 +363,7 @@ def optional(validator: ValidatorType) -> ValidatorType:
 
         validator(inst, attr, value)
 
+    _validator.spec = ("optional", validator)  # type: ignore[attr-defined]
     return _validator
 
 
@@ -139,9 +385,179 @@ def deep_iterable(
         for member in value:
             member_validator(inst, attr, member)
 
+    _validator.spec = (  # type: ignore[attr-defined]
+        "deep_iterable",
+        member_validator,
+        iterable_validator,
+    )
     return _validator
 
 
+# PyYAML compatibility
+
+#: The fastest available safe YAML loader,
+#: i.e. the libyaml C loader if PyYAML was built with it.
+YamlSafeLoader: type = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
+def yaml_load(stream: Union[str, bytes, IO], *, loader: type = YamlSafeLoader) -> Any:
+    """Load YAML data, using the fastest available safe loader.
+
+    The output is identical to ``yaml.safe_load``.
+
+    :param stream: YAML text or file handle
+    :param loader: the loader class to use
+    :return: loaded data
+    """
+    start = time.perf_counter()
+    data = yaml.load(stream, Loader=loader)
+    logger.debug(
+        "[etoc] YAML loaded by %s in %.3f seconds",
+        loader.__name__,
+        time.perf_counter() - start,
+    )
+    return data
+
+
+#: The fastest available safe YAML dumper,
+#: i.e. the libyaml C emitter if PyYAML was built with it.
+YamlSafeDumper: type = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# libyaml dumper class -> the pure-Python dumper class with the same output,
+# except for scalars that are escaped (see `_yaml_printable_ascii`)
+_YAML_PYTHON_DUMPERS: dict = {
+    getattr(yaml, name): getattr(yaml, name[1:])
+    for name in ("CSafeDumper", "CDumper")
+    if hasattr(yaml, name)
+}
+# dumper class -> subclass representing ``str`` subclasses as plain strings
+_YAML_DUMPERS: dict = {}
+
+
+def yaml_dump(
+    data: Any, stream: Optional[IO[str]] = None, *, dumper: type = YamlSafeDumper
+) -> Optional[str]:
+    """Dump data to YAML, using the fastest available safe dumper.
+
+    For the data types of a ToC, the output is identical to
+    ``yaml.dump(data, sort_keys=False, default_flow_style=False)``.
+    The libyaml emitter folds long double-quoted scalars without ``\\`` escapes,
+    so it is only used if all strings are printable ASCII (and need no escapes),
+    otherwise the equivalent pure-Python dumper is used.
+
+    :param data: the data to dump
+    :param stream: a text stream to write to, as the data is emitted
+        (or None to return a string)
+    :param dumper: the dumper class to use
+    :return: the YAML text, if no stream is given
+    """
+    if dumper in _YAML_PYTHON_DUMPERS and not _yaml_printable_ascii(data):
+        dumper = _YAML_PYTHON_DUMPERS[dumper]
+    try:
+        dumper_cls = _YAML_DUMPERS[dumper]
+    except KeyError:
+        dumper_cls = _YAML_DUMPERS[dumper] = type(
+            dumper.__name__, (dumper,), {"__module__": __name__}
+        )
+        # e.g. for FileItem
+        yaml.add_multi_representer(str, _represent_str, Dumper=dumper_cls)
+    return yaml.dump(
+        data, stream, Dumper=dumper_cls, sort_keys=False, default_flow_style=False
+    )
+
+
+def _represent_str(representer: Any, data: str) -> Any:
+    """Represent a ``str`` subclass as a plain string."""
+    return representer.represent_str(str(data))
+
+
+def _yaml_printable_ascii(data: Any) -> bool:
+    """Check all strings (and keys) in the data are printable ASCII."""
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        if isinstance(value, str):
+            if not (value.isascii() and value.isprintable()):
+                return False
+        elif isinstance(value, dict):
+            stack.extend(value)
+            stack.extend(value.values())
+        elif isinstance(value, (list, tuple)):
+            stack.extend(value)
+    return True
+
+
+# JSON and TOML compatibility
+
+orjson: Optional[ModuleType]
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+if sys.version_info >= (3, 11):
+    import tomllib
+else:  # pragma: no cover
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+
+def json_load(content: Union[str, bytes]) -> Any:
+    """Load JSON data, using ``orjson`` if it is installed.
+
+    :param content: JSON text (bytes must be UTF-8 encoded)
+    :return: loaded data
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+def json_dumps(data: Any) -> str:
+    """Dump data as compact JSON, using ``orjson`` if it is installed.
+
+    :param data: data of JSON types
+    :return: JSON text
+    """
+    if orjson is not None:
+        return orjson.dumps(data).decode("utf8")
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+
+def toml_load(content: str) -> Any:
+    """Load TOML data, using ``tomllib`` (or ``tomli`` before Python 3.11).
+
+    :param content: TOML text
+    :return: loaded data
+    """
+    if tomllib is None:  # pragma: no cover
+        raise ImportError("loading TOML requires Python >= 3.11, or tomli installed")
+    return tomllib.loads(content)
+
+
+def load_toc_content(content: bytes, suffix: str, encoding: str = "utf8") -> Any:
+    """Load the data of a ToC file, with the loader for its file suffix.
+
+    ``.json`` files are loaded as JSON, ``.toml`` files as TOML,
+    and all other files as YAML.
+
+    :param content: the file content
+    :param suffix: the file suffix, e.g. ``.yml``
+    :param encoding: the file character encoding
+    :return: loaded data
+    """
+    suffix = suffix.lower()
+    if suffix == ".json":
+        if encoding.lower().replace("-", "") in ("utf8", "utf_8"):
+            return json_load(content)
+        return json_load(content.decode(encoding))
+    if suffix == ".toml":
+        return toml_load(content.decode(encoding))
+    return yaml_load(content.decode(encoding))
+
+
 # Docutils compatibility
 
 
@@ -1,22 +1,48 @@
 """Defines the `SiteMap` object, for storing the parsed ToC."""
 
-from collections.abc import MutableMapping
-from dataclasses import asdict, dataclass
-from typing import Any, Dict, Iterator, List, Optional, Set, Union
+from collections import deque
+from collections.abc import Mapping, MutableMapping
+from contextlib import nullcontext
+from dataclasses import dataclass, fields, replace
+from enum import Enum
+import hashlib
+from itertools import chain
+from types import MappingProxyType
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    TextIO,
+    Tuple,
+    Union,
+)
+
+from sphinx.util.matching import compile_matchers
 
 from ._compat import (
     DC_SLOTS,
+    add_slots,
     deep_iterable,
     field,
     instance_of,
+    json_dumps,
     matches_re,
     optional,
+    trusted_construction,  # noqa: F401 (re-exported)
     validate_fields,
     validate_style,
 )
 
 #: Pattern used to match URL items.
 URL_PATTERN: str = r".+://.*"
+#: Size, in bytes, of the content hashes of toctrees, documents and site-maps.
+HASH_SIZE: int = 16
 
 
 class FileItem(str):
@@ -31,6 +57,7 @@ class GlobItem(str):
     """A document glob in a toctree list."""
 
 
+@add_slots
 @dataclass(**DC_SLOTS)
 class UrlItem:
     """A URL in a toctree."""
@@ -43,15 +70,42 @@ class UrlItem:
         validate_fields(self)
 
 
+def _validate_unique_files(instance, attribute, value):
+    """Validate the file items of a toctree are unique."""
+    files = [item for item in value if isinstance(item, FileItem)]
+    if len(set(files)) != len(files):
+        duplicates = sorted({item for item in files if files.count(item) > 1})
+        raise ValueError(f"{attribute.name} contains duplicate files: {duplicates}")
+
+
+def _validate_unique_children(instance, attribute, value):
+    """Validate the file items are unique across the toctrees of a document,
+    and none is the document itself.
+    """
+    files = [
+        item for tree in value for item in tree.items if isinstance(item, FileItem)
+    ]
+    if instance.docname in files:
+        raise ValueError(
+            f"{attribute.name} contains the document itself: {instance.docname!r}"
+        )
+    if len(set(files)) != len(files):
+        duplicates = sorted({item for item in files if files.count(item) > 1})
+        raise ValueError(f"{attribute.name} contains duplicate files: {duplicates}")
+
+
+@add_slots
 @dataclass(**DC_SLOTS)
 class TocTree:
     """An individual toctree within a document."""
 
-    # TODO validate uniqueness of docnames (at least one item)
     items: List[Union[GlobItem, FileItem, UrlItem]] = field(
-        validator=deep_iterable(
-            instance_of((GlobItem, FileItem, UrlItem)), instance_of(list)
-        )
+        validator=[
+            deep_iterable(
+                instance_of((GlobItem, FileItem, UrlItem)), instance_of(list)
+            ),
+            _validate_unique_files,
+        ]
     )
     caption: Optional[str] = field(
         default=None, kw_only=True, validator=optional(instance_of(str))
@@ -83,6 +137,30 @@ class TocTree:
         """
         return [str(item) for item in self.items if isinstance(item, FileItem)]
 
+    def content_hash(self) -> bytes:
+        """Return a stable hash of the toctree options and items.
+
+        :return: hash digest
+        """
+        items = [
+            ("url", item.url, item.title)
+            if isinstance(item, UrlItem)
+            else ("glob" if isinstance(item, GlobItem) else "file", str(item))
+            for item in self.items
+        ]
+        key = (
+            items,
+            self.caption,
+            self.hidden,
+            self.maxdepth,
+            self.numbered,
+            self.reversed,
+            self.titlesonly,
+            self.style,
+            self.restart_numbering,
+        )
+        return hashlib.blake2b(repr(key).encode(), digest_size=HASH_SIZE).digest()
+
     def globs(self) -> List[str]:
         """Returns a list of glob items included in this ToC tree.
 
@@ -91,21 +169,173 @@ class TocTree:
         return [str(item) for item in self.items if isinstance(item, GlobItem)]
 
 
+@add_slots
 @dataclass(**DC_SLOTS)
 class Document:
     """A document in the site map."""
 
-    # TODO validate uniqueness of docnames across all parts (and none should be the docname)
     docname: str = field(validator=instance_of(str))
     subtrees: List[TocTree] = field(
         default_factory=list,
-        validator=deep_iterable(instance_of(TocTree), instance_of(list)),
+        validator=[
+            deep_iterable(instance_of(TocTree), instance_of(list)),
+            _validate_unique_children,
+        ],
     )
     title: Optional[str] = field(default=None, validator=optional(instance_of(str)))
 
     def __post_init__(self):
         validate_fields(self)
 
+    def content_hash(self) -> bytes:
+        """Return a stable hash of the document name, title and toctrees.
+
+        :return: hash digest
+        """
+        hasher = hashlib.blake2b(
+            repr((self.docname, self.title)).encode(), digest_size=HASH_SIZE
+        )
+        for tree in self.subtrees:
+            hasher.update(tree.content_hash())
+        return hasher.digest()
+
+    def child_files(self) -> List[str]:
+        """Return all children files.
+
+        :return: child files
+        """
+        return [name for tree in self.subtrees for name in tree.files()]
+
+    def child_globs(self) -> List[str]:
+        """Return all children globs.
+
+        :return: child globs
+        """
+        return [name for tree in self.subtrees for name in tree.globs()]
+
+
+@add_slots
+@dataclass(frozen=True, **DC_SLOTS)
+class FrozenUrlItem:
+    """An immutable `UrlItem`."""
+
+    url: str
+    title: Optional[str] = None
+
+
+@add_slots
+@dataclass(frozen=True, **DC_SLOTS)
+class FrozenTocTree:
+    """An immutable `TocTree`, created with `FrozenTocTree.from_toctree`."""
+
+    items: Tuple[Union[GlobItem, FileItem, FrozenUrlItem], ...]
+    caption: Optional[str] = None
+    hidden: bool = True
+    maxdepth: int = -1
+    numbered: Union[bool, int] = False
+    reversed: bool = False
+    titlesonly: bool = False
+    style: Union[Tuple[str, ...], str] = "numerical"
+    restart_numbering: Optional[bool] = None
+
+    @classmethod
+    def from_toctree(cls, tree: TocTree) -> "FrozenTocTree":
+        """Create from a (validated) toctree.
+
+        :param tree: toctree
+        :return: immutable toctree
+        """
+        return cls(
+            tuple(
+                FrozenUrlItem(item.url, item.title)
+                if isinstance(item, UrlItem)
+                else item
+                for item in tree.items
+            ),
+            caption=tree.caption,
+            hidden=tree.hidden,
+            maxdepth=tree.maxdepth,
+            numbered=tree.numbered,
+            reversed=tree.reversed,
+            titlesonly=tree.titlesonly,
+            style=tuple(tree.style) if isinstance(tree.style, list) else tree.style,
+            restart_numbering=tree.restart_numbering,
+        )
+
+    def to_toctree(self) -> TocTree:
+        """Return a (mutable) copy of the toctree.
+
+        :return: toctree
+        """
+        with trusted_construction():
+            return TocTree(
+                [
+                    UrlItem(item.url, item.title)
+                    if isinstance(item, FrozenUrlItem)
+                    else item
+                    for item in self.items
+                ],
+                caption=self.caption,
+                hidden=self.hidden,
+                maxdepth=self.maxdepth,
+                numbered=self.numbered,
+                reversed=self.reversed,
+                titlesonly=self.titlesonly,
+                style=list(self.style) if isinstance(self.style, tuple) else self.style,
+                restart_numbering=self.restart_numbering,
+            )
+
+    def files(self) -> List[str]:
+        """Returns a list of file items included in this ToC tree.
+
+        :return: file items
+        """
+        return [str(item) for item in self.items if isinstance(item, FileItem)]
+
+    def globs(self) -> List[str]:
+        """Returns a list of glob items included in this ToC tree.
+
+        :return: glob items
+        """
+        return [str(item) for item in self.items if isinstance(item, GlobItem)]
+
+
+@add_slots
+@dataclass(frozen=True, **DC_SLOTS)
+class FrozenDocument:
+    """An immutable `Document`, created with `FrozenDocument.from_document`,
+    which can be shared between `FrozenSiteMap` snapshots.
+    """
+
+    docname: str
+    subtrees: Tuple[FrozenTocTree, ...] = ()
+    title: Optional[str] = None
+
+    @classmethod
+    def from_document(cls, doc: Document) -> "FrozenDocument":
+        """Create from a (validated) document.
+
+        :param doc: document
+        :return: immutable document
+        """
+        return cls(
+            doc.docname,
+            tuple(FrozenTocTree.from_toctree(tree) for tree in doc.subtrees),
+            doc.title,
+        )
+
+    def to_document(self) -> Document:
+        """Return a (mutable) copy of the document.
+
+        :return: document
+        """
+        with trusted_construction():
+            return Document(
+                self.docname,
+                [tree.to_toctree() for tree in self.subtrees],
+                self.title,
+            )
+
     def child_files(self) -> List[str]:
         """Return all children files.
 
@@ -121,21 +351,370 @@ class Document:
         return [name for tree in self.subtrees for name in tree.globs()]
 
 
+def _frozen_identical(doc1: FrozenDocument, doc2: FrozenDocument) -> bool:
+    """Return whether two documents are equal,
+    also with the same type of items (e.g. `FileItem` or `GlobItem`) and options.
+    """
+    return doc1 == doc2 and all(
+        type(tree1.numbered) is type(tree2.numbered)
+        and all(
+            type(item1) is type(item2) for item1, item2 in zip(tree1.items, tree2.items)
+        )
+        for tree1, tree2 in zip(doc1.subtrees, doc2.subtrees)
+    )
+
+
+#: Names of the `TocTree` options, i.e. all fields except the items.
+TOCTREE_OPTION_NAMES: Tuple[str, ...] = tuple(
+    f.name for f in fields(TocTree) if f.name != "items"
+)
+
+
+class ChangeKind(str, Enum):
+    """The kind of change to a document, between two site-maps."""
+
+    #: The document was added.
+    ADDED = "added"
+    #: The document was removed.
+    REMOVED = "removed"
+    #: The title of the document changed.
+    TITLE = "title"
+    #: The options of the document's toctrees changed.
+    OPTIONS = "options"
+    #: The items of the document's toctrees were added, removed or reordered.
+    CHILDREN = "children"
+    #: The position of the document in its parent's toctrees changed.
+    MOVED = "moved"
+
+
+@add_slots
+@dataclass(frozen=True, **DC_SLOTS)
+class DocChange:
+    """A change to a document, between two site-maps."""
+
+    kind: ChangeKind
+    docname: str
+    #: The previous value: the title, a list of the options or items of each
+    #: toctree, the position, or the document (None for added documents).
+    old: Any = None
+    #: The new value, as for `old` (None for removed documents).
+    new: Any = None
+
+
+def _toctree_options(doc: Document) -> List[Dict[str, Any]]:
+    """Return the options of each toctree of a document."""
+    return [
+        {name: getattr(tree, name) for name in TOCTREE_OPTION_NAMES}
+        for tree in doc.subtrees
+    ]
+
+
+def _toctree_items(doc: Document) -> List[List[Union[GlobItem, FileItem, UrlItem]]]:
+    """Return the items of each toctree of a document."""
+    return [list(tree.items) for tree in doc.subtrees]
+
+
+def _doc_as_json(doc: Document) -> Dict[str, Any]:
+    """Return the JSON serialized representation of a document,
+    of only plain JSON types (e.g. `FileItem` as `str`).
+    """
+    return {
+        "docname": str(doc.docname),
+        "subtrees": [
+            {
+                "items": [
+                    {"url": str(item.url), "title": item.title}
+                    if isinstance(item, UrlItem)
+                    else str(item)
+                    for item in tree.items
+                ],
+                "caption": tree.caption,
+                "hidden": tree.hidden,
+                "maxdepth": tree.maxdepth,
+                "numbered": tree.numbered,
+                "reversed": tree.reversed,
+                "titlesonly": tree.titlesonly,
+                "style": list(tree.style)
+                if isinstance(tree.style, list)
+                else tree.style,
+                "restart_numbering": tree.restart_numbering,
+            }
+            for tree in doc.subtrees
+        ],
+        "title": doc.title,
+    }
+
+
+_TOCTREE_DEFAULTS: Tuple[Any, ...] = tuple(
+    f.default for f in fields(TocTree) if f.name != "items"
+)
+
+
+# a packed toctree item: a file name, a glob 1-tuple, or a URL and title 2-tuple
+_PackedItem = Union[str, Tuple[str], Tuple[str, Optional[str]]]
+# a packed toctree: (items, options), where the options are None if all defaults
+_PackedTocTree = Tuple[Tuple[_PackedItem, ...], Optional[Tuple[Any, ...]]]
+# a packed document: (docname, title, *toctrees)
+_PackedDocument = Tuple[Any, ...]
+
+
+def _pack_documents(docs: Iterable[Document]) -> Tuple[_PackedDocument, ...]:
+    """Pack documents as nested tuples of built-in types, for compact pickling.
+
+    Each document is packed as ``(docname, title, *toctrees)``,
+    and each toctree as ``(items, options)``, where the options are ``None``
+    if they are all the defaults.
+    File items are packed as strings, glob items as 1-tuples
+    and URL items as 2-tuples.
+    Equal names and options are packed as the same object,
+    so that they are only pickled once.
+    """
+    names: Dict[str, str] = {}
+    all_options: Dict[Tuple[Any, ...], Tuple[Any, ...]] = {}
+    packed: List[_PackedDocument] = []
+    for doc in docs:
+        docname = names.get(doc.docname)
+        if docname is None:
+            docname = names[doc.docname] = str(doc.docname)
+        trees: List[_PackedTocTree] = []
+        for tree in doc.subtrees:
+            items: List[_PackedItem] = []
+            for item in tree.items:
+                if isinstance(item, FileItem):
+                    name = names.get(item)
+                    if name is None:
+                        name = names[item] = str(item)
+                    items.append(name)
+                elif isinstance(item, GlobItem):
+                    items.append((str(item),))
+                else:
+                    items.append((item.url, item.title))
+            values = tuple(
+                tuple(value) if isinstance(value, list) else value
+                for value in (getattr(tree, name) for name in TOCTREE_OPTION_NAMES)
+            )
+            options = (
+                None
+                if values == _TOCTREE_DEFAULTS
+                else all_options.setdefault(values, values)
+            )
+            trees.append((tuple(items), options))
+        packed.append((docname, doc.title, *trees))
+    return tuple(packed)
+
+
+def _unpack_documents(packed: Tuple[_PackedDocument, ...]) -> Dict[str, Document]:
+    """Unpack documents packed by `_pack_documents`.
+
+    Each document name is a single `str` object,
+    used as both the `Document.docname` and the key.
+    """
+    docs: Dict[str, Document] = {}
+    with trusted_construction():
+        for doc_data in packed:
+            subtrees = []
+            for packed_items, options in doc_data[2:]:
+                items: List[Union[GlobItem, FileItem, UrlItem]] = []
+                for item in packed_items:
+                    if isinstance(item, str):
+                        items.append(FileItem(item))
+                    elif len(item) == 1:
+                        items.append(GlobItem(item[0]))
+                    else:
+                        items.append(UrlItem(*item))
+                if options is None:
+                    subtrees.append(TocTree(items))
+                else:
+                    subtrees.append(
+                        TocTree(
+                            items,
+                            **{
+                                name: list(value) if isinstance(value, tuple) else value
+                                for name, value in zip(TOCTREE_OPTION_NAMES, options)
+                            },
+                        )
+                    )
+            docs[doc_data[0]] = Document(doc_data[0], subtrees, doc_data[1])
+    return docs
+
+
+def _copy_document(doc: Document) -> Document:
+    """Return a copy of a document, with copies of its toctrees and URL items."""
+    with trusted_construction():
+        return replace(
+            doc,
+            subtrees=[
+                replace(
+                    tree,
+                    items=[
+                        replace(item) if isinstance(item, UrlItem) else item
+                        for item in tree.items
+                    ],
+                    style=list(tree.style)
+                    if isinstance(tree.style, list)
+                    else tree.style,
+                )
+                for tree in doc.subtrees
+            ],
+        )
+
+
+# a node of a path-segment trie: path segment -> child node,
+# and None -> document name, for the node at the end of a document name
+TrieNode = Dict[Optional[str], Any]
+
+
+def _trie_add(trie: TrieNode, docname: str) -> None:
+    """Add a document name to a path-segment trie."""
+    node = trie
+    for segment in docname.split("/"):
+        node = node.setdefault(segment, {})
+    node[None] = docname
+
+
+def _trie_discard(trie: TrieNode, docname: str) -> None:
+    """Remove a document name from a path-segment trie, pruning empty nodes."""
+    segments = docname.split("/")
+    path = [trie]
+    for segment in segments:
+        node = path[-1].get(segment)
+        if node is None:
+            return
+        path.append(node)
+    path[-1].pop(None, None)
+    for index in range(len(segments) - 1, -1, -1):
+        if path[index + 1]:
+            break
+        del path[index][segments[index]]
+
+
+def _trie_names(node: TrieNode) -> Iterator[str]:
+    """Yield the document names at and below a node of a path-segment trie."""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        for segment, child in node.items():
+            if segment is None:
+                yield child
+            else:
+                stack.append(child)
+
+
+def _trie_prefix(trie: TrieNode, prefix: str) -> Iterator[str]:
+    """Yield the document names in a path-segment trie that start with a prefix."""
+    *folders, start = prefix.split("/")
+    node = trie
+    for folder in folders:
+        folder_node: Optional[TrieNode] = node.get(folder)
+        if folder_node is None:
+            return
+        node = folder_node
+    for segment, child in node.items():
+        if segment is not None and segment.startswith(start):
+            yield from _trie_names(child)
+
+
+def _trie_glob(
+    node: TrieNode, steps: List[Tuple[str, Any]], index: int
+) -> Iterator[str]:
+    """Yield the document names in a path-segment trie that match a glob,
+    split into steps by `SiteMap.query`.
+    """
+    if index == len(steps):
+        if None in node:
+            yield node[None]
+        return
+    kind, value = steps[index]
+    if kind == "literal":
+        child = node.get(value)
+        if child is not None:
+            yield from _trie_glob(child, steps, index + 1)
+    elif kind == "segment":
+        for segment, child in node.items():
+            if segment is not None and value(segment):
+                yield from _trie_glob(child, steps, index + 1)
+    else:
+        # the rest of the pattern may match across segments
+        yield from filter(value, _trie_names(node))
+
+
 class SiteMap(MutableMapping):
     """A mapping of documents to their toctrees (or None if terminal)."""
 
+    __slots__ = (
+        "_docs",
+        "_fragments",
+        "_doc_fragments",
+        "_fragment_docs",
+        "_parents",
+        "_shared_refs",
+        "_glob_matchers",
+        "_source_suffixes",
+        "_suffix_index",
+        "_toc_positions",
+        "_path_trie",
+        "_journal",
+        "_doc_hashes",
+        "_map_hash",
+        "_root",
+        "_meta",
+        "_file_format",
+    )
+    # attributes built on demand, which are not pickled
+    _INDEX_ATTRIBUTES = (
+        "_parents",
+        "_shared_refs",
+        "_glob_matchers",
+        "_suffix_index",
+        "_toc_positions",
+        "_path_trie",
+    )
+
     def __init__(
         self,
         root: Document,
         meta: Optional[Dict[str, Any]] = None,
         file_format: Optional[str] = None,
     ) -> None:
-        self._docs: Dict[str, Document] = {}
-        self[root.docname] = root
+        self._docs: MutableMapping[str, Document] = self._create_docs()
+        # fragment path -> (content key, structural key)
+        self._fragments: Dict[str, Tuple[str, str]] = {}
+        # docname -> fragment path
+        self._doc_fragments: Dict[str, str] = {}
+        # fragment path -> docnames, and None -> docnames not compared by fragment
+        # (empty if no fragments are set)
+        self._fragment_docs: Dict[Optional[str], Set[str]] = {}
+        # child docname -> (parent docname, toctree index, item index),
+        # built on first use
+        self._parents: Optional[Dict[str, Tuple[str, int, int]]] = None
+        # child docname -> number of documents referencing it after the first,
+        # for children referenced by more than one document, built with _parents
+        self._shared_refs: Optional[Dict[str, int]] = None
+        # glob -> compiled matcher, for all globs in the toctrees, built on first use
+        self._glob_matchers: Optional[Dict[str, Callable[[str], Any]]] = None
+        # source suffixes, and the index of docname without suffix -> docname,
+        # built on first use
+        self._source_suffixes: Optional[Tuple[str, ...]] = None
+        self._suffix_index: Optional[Dict[str, str]] = None
+        # docname -> position in depth-first ToC order, built on first use
+        self._toc_positions: Optional[Dict[str, int]] = None
+        # path-segment trie of the docnames, built on first use
+        self._path_trie: Optional[TrieNode] = None
+        # changes made by the mutation methods, e.g. `insert_child`
+        self._journal: List[DocChange] = []
+        # docname -> document content hash, and the site-map content hash,
+        # computed on first use (and pickled, so not re-computed when unpickled)
+        self._doc_hashes: Dict[str, bytes] = {}
+        self._map_hash: Optional[bytes] = None
         self._root: Document = root
+        self[root.docname] = root
         self._meta: Dict[str, Any] = meta or {}
         self._file_format = file_format
 
+    def _create_docs(self) -> MutableMapping[str, Document]:
+        """Return the mapping to store documents in."""
+        return {}
+
     @property
     def root(self) -> Document:
         """Return the root document of the ToC tree.
@@ -165,9 +744,414 @@ class SiteMap(MutableMapping):
         """Set the format of the file to write to."""
         self._file_format = value
 
+    @property
+    def fragments(self) -> Dict[str, Tuple[str, str]]:
+        """Return the fragment files included in the ToC.
+
+        :return: mapping of fragment paths to their (content key, structural key)
+        """
+        return self._fragments
+
+    def set_fragments(
+        self, fragments: Dict[str, Tuple[str, str]], doc_fragments: Dict[str, str]
+    ) -> None:
+        """Set the fragment files included in the ToC.
+
+        The structural key of a fragment should change if any of the documents
+        it defines change, so that `get_changed` can skip documents in fragments
+        whose key has not changed.
+        Assigning or deleting a document removes it from its fragment,
+        and the other documents of the fragment are then always compared.
+
+        :param fragments: mapping of fragment paths to their
+            (content key, structural key)
+        :param doc_fragments: mapping of docnames to the fragment path they are in
+        """
+        self._fragments = fragments
+        self._doc_fragments = {
+            docname: path for docname, path in doc_fragments.items() if docname in self
+        }
+        self._fragment_docs = {path: set() for path in fragments}
+        for docname, path in self._doc_fragments.items():
+            self._fragment_docs.setdefault(path, set()).add(docname)
+        self._fragment_docs[None] = {
+            docname for docname in self._docs if docname not in self._doc_fragments
+        }
+
+    def _unset_fragment(self, docname: str, deleted: bool = False) -> None:
+        """Remove a document from its fragment, when it is assigned or deleted."""
+        path = self._doc_fragments.pop(docname, None)
+        if not self._fragment_docs:
+            return
+        unfragmented = self._fragment_docs.setdefault(None, set())
+        if path is not None:
+            # the fragment no longer defines its documents, so they are all compared
+            unfragmented.update(self._fragment_docs.pop(path, ()))
+        if deleted:
+            unfragmented.discard(docname)
+        else:
+            unfragmented.add(docname)
+
+    def parent(self, docname: str) -> Optional[str]:
+        """Return the parent of a document, i.e. the document whose toctree it is in.
+
+        .. note:: the index used is updated when documents are set or deleted,
+            so a document should be re-set after changing its subtrees in-place.
+            If a document is in more than one toctree,
+            the first document listing it is used.
+
+        :param docname: document name
+        :raises KeyError: document not in the site map
+        :return: parent document name, or None for the root (or orphan) document
+        """
+        position = self.position(docname)
+        return None if position is None else position[0]
+
+    def position(self, docname: str) -> Optional[Tuple[str, int, int]]:
+        """Return the position of a document in its parent's toctrees.
+
+        :param docname: document name
+        :raises KeyError: document not in the site map
+        :return: (parent document name, toctree index, item index),
+            or None for the root (or orphan) document
+        """
+        if docname not in self._docs:
+            raise KeyError(docname)
+        return self._parent_index().get(docname)
+
+    def ancestors(self, docname: str) -> List[str]:
+        """Return the ancestors of a document, from its parent up to the root.
+
+        :param docname: document name
+        :raises KeyError: document not in the site map
+        :return: ancestor document names, nearest first
+        """
+        if docname not in self._docs:
+            raise KeyError(docname)
+        parents = self._parent_index()
+        ancestors: List[str] = []
+        seen = {docname}
+        while docname in parents:
+            docname = parents[docname][0]
+            if docname in seen:
+                # protect against cyclic site-maps
+                break
+            seen.add(docname)
+            ancestors.append(docname)
+        return ancestors
+
+    def siblings(self, docname: str) -> List[str]:
+        """Return the other documents in the same toctree as a document.
+
+        :param docname: document name
+        :raises KeyError: document not in the site map
+        :return: sibling document names, in toctree order
+        """
+        position = self.position(docname)
+        if position is None:
+            return []
+        parent, toctree_index, _ = position
+        return [
+            name
+            for name in self._docs[parent].subtrees[toctree_index].files()
+            if name != docname
+        ]
+
+    def walk(
+        self, max_depth: Optional[int] = None
+    ) -> Iterator[Tuple[int, Optional[str], Optional[int], str]]:
+        """Walk the documents depth-first, in ToC (i.e. reading) order.
+
+        Each document is yielded once (the first time it is referenced),
+        and only documents in the site-map are descended into.
+
+        :param max_depth: maximum depth to walk to (the root has depth 0)
+        :yield: (depth, parent docname, toctree index, docname),
+            with the root first, as ``(0, None, None, root docname)``
+        """
+        root = self._root.docname
+        yield 0, None, None, root
+        if max_depth is not None and max_depth < 1:
+            return
+        seen = {root}
+        stack = [(1, root, self._iter_child_files(root))]
+        while stack:
+            depth, parent, children = stack[-1]
+            for toctree_index, docname in children:
+                if docname in seen:
+                    continue
+                seen.add(docname)
+                yield depth, parent, toctree_index, docname
+                if (max_depth is None or depth < max_depth) and docname in self._docs:
+                    stack.append((depth + 1, docname, self._iter_child_files(docname)))
+                break
+            else:
+                stack.pop()
+
+    def walk_breadth_first(
+        self, max_depth: Optional[int] = None
+    ) -> Iterator[Tuple[int, Optional[str], Optional[int], str]]:
+        """Walk the documents breadth-first, in ToC order at each depth.
+
+        Each document is yielded once (the first time it is reached),
+        and only documents in the site-map are descended into.
+
+        :param max_depth: maximum depth to walk to (the root has depth 0)
+        :yield: (depth, parent docname, toctree index, docname),
+            with the root first, as ``(0, None, None, root docname)``
+        """
+        root = self._root.docname
+        yield 0, None, None, root
+        seen = {root}
+        queue = deque([(1, root)])
+        while queue:
+            depth, parent = queue.popleft()
+            if max_depth is not None and depth > max_depth:
+                break
+            for toctree_index, docname in self._iter_child_files(parent):
+                if docname in seen:
+                    continue
+                seen.add(docname)
+                yield depth, parent, toctree_index, docname
+                if docname in self._docs:
+                    queue.append((depth + 1, docname))
+
+    def _iter_child_files(self, docname: str) -> Iterator[Tuple[int, str]]:
+        """Yield the (toctree index, docname) of the file items of a document."""
+        for toctree_index, toctree in enumerate(self._docs[docname].subtrees):
+            for item in toctree.items:
+                if isinstance(item, FileItem):
+                    yield toctree_index, item
+
+    def toc_index(self, docname: str) -> int:
+        """Return the position of a document in depth-first ToC order (see `walk`),
+        e.g. to sort documents in reading order,
+        with ``sorted(docnames, key=site_map.toc_index)``.
+
+        The index of positions is built on first use,
+        and rebuilt after documents are set or deleted.
+
+        :param docname: document name
+        :raises KeyError: document not in the ToC tree
+        :return: position, with the root at 0
+        """
+        if self._toc_positions is None:
+            self._toc_positions = {
+                docname: index for index, (_, _, _, docname) in enumerate(self.walk())
+            }
+        return self._toc_positions[docname]
+
+    def _parent_index(self) -> Dict[str, Tuple[str, int, int]]:
+        """Return the index of child docname -> position, building it if necessary."""
+        if self._parents is None:
+            self._parents = {}
+            self._shared_refs = {}
+            for doc in self._docs.values():
+                self._index_children(doc)
+        return self._parents
+
+    def _index_children(self, doc: Document, replaced: bool = False) -> None:
+        """Add the children of a document to the parent index.
+
+        :param replaced: whether the document replaced another,
+            keeping its place in the order of documents,
+            so it may be the first to reference a child positioned in a later one
+        """
+        parents, shared_refs = self._parents, self._shared_refs
+        assert parents is not None and shared_refs is not None
+        for toctree_index, toctree in enumerate(doc.subtrees):
+            for item_index, item in enumerate(toctree.items):
+                if not isinstance(item, FileItem):
+                    continue
+                position = (doc.docname, toctree_index, item_index)
+                if parents.setdefault(item, position) is not position:
+                    # also referenced by another document
+                    shared_refs[item] = shared_refs.get(item, 0) + 1
+                    if replaced:
+                        parents[item] = self._first_position(item) or position
+
+    def _unindex_children(self, doc: Document) -> None:
+        """Remove the children of a document from the parent index.
+
+        This is called once the document has been replaced or deleted,
+        so a child also referenced by another document is re-indexed
+        at its position in the first of those documents.
+        """
+        parents, shared_refs = self._parents, self._shared_refs
+        assert parents is not None and shared_refs is not None
+        for toctree in doc.subtrees:
+            for item in toctree.items:
+                if not isinstance(item, FileItem):
+                    continue
+                shared = shared_refs and item in shared_refs
+                if shared:
+                    if shared_refs[item] == 1:
+                        del shared_refs[item]
+                    else:
+                        shared_refs[item] -= 1
+                position = parents.get(item)
+                if position is None or position[0] != doc.docname:
+                    continue
+                del parents[item]
+                if shared:
+                    position = self._first_position(item)
+                    if position is not None:
+                        parents[item] = position
+
+    def _first_position(self, child: str) -> Optional[Tuple[str, int, int]]:
+        """Return the position of a child in the first document referencing it."""
+        for doc in self._docs.values():
+            for toctree_index, toctree in enumerate(doc.subtrees):
+                for item_index, item in enumerate(toctree.items):
+                    if isinstance(item, FileItem) and item == child:
+                        return (doc.docname, toctree_index, item_index)
+        return None
+
     def globs(self) -> Set[str]:
         """Return set of all globs present across all toctrees."""
-        return {glob for item in self._docs.values() for glob in item.child_globs()}
+        return set(self._glob_index())
+
+    def matches_any_glob(self, docname: str) -> bool:
+        """Return whether a docname matches any glob present across all toctrees.
+
+        :param docname: document name (without suffix)
+        """
+        return any(match(docname) for match in self._glob_index().values())
+
+    def filter_glob(self, glob: str, docnames: Iterable[str]) -> List[str]:
+        """Return the docnames that match a glob, like `sphinx.util.matching.patfilter`.
+
+        :param glob: glob pattern
+        :param docnames: document names (without suffix)
+        :return: matching document names, in the given order
+        """
+        match = self._glob_index().get(glob)
+        if match is None:
+            match = compile_matchers([glob])[0]
+        return list(filter(match, docnames))
+
+    def query(
+        self, prefix: Optional[str] = None, pattern: Optional[str] = None
+    ) -> Set[str]:
+        """Return the documents whose names start with a prefix and/or match a glob.
+
+        The names are looked up in a path-segment trie (built on first use,
+        and updated when documents are set or deleted),
+        so that the time taken is proportional to the number of matches,
+        rather than the number of documents
+        (except that a ``**`` matches against all the names below it).
+
+        :param prefix: prefix of the document names, e.g. ``api/numpy/``
+        :param pattern: glob the document names match, as for toctree globs,
+            e.g. ``reference/*`` (``*`` does not match ``/``, but ``**`` does)
+        :return: matching document names
+        """
+        if self._path_trie is None:
+            self._path_trie = {}
+            for docname in self._docs:
+                _trie_add(self._path_trie, docname)
+        if pattern is None:
+            return set(_trie_prefix(self._path_trie, prefix or ""))
+        steps: List[Tuple[str, Any]] = []
+        for segment in pattern.split("/"):
+            if "**" in segment or segment.count("[") != segment.count("]"):
+                # match the full names below, since the rest of the pattern
+                # may match across segments
+                steps.append(("names", compile_matchers([pattern])[0]))
+                break
+            elif any(char in segment for char in "*?["):
+                steps.append(("segment", compile_matchers([segment])[0]))
+            else:
+                steps.append(("literal", segment))
+        if steps[0][0] == "names":
+            # all names would be matched, which is faster without the trie
+            matches = set(filter(steps[0][1], self._docs))
+        else:
+            matches = set(_trie_glob(self._path_trie, steps, 0))
+        if prefix:
+            return {docname for docname in matches if docname.startswith(prefix)}
+        return matches
+
+    @property
+    def source_suffixes(self) -> Optional[Tuple[str, ...]]:
+        """Return the source suffixes set by `set_source_suffixes`."""
+        return self._source_suffixes
+
+    def set_source_suffixes(self, suffixes: Iterable[str]) -> List[Tuple[str, str]]:
+        """Set the source suffixes that document names may end with,
+        indexing the documents by their name without the suffix
+        (i.e. the Sphinx docname), see `get_by_source_name`.
+
+        If more than one document has the same name without suffix,
+        the one without a suffix is indexed, or else the one with the first suffix.
+
+        :param suffixes: source suffixes, e.g. ``[".rst", ".md"]``
+        :return: the (indexed, ignored) document names that have the same name
+            without suffix
+        """
+        self._source_suffixes = tuple(suffixes)
+        self._suffix_index = None
+        return self._build_suffix_index()
+
+    def strip_suffix(self, docname: str) -> str:
+        """Return a document name without any source suffix.
+
+        :param docname: document name
+        :return: document name without suffix
+        """
+        for suffix in self._source_suffixes or ():
+            if docname.endswith(suffix):
+                return docname[: -len(suffix)]
+        return docname
+
+    def get_by_source_name(self, name: str) -> Optional[Document]:
+        """Return the document for a name without a source suffix,
+        e.g. the Sphinx docname ``doc`` for the document ``doc.md``.
+
+        :param name: document name, without suffix
+        :return: document, or None if not in the site map
+        """
+        if self._suffix_index is None:
+            self._build_suffix_index()
+        assert self._suffix_index is not None
+        docname = self._suffix_index.get(name)
+        return None if docname is None else self._docs[docname]
+
+    def _build_suffix_index(self) -> List[Tuple[str, str]]:
+        """Build the index of document names without suffix.
+
+        :return: the (indexed, ignored) document names that have the same name
+            without suffix
+        """
+        suffixes = self._source_suffixes or ()
+        index: Dict[str, str] = {}
+        # name without suffix -> priority (lower is higher)
+        priorities: Dict[str, int] = {}
+        collisions: List[Tuple[str, str]] = []
+        for docname in self._docs:
+            name, priority = docname, 0
+            for suffix_index, suffix in enumerate(suffixes, 1):
+                if docname.endswith(suffix):
+                    name, priority = docname[: -len(suffix)], suffix_index
+                    break
+            if name not in index:
+                index[name], priorities[name] = docname, priority
+            elif priority < priorities[name]:
+                collisions.append((docname, index[name]))
+                index[name], priorities[name] = docname, priority
+            else:
+                collisions.append((index[name], docname))
+        self._suffix_index = index
+        return collisions
+
+    def _glob_index(self) -> Dict[str, Callable[[str], Any]]:
+        """Return the compiled matcher for each glob, building them if necessary."""
+        if self._glob_matchers is None:
+            globs = {
+                glob: None for doc in self._docs.values() for glob in doc.child_globs()
+            }
+            self._glob_matchers = dict(zip(globs, compile_matchers(globs)))
+        return self._glob_matchers
 
     def __getitem__(self, docname: str) -> Document:
         """Enable retrieving a document by name using the indexing operator.
@@ -177,6 +1161,13 @@ class SiteMap(MutableMapping):
         """
         return self._docs[docname]
 
+    def __contains__(self, docname: object) -> bool:
+        """Return whether a document is in the site-map.
+
+        :param docname: document name
+        """
+        return docname in self._docs
+
     def __setitem__(self, docname: str, item: Document) -> None:
         """Enable setting a document by name using the indexing operator.
 
@@ -184,7 +1175,28 @@ class SiteMap(MutableMapping):
         :param item: document instance
         """
         assert item.docname == docname
+        self._glob_matchers = self._map_hash = self._toc_positions = None
+        self._doc_hashes.pop(docname, None)
+        if docname not in self._docs:
+            self._suffix_index = None
+            if self._path_trie is not None:
+                _trie_add(self._path_trie, docname)
+        old = (
+            self._docs.get(docname)
+            if self._parents is not None and docname in self._docs
+            else None
+        )
         self._docs[docname] = item
+        if old is not None and old is not item and old.subtrees is item.subtrees:
+            # e.g. only the title was replaced, so the children are unchanged
+            pass
+        elif self._parents is not None:
+            if old is not None:
+                self._unindex_children(old)
+            self._index_children(item, replaced=old is not None)
+        if docname == self._root.docname:
+            self._root = item
+        self._unset_fragment(docname)
 
     def __delitem__(self, docname: str) -> None:
         """Enable removing a document by name.
@@ -192,7 +1204,315 @@ class SiteMap(MutableMapping):
         :param docname: document name
         """
         assert docname != self._root.docname, "cannot delete root doc item"
+        self._glob_matchers = self._suffix_index = self._map_hash = None
+        self._toc_positions = None
+        self._doc_hashes.pop(docname, None)
+        old = (
+            self._docs.get(docname)
+            if self._parents is not None and docname in self._docs
+            else None
+        )
+        if self._path_trie is not None and docname in self._docs:
+            _trie_discard(self._path_trie, docname)
         del self._docs[docname]
+        if old is not None:
+            self._unindex_children(old)
+        self._unset_fragment(docname, deleted=True)
+
+    @property
+    def journal(self) -> List[DocChange]:
+        """Return the changes made by the mutation methods
+        (`insert_child`, `move`, `remove_subtree` and `set_title`),
+        since the site-map was created or the journal was cleared.
+
+        These are the changes that `diff` would return against the site-map
+        before the mutations, but obtained in time proportional to the edits.
+        A document can have more than one change, one for each edit.
+        """
+        return list(self._journal)
+
+    def clear_journal(self) -> List[DocChange]:
+        """Clear the journal of changes.
+
+        :return: the changes, before clearing
+        """
+        changes, self._journal = self._journal, []
+        return changes
+
+    def insert_child(
+        self,
+        parent: str,
+        docname: str,
+        *,
+        toctree_index: int = 0,
+        position: Optional[int] = None,
+        title: Optional[str] = None,
+    ) -> Document:
+        """Insert a document in a toctree of its parent,
+        adding it to the site-map if it is not already.
+
+        The parent document is replaced by an edited copy.
+
+        :param parent: parent document name
+        :param docname: document name
+        :param toctree_index: index of the parent's toctree,
+            if it is the number of toctrees, a new toctree is appended
+        :param position: index of the item in the toctree, or None to append
+        :param title: title of the document, if it is added
+        :raises KeyError: parent not in the site-map
+        :raises ValueError: document is the root, the parent,
+            already in a toctree, or would become an ancestor of itself
+        :return: the document
+        """
+        if (
+            docname == self._root.docname
+            or docname == parent
+            or docname in self._parent_index()
+        ):
+            raise ValueError(f"document is already in the ToC: {docname!r}")
+        if docname in self.ancestors(parent):
+            raise ValueError(f"cannot insert {docname!r} in its descendant {parent!r}")
+        item = FileItem(docname)
+        self._edit_items(
+            parent,
+            toctree_index,
+            lambda items: items.insert(
+                len(items) if position is None else position, item
+            ),
+            item,
+        )
+        if docname in self._docs:
+            self._journal.append(
+                DocChange(ChangeKind.MOVED, docname, None, self.position(docname))
+            )
+            return self._docs[docname]
+        docname = str(docname)
+        doc = Document(docname, title=title)
+        self[docname] = doc
+        self._journal.append(DocChange(ChangeKind.ADDED, docname, None, doc))
+        return doc
+
+    def move(
+        self,
+        docname: str,
+        parent: str,
+        *,
+        toctree_index: int = 0,
+        position: Optional[int] = None,
+    ) -> None:
+        """Move a document (and its descendants) to a toctree of another parent,
+        or to another position in the same parent.
+
+        The old and new parent documents are replaced by edited copies.
+
+        :param docname: document name
+        :param parent: new parent document name
+        :param toctree_index: index of the new parent's toctree,
+            if it is the number of toctrees, a new toctree is appended
+        :param position: index of the item in the toctree (after removing it
+            from its current position), or None to append
+        :raises KeyError: document or parent not in the site-map
+        :raises ValueError: document is the root, or the parent is the document
+            or one of its descendants
+        """
+        if docname not in self._docs:
+            raise KeyError(docname)
+        if parent not in self._docs:
+            raise KeyError(parent)
+        if (
+            docname == self._root.docname
+            or docname == parent
+            or docname in self.ancestors(parent)
+        ):
+            raise ValueError(f"cannot move {docname!r} to {parent!r}")
+        old_position = self.position(docname)
+        item: Union[GlobItem, FileItem, UrlItem] = FileItem(docname)
+        if old_position is not None:
+            old_parent, old_toctree_index, old_item_index = old_position
+            item = (
+                self._docs[old_parent].subtrees[old_toctree_index].items[old_item_index]
+            )
+            self._edit_items(
+                old_parent,
+                old_toctree_index,
+                lambda items: items.pop(old_item_index),
+                item,
+            )
+        self._edit_items(
+            parent,
+            toctree_index,
+            lambda items: items.insert(
+                len(items) if position is None else position, item
+            ),
+            item,
+        )
+        new_position = self.position(docname)
+        if new_position != old_position:
+            self._journal.append(
+                DocChange(ChangeKind.MOVED, docname, old_position, new_position)
+            )
+
+    def remove_subtree(self, docname: str) -> List[str]:
+        """Remove a document and its descendants,
+        and the document from the toctree of its parent.
+
+        The parent document is replaced by an edited copy.
+
+        :param docname: document name
+        :raises KeyError: document not in the site-map
+        :raises ValueError: document is the root
+        :return: the removed document names, depth-first
+        """
+        if docname not in self._docs:
+            raise KeyError(docname)
+        if docname == self._root.docname:
+            raise ValueError("cannot remove the root document")
+        parents = self._parent_index()
+        position = parents.get(docname)
+        if position is not None:
+            parent, toctree_index, item_index = position
+            self._edit_items(
+                parent,
+                toctree_index,
+                lambda items: items.pop(item_index),
+                self._docs[parent].subtrees[toctree_index].items[item_index],
+            )
+        removed: List[str] = []
+        stack = [docname]
+        while stack:
+            name = stack.pop()
+            removed.append(name)
+            # only descend to the children positioned in this document
+            children = [
+                child
+                for _, child in self._iter_child_files(name)
+                if child in self._docs and parents.get(child, (None,))[0] == name
+            ]
+            stack.extend(reversed(children))
+        for name in removed:
+            doc = self._docs[name]
+            del self[name]
+            self._journal.append(DocChange(ChangeKind.REMOVED, name, doc, None))
+        return removed
+
+    def set_title(self, docname: str, title: Optional[str]) -> None:
+        """Set the title of a document, replacing it with an edited copy.
+
+        :param docname: document name
+        :param title: new title
+        :raises KeyError: document not in the site-map
+        """
+        doc = self._docs[docname]
+        if doc.title == title:
+            return
+        self[docname] = replace(doc, title=title)
+        self._journal.append(DocChange(ChangeKind.TITLE, docname, doc.title, title))
+
+    def _edit_items(
+        self,
+        docname: str,
+        toctree_index: int,
+        edit: Callable[[List[Union[GlobItem, FileItem, UrlItem]]], Any],
+        item: Union[GlobItem, FileItem, UrlItem],
+    ) -> None:
+        """Replace a document with a copy, whose toctree items are edited,
+        recording the change of its children,
+        and the moves of the other children whose positions changed.
+
+        :param docname: document name
+        :param toctree_index: index of the toctree, if it is the number of toctrees,
+            a new toctree is appended
+        :param edit: function that edits the list of items in-place
+        :param item: the item inserted or removed, whose move is not recorded here
+        """
+        doc = self._docs[docname]
+        parents = self._parent_index()
+        old_items = _toctree_items(doc)
+        with trusted_construction():
+            subtrees = list(doc.subtrees)
+            if toctree_index == len(subtrees):
+                subtrees.append(TocTree([]))
+            tree = subtrees[toctree_index]
+            items = list(tree.items)
+            edit(items)
+            subtrees[toctree_index] = replace(tree, items=items)
+            new_doc = replace(doc, subtrees=subtrees)
+        siblings = old_items[toctree_index] if toctree_index < len(old_items) else []
+        old_positions = {
+            child: parents.get(child)
+            for child in siblings
+            if isinstance(child, FileItem)
+        }
+        self[docname] = new_doc
+        if len(subtrees) != len(doc.subtrees):
+            self._journal.append(
+                DocChange(
+                    ChangeKind.OPTIONS,
+                    docname,
+                    _toctree_options(doc),
+                    _toctree_options(new_doc),
+                )
+            )
+        self._journal.append(
+            DocChange(ChangeKind.CHILDREN, docname, old_items, _toctree_items(new_doc))
+        )
+        for child, old_position in old_positions.items():
+            new_position = parents.get(child)
+            if child != item and child in self._docs and new_position != old_position:
+                self._journal.append(
+                    DocChange(ChangeKind.MOVED, child, old_position, new_position)
+                )
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Return the state for pickling, without the indexes built on demand.
+
+        Documents stored in a dict are packed as tuples (see `_pack_documents`),
+        the root document by its name, and the document hashes
+        as a single bytes string, in the order of the documents.
+        """
+        state = {
+            name: getattr(self, name)
+            for name in SiteMap.__slots__
+            if name not in self._INDEX_ATTRIBUTES
+        }
+        if isinstance(self._docs, dict):
+            state["_docs"] = _pack_documents(self._docs.values())
+            if self._docs.get(self._root.docname) is self._root:
+                state["_root"] = str(self._root.docname)
+            try:
+                state["_doc_hashes"] = (
+                    b"".join(self._doc_hashes[name] for name in self._docs)
+                    if len(self._doc_hashes) == len(self._docs)
+                    else {}
+                )
+            except KeyError:
+                state["_doc_hashes"] = {}
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Restore the state from pickling
+        (also of site-maps pickled by previous versions, with fewer attributes,
+        and documents that are not packed).
+        """
+        self._fragments, self._doc_fragments, self._fragment_docs = {}, {}, {}
+        self._source_suffixes = self._map_hash = None
+        self._doc_hashes = {}
+        self._journal = []
+        for name in self._INDEX_ATTRIBUTES:
+            setattr(self, name, None)
+        for name, value in state.items():
+            if name in SiteMap.__slots__:
+                setattr(self, name, value)
+        if isinstance(self._docs, tuple):
+            self._docs = _unpack_documents(self._docs)
+            if isinstance(self._root, str):
+                self._root = self._docs[self._root]
+            if isinstance(self._doc_hashes, bytes):
+                hashes = self._doc_hashes
+                self._doc_hashes = {
+                    name: hashes[index : index + HASH_SIZE]
+                    for name, index in zip(self._docs, range(0, len(hashes), HASH_SIZE))
+                }
 
     def __iter__(self) -> Iterator[str]:
         """Enable iterating the names of the documents the site map is composed
@@ -213,52 +1533,363 @@ class SiteMap(MutableMapping):
 
     def as_json(self) -> Dict[str, Any]:
         """Return JSON serialized site-map representation."""
-        doc_dict = {
-            k: asdict(self._docs[k]) if self._docs[k] else self._docs[k]
-            for k in sorted(self._docs)
-        }
-
-        def _replace_items(d: Dict[str, Any]) -> Dict[str, Any]:
-            for k, v in d.items():
-                if isinstance(v, dict):
-                    d[k] = _replace_items(v)
-                elif isinstance(v, (list, tuple)):
-                    d[k] = [
-                        (
-                            _replace_items(i)
-                            if isinstance(i, dict)
-                            else (str(i) if isinstance(i, str) else i)
-                        )
-                        for i in v
-                    ]
-                elif isinstance(v, str):
-                    d[k] = str(v)
-            return d
-
-        doc_dict = _replace_items(doc_dict)
         data = {
-            "root": self.root.docname,
-            "documents": doc_dict,
+            "root": str(self.root.docname),
+            "documents": {
+                str(k): _doc_as_json(self._docs[k]) for k in sorted(self._docs)
+            },
             "meta": self.meta,
         }
         if self.file_format:
             data["file_format"] = self.file_format
         return data
 
+    def write_json(self, stream: TextIO) -> None:
+        """Write the JSON serialized site-map representation (see `as_json`)
+        to a text stream, one document at a time.
+
+        :param stream: text stream to write to
+        """
+        stream.write(f'{{"root":{json_dumps(self.root.docname)},"documents":{{')
+        for index, docname in enumerate(sorted(self._docs)):
+            if index:
+                stream.write(",")
+            stream.write(json_dumps(docname))
+            stream.write(":")
+            stream.write(json_dumps(_doc_as_json(self._docs[docname])))
+        stream.write(f'}},"meta":{json_dumps(self.meta)}')
+        if self.file_format:
+            stream.write(f',"file_format":{json_dumps(self.file_format)}')
+        stream.write("}")
+
+    def doc_hash(self, docname: str) -> bytes:
+        """Return the content hash of a document, see `Document.content_hash`.
+
+        The hash is computed on first use, so re-set a document
+        (``site_map[docname] = document``) after changing it in-place.
+
+        :param docname: document name
+        :return: hash digest
+        """
+        try:
+            return self._doc_hashes[docname]
+        except KeyError:
+            digest = self._doc_hashes[docname] = self._docs[docname].content_hash()
+            return digest
+
+    def content_hash(self) -> bytes:
+        """Return a stable hash of the root document name
+        and the content hashes of all documents.
+
+        Site-maps with the same hash have the same documents.
+
+        :return: hash digest
+        """
+        if self._map_hash is None:
+            hasher = hashlib.blake2b(self._root.docname.encode(), digest_size=HASH_SIZE)
+            for docname in sorted(self._docs):
+                hasher.update(b"\0")
+                hasher.update(docname.encode())
+                hasher.update(self.doc_hash(docname))
+            self._map_hash = hasher.digest()
+        return self._map_hash
+
+    def bulk_update(self) -> ContextManager[Any]:
+        """Return a context manager to set or delete many documents at once,
+        e.g. in one transaction for site-maps stored in a database.
+        """
+        return nullcontext()
+
+    def copy(self) -> "SiteMap":
+        """Return a copy of the site-map, which can be changed independently of it.
+
+        The documents are also copied, so that changing them in-place
+        does not change this site-map.
+        The indexes are built again on first use.
+
+        :raises TypeError: if the documents are not stored in a dict,
+            e.g. for a `ColumnarSiteMap` or `SqliteSiteMap`
+        :return: copy of the site-map
+        """
+        if not isinstance(self._docs, dict):
+            raise TypeError(f"cannot copy a {type(self).__name__}")
+        new = type(self).__new__(type(self))
+        for name in SiteMap.__slots__:
+            value = getattr(self, name)
+            if isinstance(value, (dict, list)):
+                value = value.copy()
+            setattr(new, name, value)
+        new._docs = {
+            docname: _copy_document(doc) for docname, doc in self._docs.items()
+        }
+        new._root = new._docs[self._root.docname]
+        new._fragment_docs = {
+            path: set(docnames) for path, docnames in self._fragment_docs.items()
+        }
+        for name in self._INDEX_ATTRIBUTES:
+            setattr(new, name, None)
+        return new
+
+    def freeze(self, previous: Optional["FrozenSiteMap"] = None) -> "FrozenSiteMap":
+        """Return an immutable snapshot of the site-map.
+
+        :param previous: a previous snapshot, whose documents are re-used
+            (shared) where they are equal to the documents of this site-map
+        :return: snapshot
+        """
+        docs: Dict[str, FrozenDocument] = {}
+        for docname, doc in self._docs.items():
+            frozen = FrozenDocument.from_document(doc)
+            if previous is not None:
+                previous_doc = previous.get(docname)
+                if previous_doc is not None and _frozen_identical(previous_doc, frozen):
+                    frozen = previous_doc
+            docs[docname] = frozen
+        return FrozenSiteMap(
+            docs, self._root.docname, meta=self._meta, file_format=self._file_format
+        )
+
     def get_changed(self, previous: "SiteMap") -> Set[str]:
         """Compare this sitemap to another and return a list of changed documents.
 
+        Site-maps with the same content hash are not compared further,
+        otherwise the content hashes of the documents are compared.
+        Documents from included fragments, whose structural key is the same in
+        both site-maps (and in which no document was assigned or deleted),
+        are not compared, nor iterated over.
+
         .. note:: for Sphinx, file extensions should be removed to get docnames.
         """
+        if self is previous or self.content_hash() == previous.content_hash():
+            return set()
         changed_docs = set()
         # check if the root document has changed
-        if self.root != previous.root:
+        if self.root.docname != previous.root.docname or self.doc_hash(
+            self.root.docname
+        ) != previous.doc_hash(previous.root.docname):
             changed_docs.add(self.root.docname)
-        for name, doc in self._docs.items():
+        previous_fragment_docs = getattr(previous, "_fragment_docs", {})
+        names: Iterable[str] = self._docs
+        if self._fragment_docs and previous_fragment_docs:
+            previous_fragments = previous._fragments
+            names = chain.from_iterable(
+                docnames
+                for path, docnames in self._fragment_docs.items()
+                if path is None
+                or path not in previous_fragment_docs
+                or path not in previous_fragments
+                or previous_fragments[path][1] != self._fragments[path][1]
+            )
+        for name in names:
+            if name not in self._docs:
+                continue
             if name not in previous:
                 changed_docs.add(name)
                 continue
-            prev_doc = previous[name]
-            if prev_doc != doc:
+            if self.doc_hash(name) != previous.doc_hash(name):
                 changed_docs.add(name)
         return changed_docs
+
+    def diff(self, previous: "SiteMap") -> List[DocChange]:
+        """Compare this sitemap to another and return the changes to documents.
+
+        Documents with the same content hash in both site-maps are only
+        compared by their position (see `position`).
+        A document can have more than one change, e.g. its title and options.
+
+        :param previous: the previous site-map
+        :return: changes, for the documents of this site-map in order,
+            then for the removed documents
+        """
+        if self is previous or self.content_hash() == previous.content_hash():
+            return []
+        changes: List[DocChange] = []
+        parents = self._parent_index()
+        previous_parents = previous._parent_index()
+        for name, doc in self._docs.items():
+            if name not in previous:
+                changes.append(DocChange(ChangeKind.ADDED, name, None, doc))
+                continue
+            if parents.get(name) != previous_parents.get(name):
+                changes.append(
+                    DocChange(
+                        ChangeKind.MOVED,
+                        name,
+                        previous_parents.get(name),
+                        parents.get(name),
+                    )
+                )
+            if self.doc_hash(name) == previous.doc_hash(name):
+                continue
+            prev_doc = previous[name]
+            if doc.title != prev_doc.title:
+                changes.append(
+                    DocChange(ChangeKind.TITLE, name, prev_doc.title, doc.title)
+                )
+            options, prev_options = _toctree_options(doc), _toctree_options(prev_doc)
+            if options != prev_options:
+                changes.append(
+                    DocChange(ChangeKind.OPTIONS, name, prev_options, options)
+                )
+            items, prev_items = _toctree_items(doc), _toctree_items(prev_doc)
+            if items != prev_items or any(
+                type(item) is not type(prev_item)
+                for tree, prev_tree in zip(items, prev_items)
+                for item, prev_item in zip(tree, prev_tree)
+            ):
+                changes.append(DocChange(ChangeKind.CHILDREN, name, prev_items, items))
+        for name, prev_doc in previous._docs.items():
+            if name not in self._docs:
+                changes.append(DocChange(ChangeKind.REMOVED, name, prev_doc, None))
+        return changes
+
+
+class FrozenSiteMap(Mapping):
+    """An immutable snapshot of a `SiteMap`, created with `SiteMap.freeze`.
+
+    Snapshots derived with `evolve` share all unchanged documents
+    with the snapshot they are derived from.
+    Each snapshot stores a (shared) base mapping of documents,
+    and a mapping of the documents changed since the base (or None if removed).
+    Deriving a snapshot copies the mapping of changes,
+    which is merged into a new base (copying all N documents)
+    once it grows larger than the square root of N,
+    so a sequence of single-document edits costs amortized O(√N) per edit:
+    far less than copying the site-map, but more than the edit itself,
+    since only the documents are shared, not the mappings.
+    """
+
+    __slots__ = ("_base", "_delta", "_len", "_root", "_meta", "_file_format")
+
+    def __init__(
+        self,
+        docs: Dict[str, FrozenDocument],
+        root: str,
+        meta: Optional[Dict[str, Any]] = None,
+        file_format: Optional[str] = None,
+    ) -> None:
+        """Create a snapshot.
+
+        :param docs: mapping of docnames to documents (not copied)
+        :param root: docname of the root document
+        :param meta: site-map metadata (copied)
+        :param file_format: format of the file to write to
+        """
+        if root not in docs:
+            raise KeyError(f"root document not in documents: {root!r}")
+        self._base = docs
+        self._delta: Dict[str, Optional[FrozenDocument]] = {}
+        self._len = len(docs)
+        self._root = root
+        self._meta = MappingProxyType(dict(meta or {}))
+        self._file_format = file_format
+
+    @property
+    def root(self) -> FrozenDocument:
+        """Return the root document of the ToC tree.
+
+        :return: root document
+        """
+        return self[self._root]
+
+    @property
+    def meta(self) -> Mapping[str, Any]:
+        """Return the (read-only) site-map metadata.
+
+        :return: metadata mapping
+        """
+        return self._meta
+
+    @property
+    def file_format(self) -> Optional[str]:
+        """Return the format of the file to write to.
+
+        :return: output file format
+        """
+        return self._file_format
+
+    def __getitem__(self, docname: str) -> FrozenDocument:
+        """Return a document by its name.
+
+        :param docname: document name
+        :return: document
+        """
+        if docname in self._delta:
+            doc = self._delta[docname]
+            if doc is None:
+                raise KeyError(docname)
+            return doc
+        return self._base[docname]
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate the document names, in the order they were first added.
+
+        :yield: document name
+        """
+        delta = self._delta
+        for docname in self._base:
+            if docname not in delta or delta[docname] is not None:
+                yield docname
+        for docname, doc in delta.items():
+            if doc is not None and docname not in self._base:
+                yield docname
+
+    def __len__(self) -> int:
+        """Return the number of documents."""
+        return self._len
+
+    def evolve(
+        self,
+        updates: Optional[Mapping[str, Union[None, Document, FrozenDocument]]] = None,
+        *,
+        root: Optional[str] = None,
+    ) -> "FrozenSiteMap":
+        """Return a new snapshot with some documents set or removed.
+
+        :param updates: mapping of docnames to their new document
+            (frozen if it is a `Document`), or None to remove the document
+        :param root: docname of the new root document (default: unchanged)
+        :return: new snapshot, sharing all other documents with this one
+        """
+        root = self._root if root is None else root
+        delta = dict(self._delta)
+        length = self._len
+        for docname, doc in (updates or {}).items():
+            if isinstance(doc, Document):
+                doc = FrozenDocument.from_document(doc)
+            if doc is not None and doc.docname != docname:
+                raise ValueError(
+                    f"document name {doc.docname!r} does not match {docname!r}"
+                )
+            exists = docname in self
+            if doc is None and not exists:
+                raise KeyError(docname)
+            length += (doc is not None) - exists
+            if doc is None and docname not in self._base:
+                delta.pop(docname, None)
+            else:
+                delta[docname] = doc
+        new = FrozenSiteMap.__new__(FrozenSiteMap)
+        new._base, new._delta, new._len = self._base, delta, length
+        new._root, new._meta, new._file_format = root, self._meta, self._file_format
+        if root not in new:
+            raise KeyError(f"root document not in documents: {root!r}")
+        if len(delta) ** 2 > len(self._base):
+            # merge the changes into a new base
+            new._base, new._delta = {name: new[name] for name in new}, {}
+        return new
+
+    def thaw(self) -> SiteMap:
+        """Return a (mutable) site-map, with copies of the documents.
+
+        :return: site-map
+        """
+        site_map = SiteMap(
+            self.root.to_document(),
+            meta=dict(self._meta),
+            file_format=self._file_format,
+        )
+        for docname, doc in self.items():
+            if docname != self._root:
+                site_map[docname] = doc.to_document()
+        return site_map
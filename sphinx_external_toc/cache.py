@@ -0,0 +1,295 @@
+"""Caching of parsed ToC files, so that unchanged files are not re-parsed."""
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import suppress
+import hashlib
+import os
+from pathlib import Path
+import pickle
+import tempfile
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+from sphinx.util import logging
+import yaml
+
+from . import __version__
+from ._compat import load_toc_content, trusted_construction
+from .api import SiteMap
+
+logger = logging.getLogger(__name__)
+
+#: Name of the cache folder, created inside the Sphinx doctree directory.
+CACHE_DIRNAME = "external_toc"
+#: Name of the sub-folder of the cache folder, for loaded include fragments.
+FRAGMENTS_DIRNAME = "fragments"
+#: Maximum number of site-maps kept in an on-disk cache folder.
+CACHE_MAX_ENTRIES = 16
+#: Maximum number of fragments kept in an on-disk cache folder.
+FRAGMENTS_MAX_ENTRIES = 4096
+
+# in-process cache: resolved path -> (file stamps, site map)
+_MEMORY_CACHE: Dict[str, Tuple[Tuple[Tuple[str, int, int], ...], SiteMap]] = {}
+# in-process cache of loaded fragment data: content key -> data
+_FRAGMENT_CACHE: Dict[str, Any] = {}
+
+
+def clear_memory_cache() -> None:
+    """Clear the in-process cache of parsed site-maps and loaded fragment data."""
+    _MEMORY_CACHE.clear()
+    _FRAGMENT_CACHE.clear()
+
+
+def content_key(content: bytes, path: Optional[str] = None) -> str:
+    """Return the cache key for the content of a ToC file.
+
+    The key includes the package version,
+    so that cache entries are not shared between versions.
+
+    :param content: file content
+    :param path: resolved file path, to include in the key (if given)
+    :return: key
+    """
+    hasher = hashlib.sha256(__version__.encode("utf8"))
+    if path is not None:
+        hasher.update(b"\0")
+        hasher.update(path.encode("utf8", "surrogateescape"))
+    hasher.update(b"\0")
+    hasher.update(content)
+    return hasher.hexdigest()
+
+
+def parse_toc_cached(
+    path: Union[str, Path], *, cache_dir: Union[None, str, Path] = None
+) -> SiteMap:
+    """Parse a ToC file, re-using a previously parsed site-map if possible.
+
+    The in-process cache is checked first, by the path, modification time and
+    size of the file (and any files it includes). Then, if ``cache_dir`` is
+    given, the on-disk cache is checked, by a hash of the resolved path and
+    content of the file (and the content of any files it includes).
+    On a miss, included fragments are also cached individually in ``cache_dir``.
+
+    A copy of the cached site-map is returned (see `SiteMap.copy`),
+    so that each caller, e.g. each Sphinx application, can change its own.
+
+    :param path: ToC file path
+    :param cache_dir: folder for the on-disk cache (or None to skip it)
+    :return: parsed site map
+    """
+    from .parsing import parse_toc_file
+
+    path = Path(path).resolve()
+    memory_key = str(path)
+    if memory_key in _MEMORY_CACHE:
+        stamps, cached = _MEMORY_CACHE[memory_key]
+        if stamps == _file_stamps([path_str for path_str, _, _ in stamps]):
+            logger.debug("[etoc] Using in-process cache for %s", path)
+            return cached.copy()
+
+    stamp = _file_stamps([str(path)])
+    content = path.read_bytes()
+    site_map: Optional[SiteMap] = None
+    cache_path: Optional[Path] = None
+    if cache_dir is not None:
+        # includes are resolved relative to the ToC file, so its path is in the key
+        key = content_key(content, str(path))
+        cache_path = Path(cache_dir) / f"{key}{_loader_suffix(path.suffix)}.pickle"
+        site_map = _read_cache_file(cache_path)
+        if site_map is not None and not _fragments_unchanged(site_map):
+            site_map = None
+    if site_map is None:
+        site_map = parse_toc_file(
+            path,
+            cache_dir=None
+            if cache_dir is None
+            else Path(cache_dir) / FRAGMENTS_DIRNAME,
+            content=content,
+        )
+        if cache_path is not None:
+            # cache the content hashes, so that loaded site-maps compare in O(1)
+            site_map.content_hash()
+            _write_cache_file(cache_path, site_map)
+            _prune_cache_dir(cache_path.parent, CACHE_MAX_ENTRIES)
+    else:
+        logger.debug("[etoc] Using on-disk cache for %s", path)
+
+    _MEMORY_CACHE[memory_key] = (
+        stamp + _file_stamps(list(site_map.fragments)),
+        site_map,
+    )
+    return site_map.copy()
+
+
+def load_fragments(
+    paths: Sequence[Path],
+    *,
+    encoding: str = "utf8",
+    cache_dir: Union[None, str, Path] = None,
+    max_workers: Optional[int] = None,
+) -> List[Tuple[str, Any]]:
+    """Load the data of ToC fragment files.
+
+    Fragments are cached individually, in-process and (if ``cache_dir`` is given)
+    on disk, by a hash of their content. Fragments not in the cache are loaded
+    concurrently in a process pool, if there is more than one.
+
+    :param paths: fragment file paths
+    :param encoding: fragment file character encoding
+    :param cache_dir: folder for the on-disk cache (or None to skip it)
+    :param max_workers: maximum number of worker processes (1 to load serially)
+    :return: (content key, data) for each path
+    """
+    keys: List[Tuple[str, str]] = []
+    missing: Dict[str, Tuple[bytes, str]] = {}
+    for path in paths:
+        content = Path(path).read_bytes()
+        key = content_key(content)
+        # the same content may load differently with a different loader
+        data_key = f"{key}{_loader_suffix(Path(path).suffix)}"
+        keys.append((key, data_key))
+        if data_key in _FRAGMENT_CACHE or data_key in missing:
+            continue
+        if cache_dir is not None:
+            cached = _read_cache_file(Path(cache_dir) / f"{data_key}.pickle", tuple)
+            if cached is not None:
+                _FRAGMENT_CACHE[data_key] = cached[0]
+                continue
+        missing[data_key] = (content, Path(path).suffix)
+
+    if missing:
+        loaded = _load_contents(list(missing.values()), encoding, max_workers)
+        for data_key, data in zip(missing, loaded):
+            _FRAGMENT_CACHE[data_key] = data
+            if cache_dir is not None:
+                # wrapped in a tuple, to distinguish a cached None
+                _write_cache_file(Path(cache_dir) / f"{data_key}.pickle", (data,))
+        if cache_dir is not None:
+            _prune_cache_dir(Path(cache_dir), FRAGMENTS_MAX_ENTRIES)
+    result = [(key, _FRAGMENT_CACHE[data_key]) for key, data_key in keys]
+    # drop the least recently added fragments
+    for key in list(_FRAGMENT_CACHE)[
+        : max(0, len(_FRAGMENT_CACHE) - FRAGMENTS_MAX_ENTRIES)
+    ]:
+        del _FRAGMENT_CACHE[key]
+    return result
+
+
+def _loader_suffix(suffix: str) -> str:
+    """Return the normalised suffix, for the loader of a ToC file suffix."""
+    suffix = suffix.lower()
+    return suffix if suffix in (".json", ".toml") else ".yml"
+
+
+def _load_content(content: bytes, suffix: str, encoding: str) -> Any:
+    """Load the data of a ToC file."""
+    return load_toc_content(content, suffix, encoding)
+
+
+def _load_contents(
+    contents: List[Tuple[bytes, str]], encoding: str, max_workers: Optional[int]
+) -> List[Any]:
+    """Load the data of ToC files, in a process pool if there are several."""
+    if len(contents) > 1 and max_workers != 1:
+        try:
+            with ProcessPoolExecutor(max_workers=max_workers) as executor:
+                return list(
+                    executor.map(
+                        _load_content,
+                        [content for content, _ in contents],
+                        [suffix for _, suffix in contents],
+                        [encoding] * len(contents),
+                    )
+                )
+        except (
+            OSError,
+            NotImplementedError,
+            BrokenProcessPool,
+            pickle.PicklingError,
+        ) as exc:
+            logger.warning(
+                "[etoc] Could not load fragments in parallel, loading serially: %s",
+                exc,
+            )
+        except (yaml.YAMLError, ValueError, ImportError):
+            # loading errors are re-raised by loading serially in the main process,
+            # so that they are not pickled
+            pass
+    return [_load_content(content, suffix, encoding) for content, suffix in contents]
+
+
+def _file_stamps(paths: List[str]) -> Tuple[Tuple[str, int, int], ...]:
+    """Return the (path, modification time, size) of files."""
+    stamps = []
+    for path in paths:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            stamps.append((path, -1, -1))
+        else:
+            stamps.append((path, stat.st_mtime_ns, stat.st_size))
+    return tuple(stamps)
+
+
+def _fragments_unchanged(site_map: SiteMap) -> bool:
+    """Check the content of all fragments included in a site-map are unchanged."""
+    for path, (key, _) in site_map.fragments.items():
+        try:
+            content = Path(path).read_bytes()
+        except OSError:
+            return False
+        if content_key(content) != key:
+            return False
+    return True
+
+
+def _read_cache_file(cache_path: Path, cls: type = SiteMap) -> Any:
+    """Read an object from the cache, returning None if it cannot be read."""
+    try:
+        # objects were validated before being cached
+        with cache_path.open("rb") as handle, trusted_construction():
+            obj = pickle.load(handle)
+    except FileNotFoundError:
+        return None
+    except Exception as exc:
+        logger.debug("[etoc] Ignoring unreadable cache file %s: %s", cache_path, exc)
+        return None
+    return obj if isinstance(obj, cls) else None
+
+
+def _write_cache_file(cache_path: Path, obj: Any) -> None:
+    """Write an object to the cache.
+
+    The file is written to a temporary file and then moved into place,
+    so that concurrent readers never see a partially written file.
+    Failures are ignored, since the cache is only an optimisation.
+    """
+    tmp_name: Optional[str] = None
+    try:
+        cache_path.parent.mkdir(parents=True, exist_ok=True)
+        with tempfile.NamedTemporaryFile(
+            "wb", dir=cache_path.parent, suffix=".tmp", delete=False
+        ) as handle:
+            tmp_name = handle.name
+            pickle.dump(obj, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_name, cache_path)
+    except OSError as exc:
+        logger.debug("[etoc] Could not write cache file %s: %s", cache_path, exc)
+        if tmp_name is not None:
+            with suppress(OSError):
+                os.unlink(tmp_name)
+
+
+def _prune_cache_dir(cache_dir: Path, max_entries: int) -> None:
+    """Remove the least recently written entries, if there are too many."""
+    entries = []
+    for entry in cache_dir.glob("*.pickle"):
+        try:
+            entries.append((entry.stat().st_mtime_ns, entry))
+        except OSError:
+            # removed by another process
+            continue
+    entries.sort(reverse=True)
+    for _, entry in entries[max_entries:]:
+        with suppress(OSError):
+            entry.unlink()
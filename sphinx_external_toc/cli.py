@@ -1,14 +1,16 @@
 from pathlib import Path, PurePosixPath
+import sys
 
 import click
-import yaml
 
 from sphinx_external_toc import __version__
+from sphinx_external_toc._compat import yaml_dump
 from sphinx_external_toc.parsing import (
     FILE_FORMATS,
     create_toc_dict,
-    parse_toc_yaml,
+    parse_toc_file_with_errors,
 )
+from sphinx_external_toc.streaming import parse_toc_stream
 from sphinx_external_toc.tools import (
     create_site_from_toc,
     create_site_map_from_path,
@@ -24,10 +26,23 @@ def main():
 
 @main.command("parse")
 @click.argument("toc_file", type=click.Path(exists=True, file_okay=True))
-def parse_toc(toc_file):
+@click.option(
+    "-a",
+    "--all-errors",
+    is_flag=True,
+    help="Report all errors in the ToC file, rather than stopping at the first.",
+)
+def parse_toc(toc_file, all_errors):
     """Parse a ToC file to a site-map YAML."""
-    site_map = parse_toc_yaml(toc_file)
-    click.echo(yaml.dump(site_map.as_json(), sort_keys=False, default_flow_style=False))
+    if all_errors:
+        site_map, errors = parse_toc_file_with_errors(toc_file)
+        if errors:
+            for error in errors:
+                click.secho(f"{error.path or '/'}: {error}", fg="red", err=True)
+            raise click.ClickException(f"{len(errors)} error(s) found in ToC file")
+    else:
+        site_map = parse_toc_stream(toc_file)
+    _echo_yaml(site_map.as_json())
 
 
 @main.command("to-project")
@@ -122,9 +137,9 @@ def create_toc(site_dir, extension, index, skip_match, guess_titles, file_format
             words = name.split("_")
             # remove first word if is an integer
             words = words[1:] if words and all(c.isdigit() for c in words[0]) else words
-            site_map[docname].title = " ".join(words).capitalize()
+            site_map.set_title(docname, " ".join(words).capitalize())
     data = create_toc_dict(site_map)
-    click.echo(yaml.dump(data, sort_keys=False, default_flow_style=False))
+    _echo_yaml(data)
 
 
 @main.command("migrate")
@@ -144,11 +159,21 @@ def create_toc(site_dir, extension, index, skip_match, guess_titles, file_format
 def migrate_toc(toc_file, format, output):
     """Migrate a ToC from a previous revision."""
     toc = migrate_jupyter_book(Path(toc_file))
-    content = yaml.dump(toc, sort_keys=False, default_flow_style=False)
     if output:
         path = Path(output)
         path.parent.mkdir(exist_ok=True, parents=True)
-        path.write_text(content, encoding="utf8")
+        with path.open("w", encoding="utf8") as handle:
+            yaml_dump(toc, handle)
         click.secho(f"Written to: {path}", fg="green")
     else:
-        click.echo(content)
+        _echo_yaml(toc)
+
+
+def _echo_yaml(data) -> None:
+    """Write data as YAML to stdout, as it is emitted.
+
+    The output is the same as ``click.echo(yaml_dump(data))``.
+    """
+    yaml_dump(data, sys.stdout)
+    sys.stdout.write("\n")
+    sys.stdout.flush()
@@ -0,0 +1,457 @@
+"""A `SiteMap` storing its documents in columns, for very large sites.
+
+Rather than one Python object per `Document`, `TocTree` and `FileItem`,
+the documents are stored in a table of names (each stored once),
+and ``array`` columns of integers, with toctrees and their items stored
+as compressed sparse rows (each document references a range of toctrees,
+and each toctree a range of items).
+Documents are created (as independent copies) when they are accessed.
+"""
+
+from array import array
+from collections.abc import Mapping, MutableMapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from ._compat import trusted_construction
+from .api import Document, FileItem, GlobItem, SiteMap, TocTree, UrlItem
+
+# item kinds
+_FILE, _GLOB, _URL = 0, 1, 2
+# toctree flags
+_HIDDEN, _REVERSED, _TITLESONLY, _NUMBERED_BOOL = 1, 2, 4, 8
+# restart_numbering None, False, True, in bits 4-5 of the flags
+_RESTART_SHIFT = 4
+
+
+class ColumnarDocuments(MutableMapping):
+    """A mapping of document names to documents, stored in columns.
+
+    Setting a document stores a copy of it, and getting a document returns
+    a new copy, so changing a returned document in-place has no effect.
+    The parent of each document name (see `SiteMap.position`) is also stored
+    in columns, and updated as documents are set or deleted.
+    """
+
+    __slots__ = (
+        "_names",
+        "_ids",
+        "_doc_position",
+        "_doc_order",
+        "_doc_tree_start",
+        "_doc_tree_count",
+        "_titles",
+        "_parent",
+        "_parent_tree",
+        "_parent_item",
+        "_parent_refs",
+        "_tree_item_start",
+        "_tree_item_count",
+        "_tree_flags",
+        "_tree_maxdepth",
+        "_tree_numbered",
+        "_tree_style",
+        "_captions",
+        "_styles",
+        "_style_ids",
+        "_item_kind",
+        "_item_ref",
+        "_strings",
+        "_string_ids",
+        "_urls",
+        "_len",
+        "_garbage",
+    )
+
+    def __init__(self) -> None:
+        # name table: name id -> name, and name -> name id,
+        # for the names of documents and of file items,
+        # so that each name is stored once
+        self._names: List[str] = []
+        self._ids: Dict[str, int] = {}
+        # name id columns (-1 if not a document, or no parent)
+        self._doc_position = array("q")
+        self._doc_tree_start = array("q")
+        self._doc_tree_count = array("i")
+        self._parent = array("q")
+        self._parent_tree = array("i")
+        self._parent_item = array("i")
+        # number of file items referencing each name
+        self._parent_refs = array("i")
+        self._titles: List[Optional[str]] = []
+        # name ids, in the order documents were added (-1 if deleted)
+        self._doc_order = array("q")
+        # toctree columns
+        self._tree_item_start = array("q")
+        self._tree_item_count = array("i")
+        self._tree_flags = array("B")
+        self._tree_maxdepth = array("i")
+        self._tree_numbered = array("i")
+        self._tree_style = array("i")
+        # toctree id -> caption (most toctrees have none)
+        self._captions: Dict[int, str] = {}
+        self._styles: List[Union[str, List[str]]] = []
+        self._style_ids: Dict[Union[str, Tuple[str, ...]], int] = {}
+        # item columns: kind, and the name id, string index or URL index
+        self._item_kind = array("B")
+        self._item_ref = array("q")
+        self._strings: List[str] = []
+        self._string_ids: Dict[str, int] = {}
+        self._urls: List[Tuple[str, Optional[str]]] = []
+        self._len = 0
+        # number of toctrees of replaced or deleted documents
+        self._garbage = 0
+
+    def _name_id(self, name: str) -> int:
+        """Return the id of a name, adding it to the name table if necessary."""
+        try:
+            return self._ids[name]
+        except KeyError:
+            pass
+        name = str(name)
+        name_id = self._ids[name] = len(self._names)
+        self._names.append(name)
+        self._titles.append(None)
+        self._doc_position.append(-1)
+        self._doc_tree_start.append(-1)
+        self._doc_tree_count.append(0)
+        self._parent.append(-1)
+        self._parent_tree.append(0)
+        self._parent_item.append(0)
+        self._parent_refs.append(0)
+        return name_id
+
+    def _string_id(self, value: str) -> int:
+        """Return the index of a (glob) string, adding it if necessary."""
+        try:
+            return self._string_ids[value]
+        except KeyError:
+            index = self._string_ids[value] = len(self._strings)
+            self._strings.append(value)
+            return index
+
+    def _style_id(self, style: Union[str, List[str]]) -> int:
+        """Return the index of a toctree style, adding it if necessary."""
+        key: Union[str, Tuple[str, ...]] = (
+            tuple(style) if isinstance(style, list) else style
+        )
+        try:
+            return self._style_ids[key]
+        except KeyError:
+            index = self._style_ids[key] = len(self._styles)
+            self._styles.append(style)
+            return index
+
+    def __contains__(self, docname: object) -> bool:
+        if not isinstance(docname, str):
+            return False
+        name_id = self._ids.get(docname)
+        return name_id is not None and self._doc_position[name_id] >= 0
+
+    def __len__(self) -> int:
+        return self._len
+
+    def __iter__(self) -> Iterator[str]:
+        for position, name_id in enumerate(self._doc_order):
+            if name_id >= 0 and self._doc_position[name_id] == position:
+                yield self._names[name_id]
+
+    def __getitem__(self, docname: str) -> Document:
+        name_id = self._ids.get(docname)
+        if name_id is None or self._doc_position[name_id] < 0:
+            raise KeyError(docname)
+        start = self._doc_tree_start[name_id]
+        with trusted_construction():
+            return Document(
+                self._names[name_id],
+                [
+                    self._toctree(tree_id)
+                    for tree_id in range(start, start + self._doc_tree_count[name_id])
+                ],
+                self._titles[name_id],
+            )
+
+    def _toctree(self, tree_id: int) -> TocTree:
+        """Create a toctree from the columns."""
+        flags = self._tree_flags[tree_id]
+        numbered: Union[bool, int] = self._tree_numbered[tree_id]
+        if flags & _NUMBERED_BOOL:
+            numbered = bool(numbered)
+        restart = (flags >> _RESTART_SHIFT) & 3
+        style = self._styles[self._tree_style[tree_id]]
+        start = self._tree_item_start[tree_id]
+        items: List[Union[GlobItem, FileItem, UrlItem]] = []
+        for item_id in range(start, start + self._tree_item_count[tree_id]):
+            kind, ref = self._item_kind[item_id], self._item_ref[item_id]
+            if kind == _FILE:
+                items.append(FileItem(self._names[ref]))
+            elif kind == _GLOB:
+                items.append(GlobItem(self._strings[ref]))
+            else:
+                items.append(UrlItem(*self._urls[ref]))
+        return TocTree(
+            items,
+            caption=self._captions.get(tree_id),
+            hidden=bool(flags & _HIDDEN),
+            maxdepth=self._tree_maxdepth[tree_id],
+            numbered=numbered,
+            reversed=bool(flags & _REVERSED),
+            titlesonly=bool(flags & _TITLESONLY),
+            style=list(style) if isinstance(style, list) else style,
+            restart_numbering=None if restart == 0 else restart == 2,
+        )
+
+    def __setitem__(self, docname: str, doc: Document) -> None:
+        name_id = self._name_id(docname)
+        orphans: List[int] = []
+        replaced = self._doc_position[name_id] >= 0
+        if replaced:
+            orphans = self._unindex_children(name_id)
+            self._garbage += self._doc_tree_count[name_id]
+        else:
+            self._doc_position[name_id] = len(self._doc_order)
+            self._doc_order.append(name_id)
+            self._len += 1
+        self._doc_tree_start[name_id] = len(self._tree_item_start)
+        self._doc_tree_count[name_id] = len(doc.subtrees)
+        self._titles[name_id] = doc.title
+        for tree in doc.subtrees:
+            self._append_toctree(tree)
+        self._index_children(name_id, replaced)
+        self._reindex_orphans(orphans)
+        if self._garbage > 1024 and self._garbage > len(self._tree_item_start) // 2:
+            self._compact_columns()
+
+    def _append_toctree(self, tree: TocTree) -> None:
+        """Append a toctree, and its items, to the columns."""
+        tree_id = len(self._tree_item_start)
+        self._tree_item_start.append(len(self._item_kind))
+        self._tree_item_count.append(len(tree.items))
+        flags = (
+            (_HIDDEN if tree.hidden else 0)
+            | (_REVERSED if tree.reversed else 0)
+            | (_TITLESONLY if tree.titlesonly else 0)
+            | (_NUMBERED_BOOL if isinstance(tree.numbered, bool) else 0)
+            | (
+                (0 if tree.restart_numbering is None else 1 + tree.restart_numbering)
+                << _RESTART_SHIFT
+            )
+        )
+        self._tree_flags.append(flags)
+        self._tree_maxdepth.append(tree.maxdepth)
+        self._tree_numbered.append(int(tree.numbered))
+        self._tree_style.append(self._style_id(tree.style))
+        if tree.caption is not None:
+            self._captions[tree_id] = tree.caption
+        for item in tree.items:
+            if isinstance(item, FileItem):
+                self._item_kind.append(_FILE)
+                self._item_ref.append(self._name_id(item))
+            elif isinstance(item, GlobItem):
+                self._item_kind.append(_GLOB)
+                self._item_ref.append(self._string_id(str(item)))
+            else:
+                self._item_kind.append(_URL)
+                self._item_ref.append(len(self._urls))
+                self._urls.append((item.url, item.title))
+
+    def __delitem__(self, docname: str) -> None:
+        name_id = self._ids.get(docname)
+        if name_id is None or self._doc_position[name_id] < 0:
+            raise KeyError(docname)
+        orphans = self._unindex_children(name_id)
+        self._garbage += self._doc_tree_count[name_id]
+        self._doc_order[self._doc_position[name_id]] = -1
+        self._doc_position[name_id] = -1
+        self._doc_tree_start[name_id] = -1
+        self._doc_tree_count[name_id] = 0
+        self._titles[name_id] = None
+        self._len -= 1
+        self._reindex_orphans(orphans)
+
+    def _child_items(self, name_id: int) -> Iterator[Tuple[int, int, int]]:
+        """Yield the (toctree index, item index, name id) of the file items
+        of a document.
+        """
+        start = self._doc_tree_start[name_id]
+        for tree_index in range(self._doc_tree_count[name_id]):
+            tree_id = start + tree_index
+            item_start = self._tree_item_start[tree_id]
+            for item_index in range(self._tree_item_count[tree_id]):
+                if self._item_kind[item_start + item_index] == _FILE:
+                    yield (
+                        tree_index,
+                        item_index,
+                        self._item_ref[item_start + item_index],
+                    )
+
+    def _index_children(self, name_id: int, replaced: bool = False) -> None:
+        """Set the parent of the children of a document,
+        if they do not already have one, or (for a replaced document,
+        which keeps its place in the order of documents) it is a later document.
+        """
+        position = self._doc_position[name_id]
+        for tree_index, item_index, child_id in self._child_items(name_id):
+            self._parent_refs[child_id] += 1
+            parent = self._parent[child_id]
+            if parent < 0 or (
+                replaced and parent != name_id and self._doc_position[parent] > position
+            ):
+                self._parent[child_id] = name_id
+                self._parent_tree[child_id] = tree_index
+                self._parent_item[child_id] = item_index
+
+    def _unindex_children(self, name_id: int) -> List[int]:
+        """Unset the parent of the children of a document.
+
+        :return: the children whose parent was unset,
+            which are also referenced by another document
+        """
+        orphans = []
+        for _, _, child_id in self._child_items(name_id):
+            self._parent_refs[child_id] -= 1
+            if self._parent[child_id] == name_id:
+                self._parent[child_id] = -1
+                if self._parent_refs[child_id]:
+                    orphans.append(child_id)
+        return orphans
+
+    def _reindex_orphans(self, orphans: List[int]) -> None:
+        """Set the parent of children left without one,
+        to the first document referencing them.
+        """
+        pending = {child_id for child_id in orphans if self._parent[child_id] < 0}
+        for name_id in self._doc_order:
+            if not pending:
+                break
+            if name_id < 0:
+                continue
+            for tree_index, item_index, child_id in self._child_items(name_id):
+                if child_id in pending:
+                    pending.discard(child_id)
+                    self._parent[child_id] = name_id
+                    self._parent_tree[child_id] = tree_index
+                    self._parent_item[child_id] = item_index
+
+    def _compact_columns(self) -> None:
+        """Rebuild the columns, without the toctrees of replaced
+        or deleted documents (and without unused names).
+
+        The columns are built in a new instance, whose state then replaces
+        the state of this one.
+        """
+        new = type(self)()
+        # the documents are set in order, so their children are indexed as before
+        for docname in self:
+            new[docname] = self[docname]
+        for name in self.__slots__:
+            setattr(self, name, getattr(new, name))
+
+    @property
+    def parents(self) -> "ColumnarParents":
+        """Return a mapping of document names to their position in their parent."""
+        return ColumnarParents(self)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Return the state for pickling (without the derived name ids)."""
+        return {name: getattr(self, name) for name in self.__slots__ if name != "_ids"}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Restore the state from pickling."""
+        for name, value in state.items():
+            setattr(self, name, value)
+        self._ids = {name: name_id for name_id, name in enumerate(self._names)}
+
+
+class ColumnarParents(Mapping):
+    """A view of the parent columns of `ColumnarDocuments`,
+    mapping a child name to its (parent docname, toctree index, item index).
+    """
+
+    __slots__ = ("_docs",)
+
+    def __init__(self, docs: ColumnarDocuments) -> None:
+        self._docs = docs
+
+    def __getitem__(self, name: str) -> Tuple[str, int, int]:
+        docs = self._docs
+        name_id = docs._ids.get(name)
+        if name_id is None or docs._parent[name_id] < 0:
+            raise KeyError(name)
+        return (
+            docs._names[docs._parent[name_id]],
+            docs._parent_tree[name_id],
+            docs._parent_item[name_id],
+        )
+
+    def __contains__(self, name: object) -> bool:
+        if not isinstance(name, str):
+            return False
+        name_id = self._docs._ids.get(name)
+        return name_id is not None and self._docs._parent[name_id] >= 0
+
+    def __iter__(self) -> Iterator[str]:
+        docs = self._docs
+        for name_id, parent in enumerate(docs._parent):
+            if parent >= 0:
+                yield docs._names[name_id]
+
+    def __len__(self) -> int:
+        return sum(1 for parent in self._docs._parent if parent >= 0)
+
+
+class ColumnarSiteMap(SiteMap):
+    """A `SiteMap`, storing its documents in columns (see `ColumnarDocuments`).
+
+    This uses much less memory, and creates far fewer objects (for the garbage
+    collector to track), than `SiteMap` for very large sites,
+    at the cost of creating documents when they are accessed.
+    Documents are stored as copies, so re-set a document after changing it.
+    """
+
+    __slots__ = ()
+
+    def _create_docs(self) -> ColumnarDocuments:
+        """Return the mapping to store documents in."""
+        return ColumnarDocuments()
+
+    @classmethod
+    def from_site_map(cls, site_map: SiteMap) -> "ColumnarSiteMap":
+        """Create from a site-map.
+
+        :param site_map: site-map to copy
+        :return: columnar site-map
+        """
+        new = cls(site_map.root, meta=site_map.meta, file_format=site_map.file_format)
+        for docname, doc in site_map.items():
+            if docname != site_map.root.docname:
+                new[docname] = doc
+        return new
+
+    def to_site_map(self) -> SiteMap:
+        """Return a site-map, storing documents as objects.
+
+        :return: site-map
+        """
+        site_map = SiteMap(self.root, meta=self.meta, file_format=self.file_format)
+        for docname, doc in self.items():
+            if docname != self.root.docname:
+                site_map[docname] = doc
+        return site_map
+
+    @property
+    def root(self) -> Document:
+        """Return the root document of the ToC tree.
+
+        :return: root document
+        """
+        return self._docs[self._root.docname]
+
+    def _parent_index(self) -> ColumnarParents:  # type: ignore[override]
+        """Return the parent columns of the documents."""
+        return self._docs.parents  # type: ignore[attr-defined]
+
+    def _index_children(self, doc: Document, replaced: bool = False) -> None:
+        """Do nothing, since the parent columns are updated by the documents."""
+
+    def _unindex_children(self, doc: Document) -> None:
+        """Do nothing, since the parent columns are updated by the documents."""
@@ -13,11 +13,12 @@ from sphinx.errors import ExtensionError
 from sphinx.transforms import SphinxTransform
 from sphinx.util import logging
 from sphinx.util.docutils import SphinxDirective
-from sphinx.util.matching import Matcher, patfilter, patmatch
+from sphinx.util.matching import Matcher
 
 from ._compat import findall
-from .api import Document, FileItem, GlobItem, SiteMap, UrlItem
-from .parsing import parse_toc_yaml
+from .api import ChangeKind, Document, FileItem, GlobItem, SiteMap, UrlItem
+from .cache import CACHE_DIRNAME, parse_toc_cached
+from .parsing import parse_toc_file
 
 logger = logging.getLogger(__name__)
 
@@ -48,14 +49,6 @@ def create_warning(
     return None
 
 
-def remove_suffix(docname: str, suffixes: List[str]) -> str:
-    """Remove any suffixes."""
-    for suffix in suffixes:
-        if docname.endswith(suffix):
-            return docname[: -len(suffix)]
-    return docname
-
-
 def parse_toc_to_env(app: Sphinx, config: Config) -> None:
     """Parse the external toc file and store it in the Sphinx environment.
 
@@ -72,13 +65,27 @@ def parse_toc_to_env(app: Sphinx, config: Config) -> None:
     if not path.is_file():
         raise ExtensionError(f"[etoc] `external_toc_path` is not a file: {path}")
     try:
-        site_map = parse_toc_yaml(path)
+        if config["external_toc_cache"]:
+            site_map = parse_toc_cached(
+                path, cache_dir=Path(app.doctreedir) / CACHE_DIRNAME
+            )
+        else:
+            site_map = parse_toc_file(path)
     except Exception as exc:
         raise ExtensionError(f"[etoc] {exc}") from exc
     config.external_site_map = site_map
 
+    # index the documents by their docname without suffix,
+    # warning about documents that would have the same docname
+    for indexed, ignored in site_map.set_source_suffixes(config.source_suffix):
+        logger.warning(
+            "[etoc] Ignoring document %r in ToC, with the same docname as %r",
+            ignored,
+            indexed,
+        )
+
     # Update the master_doc to the root doc of the site map
-    root_doc = remove_suffix(site_map.root.docname, config.source_suffix)
+    root_doc = site_map.strip_suffix(site_map.root.docname)
     if config["master_doc"] != root_doc:
         logger.info("[etoc] Changing master_doc to '%s'", root_doc)
     config["master_doc"] = root_doc
@@ -111,7 +118,7 @@ def parse_toc_to_env(app: Sphinx, config: Config) -> None:
                         for i in range(len(components))
                     )
                     # don't exclude docnames matching globs
-                    or any(patmatch(posix_no_suffix, pat) for pat in site_map.globs())
+                    or site_map.matches_any_glob(posix_no_suffix)
                 ):
                     new_excluded.append(posix)
         if new_excluded:
@@ -133,14 +140,28 @@ def add_changed_toctrees(
 ) -> Set[str]:
     """Add docs with new or changed toctrees to changed list."""
     previous_map = getattr(app.env, "external_site_map", None)
-    # move external_site_map from config to env
+    # copy external_site_map from config to env
+    # (pickled once with the env, which references the config)
     site_map: SiteMap
     app.env.external_site_map = site_map = app.config.external_site_map
     # Compare to previous map, to record docnames with new or changed toctrees
+    # (by content hash, so that an unchanged map is not compared further)
     if not previous_map:
         return set()
-    filenames = site_map.get_changed(previous_map)
-    return {remove_suffix(name, app.config.source_suffix) for name in filenames}
+    filenames: Set[str] = set()
+    for change in site_map.diff(previous_map):
+        if change.kind in (ChangeKind.ADDED, ChangeKind.OPTIONS, ChangeKind.CHILDREN):
+            # the toctrees inserted in the document changed
+            filenames.add(change.docname)
+        elif change.kind == ChangeKind.TITLE:
+            # the title is used in the toctree of the parent
+            parent = site_map.parent(change.docname)
+            if parent is not None:
+                filenames.add(parent)
+        # removed documents are removed from the toctree of their parent,
+        # and moved documents are moved by the toctrees of their parents,
+        # which are changed
+    return {site_map.strip_suffix(name) for name in filenames}
 
 
 class TableOfContentsNode(nodes.Element):
@@ -181,15 +202,10 @@ def insert_toctrees(app: Sphinx, doctree: nodes.document) -> None:
     )
 
     site_map: SiteMap = app.env.external_site_map
-    doc_item: Optional[Document] = site_map.get(app.env.docname)
-
-    # check for matches with suffix
-    # TODO check in sitemap, that we do not have multiple docs of the same name
-    # (strip extensions on creation)
-    for suffix in app.config.source_suffix:
-        if doc_item is not None:
-            break
-        doc_item = site_map.get(app.env.docname + suffix)
+    if site_map.source_suffixes is None:
+        site_map.set_source_suffixes(app.config.source_suffix)
+    # match the docname with or without suffix
+    doc_item: Optional[Document] = site_map.get_by_source_name(app.env.docname)
 
     if doc_item is None or not doc_item.subtrees:
         if toc_placeholders:
@@ -256,7 +272,7 @@ def insert_toctrees(app: Sphinx, doctree: nodes.document) -> None:
                 docname = str(entry)
                 title = child_doc_item.title
 
-                docname = remove_suffix(docname, app.config.source_suffix)
+                docname = site_map.strip_suffix(docname)
 
                 if docname not in app.env.found_docs:
                     if excluded(app.env.doc2path(docname, None)):
@@ -272,7 +288,7 @@ def insert_toctrees(app: Sphinx, doctree: nodes.document) -> None:
 
             elif isinstance(entry, GlobItem):
                 patname = str(entry)
-                docnames = sorted(patfilter(all_docnames, patname))
+                docnames = sorted(site_map.filter_glob(patname, all_docnames))
                 for docname in docnames:
                     all_docnames.remove(docname)  # don't include it again
                     subnode["entries"].append((None, docname))
@@ -331,7 +347,12 @@ def ensure_index_file(app: Sphinx, exception: Optional[Exception]) -> None:
     ):
         return
 
-    root_name = remove_suffix(app.config.master_doc, app.config.source_suffix)
+    site_map: Optional[SiteMap] = getattr(app.env, "external_site_map", None)
+    root_name = (
+        app.config.master_doc
+        if site_map is None
+        else site_map.strip_suffix(site_map.root.docname)
+    )
 
     if app.builder.name == "dirhtml":
         redirect_url = f"{root_name}/index.html"
@@ -2,12 +2,30 @@
 
 from collections.abc import Mapping
 from dataclasses import dataclass, fields
+import hashlib
+import json
+from operator import attrgetter
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
-
-import yaml
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
-from ._compat import DC_SLOTS, field
+from ._compat import (
+    DC_SLOTS,
+    add_slots,
+    field,
+    load_toc_content,
+    trusted_construction,
+    validate_values,
+)
 from .api import Document, FileItem, GlobItem, SiteMap, TocTree, UrlItem
 
 DEFAULT_SUBTREES_KEY = "subtrees"
@@ -17,6 +35,7 @@ ROOT_KEY = "root"
 FILE_KEY = "file"
 GLOB_KEY = "glob"
 URL_KEY = "url"
+INCLUDE_KEY = "include"
 TOCTREE_OPTIONS = (
     "caption",
     "hidden",
@@ -28,7 +47,19 @@ TOCTREE_OPTIONS = (
     "restart_numbering",
 )
 
+# (option, default value) for each toctree option, in the order above
+# TODO handle default_factory
+_TOCTREE_DEFAULTS: Tuple[Tuple[str, Any], ...] = tuple(
+    sorted(
+        ((f.name, f.default) for f in fields(TocTree) if f.name in TOCTREE_OPTIONS),
+        key=lambda option: TOCTREE_OPTIONS.index(option[0]),
+    )
+)
+# get the toctree option values, as a tuple in the order above
+_get_toctree_options = attrgetter(*TOCTREE_OPTIONS)
 
+
+@add_slots
 @dataclass(**DC_SLOTS)
 class FileFormat:
     """Mapping of keys for subtrees and items, dependant on depth in the ToC."""
@@ -80,34 +111,425 @@ FILE_FORMATS: Dict[str, FileFormat] = {
 class MalformedError(Exception):
     """Raised if the `_toc.yml` file is malformed."""
 
+    def __init__(self, message: str, path: Optional[str] = None) -> None:
+        super().__init__(message)
+        #: The path of the malformed entry within the ToC, e.g. ``/entries/3/``
+        self.path = path
+
 
-def parse_toc_yaml(path: Union[str, Path], encoding: str = "utf8") -> SiteMap:
+def parse_toc_yaml(
+    path: Union[str, Path],
+    encoding: str = "utf8",
+    *,
+    cache_dir: Union[None, str, Path] = None,
+    max_workers: Optional[int] = None,
+    content: Optional[bytes] = None,
+    site_map_class: Callable[..., SiteMap] = SiteMap,
+) -> SiteMap:
     """Parse the ToC file.
 
+    Entries of the form ``{"include": "path/to/fragment.yml"}`` are replaced
+    by the entry (or list of entries) in that fragment file,
+    whose path is relative to the including file.
+
     :param path: `_toc.yml` file path
     :param encoding: `_toc.yml` file character encoding
+    :param cache_dir: folder in which to cache loaded fragments
+    :param max_workers: maximum number of processes for loading fragments
+    :param content: the content of the file, if already read
+    :param site_map_class: the class of site map to create,
+        e.g. `ColumnarSiteMap` or `SqliteSiteMap` for very large sites
+    :return: parsed site map
+    """
+    data, fragments = _load_toc_file(
+        path,
+        encoding,
+        ".yml",
+        cache_dir=cache_dir,
+        max_workers=max_workers,
+        content=content,
+    )
+    site_map = parse_toc_data(data, site_map_class=site_map_class)
+    if fragments is not None:
+        site_map.set_fragments(*fragments)
+    return site_map
+
+
+def parse_toc_file(
+    path: Union[str, Path],
+    encoding: str = "utf8",
+    *,
+    cache_dir: Union[None, str, Path] = None,
+    max_workers: Optional[int] = None,
+    content: Optional[bytes] = None,
+    site_map_class: Callable[..., SiteMap] = SiteMap,
+) -> SiteMap:
+    """Parse the ToC file, with the loader for its file suffix.
+
+    ``.json`` files are loaded as JSON, ``.toml`` files as TOML,
+    and all other files as YAML (see `parse_toc_yaml`).
+    Included fragment files are likewise loaded according to their suffix.
+
+    :param path: ToC file path
+    :param encoding: ToC file character encoding
+    :param cache_dir: folder in which to cache loaded fragments
+    :param max_workers: maximum number of processes for loading fragments
+    :param content: the content of the file, if already read
+    :param site_map_class: the class of site map to create,
+        e.g. `ColumnarSiteMap` or `SqliteSiteMap` for very large sites
+    :return: parsed site map
+    """
+    data, fragments = _load_toc_file(
+        path,
+        encoding,
+        Path(path).suffix,
+        cache_dir=cache_dir,
+        max_workers=max_workers,
+        content=content,
+    )
+    site_map = parse_toc_data(data, site_map_class=site_map_class)
+    if fragments is not None:
+        site_map.set_fragments(*fragments)
+    return site_map
+
+
+def parse_toc_file_with_errors(
+    path: Union[str, Path], encoding: str = "utf8"
+) -> Tuple[Optional[SiteMap], List[MalformedError]]:
+    """Parse the ToC file, continuing past problems.
+
+    See `parse_toc_file` and `parse_toc_data_with_errors`.
+
+    :param path: ToC file path
+    :param encoding: ToC file character encoding
+    :return: site map of all valid entries (or None if the root is invalid),
+        and the errors found
+    """
+    try:
+        data, fragments = _load_toc_file(path, encoding, Path(path).suffix)
+    except MalformedError as exc:
+        return None, [exc]
+    site_map, errors = parse_toc_data_with_errors(data)
+    if site_map is not None and fragments is not None:
+        site_map.set_fragments(*fragments)
+    return site_map, errors
+
+
+def _load_toc_file(
+    path: Union[str, Path],
+    encoding: str,
+    suffix: str,
+    *,
+    cache_dir: Union[None, str, Path] = None,
+    max_workers: Optional[int] = None,
+    content: Optional[bytes] = None,
+) -> Tuple[Any, Optional[Tuple[Dict[str, Tuple[str, str]], Dict[str, str]]]]:
+    """Load the ToC file data, resolving any includes.
+
+    :param suffix: the file suffix, selecting the loader
+    :return: the data, and the fragments and document fragments
+        (or None if there are no includes)
+    """
+    path = Path(path)
+    if content is None:
+        content = path.read_bytes()
+    data = load_toc_content(content, suffix, encoding)
+    if not _contains_include(data):
+        return data, None
+
+    from .cache import content_key
+
+    data, fragments, doc_fragments = _resolve_includes(
+        data,
+        path.resolve(),
+        content_key(content),
+        encoding=encoding,
+        cache_dir=cache_dir,
+        max_workers=max_workers,
+    )
+    return data, (fragments, doc_fragments)
+
+
+def _is_include(item: Any) -> bool:
+    """Return whether a list item is an include entry."""
+    return isinstance(item, Mapping) and INCLUDE_KEY in item
+
+
+def _find_includes(
+    data: Any, depth: int
+) -> Tuple[List[Tuple[list, int, Any, int]], Dict[int, Tuple[Any, Any]]]:
+    """Find the include entries in ToC data.
+
+    :param data: ToC data
+    :param depth: the ToC depth of the data
+    :return: (sites, parents), where sites is a list of
+        (entries list, index, include value, ToC depth),
+        and parents maps the ``id`` of each container to its parent and key
+    """
+    parents: Dict[int, Tuple[Any, Any]] = {}
+    sites: List[Tuple[list, int, Any, int]] = []
+    stack: List[Tuple[Any, int]] = [(data, depth)]
+    while stack:
+        node, node_depth = stack.pop()
+        if isinstance(node, Mapping):
+            if FILE_KEY in node or ROOT_KEY in node:
+                node_depth += 1
+            children = list(node.items())
+        else:
+            children = list(enumerate(node))
+        for key, child in children:
+            if isinstance(node, list) and _is_include(child):
+                sites.append((node, key, child[INCLUDE_KEY], node_depth))
+            elif isinstance(child, (Mapping, list)):
+                parents[id(child)] = (node, key)
+                stack.append((child, node_depth))
+    return sites, parents
+
+
+def _contains_include(data: Any) -> bool:
+    """Return whether the ToC data contains any include entries."""
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Mapping):
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            for item in node:
+                if _is_include(item):
+                    return True
+                stack.append(item)
+    return False
+
+
+def _splice_includes(
+    data: Any,
+    sites: Sequence[Tuple[list, int, Any, int]],
+    parents: Dict[int, Tuple[Any, Any]],
+    replacements: Sequence[List[Any]],
+) -> Any:
+    """Replace include entries by their fragment entries.
+
+    The data is not mutated (since it may be cached):
+    only the containers on the path to each include entry are copied.
+    """
+    copies: Dict[int, Any] = {}
+    for node, *_ in sites:
+        chain = []
+        while id(node) not in copies:
+            chain.append(node)
+            if id(node) not in parents:
+                break
+            node = parents[id(node)][0]
+        for node in reversed(chain):
+            copies[id(node)] = copy = (
+                list(node) if isinstance(node, list) else dict(node)
+            )
+            if id(node) in parents:
+                parent, key = parents[id(node)]
+                copies[id(parent)][key] = copy
+    # replace from the end of each list, so that the indices remain valid
+    for site_index in sorted(
+        range(len(sites)), key=lambda i: (id(sites[i][0]), sites[i][1]), reverse=True
+    ):
+        entries, index = sites[site_index][:2]
+        copies[id(entries)][index : index + 1] = replacements[site_index]
+    return copies.get(id(data), data)
+
+
+def _resolve_includes(
+    data: Any,
+    path: Path,
+    key: str,
+    *,
+    encoding: str,
+    cache_dir: Union[None, str, Path],
+    max_workers: Optional[int],
+) -> Tuple[Any, Dict[str, Tuple[str, str]], Dict[str, str]]:
+    """Replace include entries in the ToC data by the content of their files.
+
+    Fragment files are loaded in waves (fragments included by the root file,
+    then fragments included by those, etc), so that the fragments in each wave
+    can be loaded concurrently.
+
+    :return: (resolved data, fragments, doc_fragments), where fragments maps the
+        path of each fragment to its (content key, structural key), and
+        doc_fragments maps each docname to the path of the fragment it is in.
+        The structural key of a fragment changes if its content,
+        the content of fragments it includes, or the context it is included in,
+        changes.
+    """
+    from .cache import load_fragments
+
+    if isinstance(data, Mapping):
+        context = json.dumps(
+            [data.get(FILE_FORMAT_KEY), data.get("defaults")],
+            sort_keys=True,
+            default=str,
+        )
+    else:
+        context = ""
+    root = str(path)
+    loaded: Dict[str, Tuple[str, Any]] = {root: (key, data)}
+    depths: Dict[str, int] = {root: 0}
+    includes: Dict[str, List[str]] = {}
+    include_sites: Dict[str, Tuple[List[Tuple[list, int, Any, int]], Dict]] = {}
+    wave = [root]
+    while wave:
+        new_paths: List[str] = []
+        for source in wave:
+            include_sites[source] = _find_includes(loaded[source][1], depths[source])
+            includes[source] = []
+            for _, _, include, depth in include_sites[source][0]:
+                if not isinstance(include, str):
+                    raise MalformedError(
+                        f"'{INCLUDE_KEY}' value is not a string: {include!r} @ '{source}'"
+                    )
+                target = str((Path(source).parent / include).resolve())
+                if not Path(target).is_file():
+                    raise MalformedError(
+                        f"'{INCLUDE_KEY}' file not found: {include!r} @ '{source}'"
+                    )
+                includes[source].append(target)
+                if target not in depths:
+                    depths[target] = depth
+                    new_paths.append(target)
+        for target, result in zip(
+            new_paths,
+            load_fragments(
+                [Path(target) for target in new_paths],
+                encoding=encoding,
+                cache_dir=cache_dir,
+                max_workers=max_workers,
+            ),
+        ):
+            loaded[target] = result
+        wave = new_paths
+
+    # resolve fragments, depth first, so that included fragments are resolved first
+    resolved: Dict[str, List[Any]] = {}
+    structural_keys: Dict[str, str] = {}
+    stack: List[Tuple[str, Tuple[str, ...]]] = [(root, ())]
+    while stack:
+        source, ancestors = stack[-1]
+        if source in resolved:
+            stack.pop()
+            continue
+        pending = [target for target in includes[source] if target not in resolved]
+        if pending:
+            for target in pending:
+                if target in ancestors or target == source:
+                    raise MalformedError(f"'{INCLUDE_KEY}' cycle: {target!r}")
+                stack.append((target, (*ancestors, source)))
+            continue
+        stack.pop()
+        source_key, source_data = loaded[source]
+        hasher = hashlib.sha256(f"{source_key}:{depths[source]}:{context}".encode())
+        for target in includes[source]:
+            hasher.update(structural_keys[target].encode())
+        structural_keys[source] = hasher.hexdigest()
+        source_data = _splice_includes(
+            source_data,
+            *include_sites[source],
+            [resolved[target] for target in includes[source]],
+        )
+        if source == root:
+            resolved[source] = source_data
+        elif isinstance(source_data, Mapping):
+            resolved[source] = [source_data]
+        elif isinstance(source_data, list):
+            resolved[source] = source_data
+        else:
+            raise MalformedError(
+                f"'{INCLUDE_KEY}' file is not a mapping or list: '{source}'"
+            )
+
+    fragments = {
+        source: (loaded[source][0], structural_keys[source])
+        for source in loaded
+        if source != root
+    }
+    doc_fragments = {
+        docname: source
+        for source in fragments
+        for docname in _iter_fragment_docnames(loaded[source][1])
+    }
+    return resolved[root], fragments, doc_fragments
+
+
+def _iter_fragment_docnames(data: Any) -> List[str]:
+    """Return the docnames of documents defined in a fragment
+    (not including those in the fragments it includes).
+    """
+    docnames = []
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Mapping):
+            if isinstance(node.get(FILE_KEY), str):
+                docnames.append(node[FILE_KEY])
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+    return docnames
+
+
+def parse_toc_data(
+    data: Dict[str, Any], *, site_map_class: Callable[..., SiteMap] = SiteMap
+) -> SiteMap:
+    """Parse a dictionary of the ToC.
+
+    :param data: ToC data dictionary
+    :param site_map_class: the class of site map to create,
+        e.g. `ColumnarSiteMap` or `SqliteSiteMap` for very large sites
+    :raises MalformedError: on the first problem found
     :return: parsed site map
     """
-    with Path(path).open(encoding=encoding) as handle:
-        data = yaml.safe_load(handle)
-    return parse_toc_data(data)
+    return _parse_toc_data(data, None, site_map_class)
+
+
+def parse_toc_data_with_errors(
+    data: Dict[str, Any],
+) -> Tuple[Optional[SiteMap], List[MalformedError]]:
+    """Parse a dictionary of the ToC, continuing past problems.
 
+    Invalid entries (and any entries nested within them) are skipped,
+    and an error is recorded for each, with its ToC path (see `MalformedError.path`).
+
+    :param data: ToC data dictionary
+    :return: site map of all valid entries (or None if the root is invalid),
+        and the errors found
+    """
+    errors: List[MalformedError] = []
+    try:
+        site_map = _parse_toc_data(data, errors)
+    except MalformedError as exc:
+        errors.append(exc)
+        return None, errors
+    return site_map, errors
 
-def parse_toc_data(data: Dict[str, Any]) -> SiteMap:
+
+def _parse_toc_data(
+    data: Dict[str, Any],
+    errors: Optional[List[MalformedError]],
+    site_map_class: Callable[..., SiteMap] = SiteMap,
+) -> SiteMap:
     """Parse a dictionary of the ToC.
 
     :param data: ToC data dictionary
+    :param errors: list to record non-fatal errors in (or None to raise them)
+    :param site_map_class: the class of site map to create
     :return: parsed site map
     """
     if not isinstance(data, Mapping):
-        raise MalformedError(f"toc is not a mapping: {type(data)}")
+        raise MalformedError(f"toc is not a mapping: {type(data)}", "/")
 
     try:
         file_format = FILE_FORMATS[data.get(FILE_FORMAT_KEY, "default")]
     except KeyError:
         raise MalformedError(
             f"'{FILE_FORMAT_KEY}' key value not recognised: "
-            f"'{data.get(FILE_FORMAT_KEY, 'default')}'"
+            f"'{data.get(FILE_FORMAT_KEY, 'default')}'",
+            "/",
         )
 
     defaults: Dict[str, Any] = {
@@ -116,20 +538,52 @@ def parse_toc_data(data: Dict[str, Any]) -> SiteMap:
     }
 
     doc_item, docs_list = _parse_doc_item(
-        data, defaults, "/", depth=0, is_root=True, file_format=file_format
+        data,
+        defaults,
+        "/",
+        depth=0,
+        is_root=True,
+        file_format=file_format,
+        errors=errors,
     )
+    if doc_item is None:
+        # the root document is required
+        assert errors
+        raise errors.pop()
 
-    site_map = SiteMap(
+    site_map = site_map_class(
         root=doc_item,
         meta=data.get("meta"),
         file_format=data.get(FILE_FORMAT_KEY),
     )
 
-    _parse_docs_list(docs_list, site_map, defaults, depth=1, file_format=file_format)
+    with site_map.bulk_update():
+        _parse_docs_list(
+            docs_list,
+            site_map,
+            defaults,
+            depth=1,
+            file_format=file_format,
+            errors=errors,
+        )
 
     return site_map
 
 
+def _report(
+    errors: Optional[List[MalformedError]],
+    message: str,
+    path: str,
+    cause: Optional[Exception] = None,
+) -> None:
+    """Raise an error, or record it if errors are being collected."""
+    error = MalformedError(message, path)
+    if errors is None:
+        raise error from cause
+    error.__cause__ = cause
+    errors.append(error)
+
+
 def _parse_doc_item(
     data: Dict[str, Any],
     defaults: Dict[str, Any],
@@ -138,7 +592,8 @@ def _parse_doc_item(
     depth: int,
     file_format: FileFormat,
     is_root: bool = False,
-) -> Tuple[Document, Sequence[Tuple[str, Dict[str, Any]]]]:
+    errors: Optional[List[MalformedError]] = None,
+) -> Tuple[Optional[Document], Sequence[Tuple[str, Dict[str, Any]]]]:
     """Parse a single doc item.
 
     :param data: doc item dictionary
@@ -147,12 +602,15 @@ def _parse_doc_item(
     :param depth: recursive depth (starts at 0)
     :param file_format: doc item file format
     :param is_root: whether this is the root item, defaults to False
-    :raises MalformedError: invalid doc item
-    :return: parsed doc item
+    :param errors: list to record errors in, skipping invalid entries
+        (or None to raise them)
+    :raises MalformedError: invalid doc item (if ``errors`` is None)
+    :return: parsed doc item (or None if invalid), and the child doc items
     """
     file_key = ROOT_KEY if is_root else FILE_KEY
     if file_key not in data:
-        raise MalformedError(f"'{file_key}' key not found @ '{path}'")
+        _report(errors, f"'{file_key}' key not found @ '{path}'", path)
+        return None, []
 
     subtrees_key = file_format.get_subtrees_key(depth)
     items_key = file_format.get_items_key(depth)
@@ -171,23 +629,28 @@ def _parse_doc_item(
     }
     if not allowed_keys.issuperset(data.keys()):
         unknown_keys = set(data.keys()).difference(allowed_keys)
-        raise MalformedError(
-            f"Unknown keys found: {unknown_keys!r}, allowed: {allowed_keys!r} @ '{path}'"
+        _report(
+            errors,
+            f"Unknown keys found: {unknown_keys!r}, allowed: {allowed_keys!r} @ '{path}'",
+            path,
         )
 
     shorthand_used = False
     if items_key in data:
         # this is a shorthand for defining a single subtree
         if subtrees_key in data:
-            raise MalformedError(
-                f"Both '{subtrees_key}' and '{items_key}' found @ '{path}'"
+            _report(
+                errors,
+                f"Both '{subtrees_key}' and '{items_key}' found @ '{path}'",
+                path,
             )
         subtrees_data = [{items_key: data[items_key], **data.get("options", {})}]
         shorthand_used = True
     elif subtrees_key in data:
         subtrees_data = data[subtrees_key]
         if not (isinstance(subtrees_data, Sequence) and subtrees_data):
-            raise MalformedError(f"'{subtrees_key}' not a non-empty list @ '{path}'")
+            _report(errors, f"'{subtrees_key}' not a non-empty list @ '{path}'", path)
+            subtrees_data = []
         path = f"{path}{subtrees_key}/"
     else:
         subtrees_data = []
@@ -195,60 +658,57 @@ def _parse_doc_item(
     _known_link_keys = {FILE_KEY, GLOB_KEY, URL_KEY}
 
     toctrees = []
+    # list of docs that need to be parsed recursively (and path)
+    docs_to_be_parsed_list = []
     for toc_idx, toc_data in enumerate(subtrees_data):
         toc_path = path if shorthand_used else f"{path}{toc_idx}/"
 
         if not (isinstance(toc_data, Mapping) and items_key in toc_data):
-            raise MalformedError(
-                f"entry not a mapping containing '{items_key}' key @ '{toc_path}'"
+            _report(
+                errors,
+                f"entry not a mapping containing '{items_key}' key @ '{toc_path}'",
+                toc_path,
             )
+            continue
 
         items_data = toc_data[items_key]
 
         if not (isinstance(items_data, Sequence) and items_data):
-            raise MalformedError(f"'{items_key}' not a non-empty list @ '{toc_path}'")
+            _report(
+                errors, f"'{items_key}' not a non-empty list @ '{toc_path}'", toc_path
+            )
+            continue
 
         # generate items list
         items: List[Union[GlobItem, FileItem, UrlItem]] = []
+        toc_docs_list = []
         for item_idx, item_data in enumerate(items_data):
-            if not isinstance(item_data, Mapping):
-                raise MalformedError(
-                    f"entry not a mapping type @ '{toc_path}{items_key}/{item_idx}'"
-                )
-
-            link_keys = _known_link_keys.intersection(item_data)
-
-            # validation checks
-            if not link_keys:
-                raise MalformedError(
-                    f"entry does not contain one of "
-                    f"{_known_link_keys!r} @ '{toc_path}{items_key}/{item_idx}'"
-                )
-            if not len(link_keys) == 1:
-                raise MalformedError(
-                    f"entry contains incompatible keys "
-                    f"{link_keys!r} @ '{toc_path}{items_key}/{item_idx}'"
+            item_path = f"{toc_path}{items_key}/{item_idx}"
+            item = _parse_link_item(
+                item_data,
+                item_path,
+                subtrees_key=subtrees_key,
+                items_key=items_key,
+                link_keys=_known_link_keys,
+                errors=errors,
+            )
+            if item is None:
+                continue
+            items.append(item)
+            if isinstance(item, FileItem):
+                toc_docs_list.append(
+                    (
+                        (
+                            f"{path}/{items_key}/{item_idx}/"
+                            if shorthand_used
+                            else f"{path}{toc_idx}/{items_key}/{item_idx}/"
+                        ),
+                        item_data,
+                    )
                 )
-            for item_key in (GLOB_KEY, URL_KEY):
-                for other_key in (subtrees_key, items_key):
-                    if link_keys == {item_key} and other_key in item_data:
-                        raise MalformedError(
-                            f"entry contains incompatible keys "
-                            f"'{item_key}' and '{other_key}' @ '{toc_path}{items_key}/{item_idx}'"
-                        )
-
-            try:
-                if link_keys == {FILE_KEY}:
-                    items.append(FileItem(item_data[FILE_KEY]))
-                elif link_keys == {GLOB_KEY}:
-                    items.append(GlobItem(item_data[GLOB_KEY]))
-                elif link_keys == {URL_KEY}:
-                    items.append(UrlItem(item_data[URL_KEY], item_data.get("title")))
-            except (ValueError, TypeError) as exc:
-                exc_arg = exc.args[0] if exc.args else ""
-                raise MalformedError(
-                    f"entry validation @ '{toc_path}{items_key}/{item_idx}': {exc_arg}"
-                ) from exc
+        if not items:
+            # all items were invalid (and reported)
+            continue
 
         # generate toc key-word arguments
         keywords = {k: toc_data[k] for k in TOCTREE_OPTIONS if k in toc_data}
@@ -257,36 +717,29 @@ def _parse_doc_item(
                 keywords[key] = defaults[key]
 
         try:
-            toc_item = TocTree(items=items, **keywords)
+            # the items are already known to be valid
+            _validate_toctree_options(keywords)
+            with trusted_construction():
+                toc_item = TocTree(items=items, **keywords)
         except (ValueError, TypeError) as exc:
             exc_arg = exc.args[0] if exc.args else ""
-            raise MalformedError(
-                f"toctree validation @ '{toc_path}': {exc_arg}"
-            ) from exc
+            _report(
+                errors, f"toctree validation @ '{toc_path}': {exc_arg}", toc_path, exc
+            )
+            continue
         toctrees.append(toc_item)
+        docs_to_be_parsed_list.extend(toc_docs_list)
 
     try:
-        doc_item = Document(
-            docname=data[file_key], title=data.get("title"), subtrees=toctrees
-        )
+        validate_values(Document, docname=data[file_key], title=data.get("title"))
+        with trusted_construction():
+            doc_item = Document(
+                docname=data[file_key], title=data.get("title"), subtrees=toctrees
+            )
     except (ValueError, TypeError) as exc:
         exc_arg = exc.args[0] if exc.args else ""
-        raise MalformedError(f"doc validation @ '{path}': {exc_arg}") from exc
-
-    # list of docs that need to be parsed recursively (and path)
-    docs_to_be_parsed_list = [
-        (
-            (
-                f"{path}/{items_key}/{ii}/"
-                if shorthand_used
-                else f"{path}{ti}/{items_key}/{ii}/"
-            ),
-            item_data,
-        )
-        for ti, toc_data in enumerate(subtrees_data)
-        for ii, item_data in enumerate(toc_data[items_key])
-        if FILE_KEY in item_data
-    ]
+        _report(errors, f"doc validation @ '{path}': {exc_arg}", path, exc)
+        return None, []
 
     return (
         doc_item,
@@ -294,6 +747,91 @@ def _parse_doc_item(
     )
 
 
+def _parse_link_item(
+    item_data: Any,
+    item_path: str,
+    *,
+    subtrees_key: str,
+    items_key: str,
+    link_keys: Set[str],
+    errors: Optional[List[MalformedError]],
+) -> Union[None, GlobItem, FileItem, UrlItem]:
+    """Parse a single item of a toctree.
+
+    :return: parsed item (or None if invalid)
+    """
+    if not isinstance(item_data, Mapping):
+        _report(errors, f"entry not a mapping type @ '{item_path}'", item_path)
+        return None
+
+    item_keys = link_keys.intersection(item_data)
+
+    # validation checks
+    if not item_keys:
+        _report(
+            errors,
+            f"entry does not contain one of {link_keys!r} @ '{item_path}'",
+            item_path,
+        )
+        return None
+    if not len(item_keys) == 1:
+        _report(
+            errors,
+            f"entry contains incompatible keys {item_keys!r} @ '{item_path}'",
+            item_path,
+        )
+        return None
+    for item_key in (GLOB_KEY, URL_KEY):
+        for other_key in (subtrees_key, items_key):
+            if item_keys == {item_key} and other_key in item_data:
+                _report(
+                    errors,
+                    f"entry contains incompatible keys "
+                    f"'{item_key}' and '{other_key}' @ '{item_path}'",
+                    item_path,
+                )
+                return None
+
+    try:
+        if item_keys == {FILE_KEY}:
+            return FileItem(item_data[FILE_KEY])
+        if item_keys == {GLOB_KEY}:
+            return GlobItem(item_data[GLOB_KEY])
+        return UrlItem(item_data[URL_KEY], item_data.get("title"))
+    except (ValueError, TypeError) as exc:
+        exc_arg = exc.args[0] if exc.args else ""
+        _report(errors, f"entry validation @ '{item_path}': {exc_arg}", item_path, exc)
+        return None
+
+
+# previously validated toctree options: ((name, type, value), ...)
+_VALID_TOCTREE_OPTIONS: Set[Tuple[Tuple[str, type, Any], ...]] = set()
+
+
+def _validate_toctree_options(options: Dict[str, Any]) -> None:
+    """Validate toctree options, skipping (hashable) options already validated.
+
+    Most toctrees of a ToC share the same few combinations of options,
+    so these only need to be validated once.
+
+    :param options: toctree options
+    :raises ValueError, TypeError: invalid options
+    """
+    try:
+        key = tuple((name, type(value), value) for name, value in options.items())
+        hash(key)
+    except TypeError:
+        # e.g. a list of styles
+        validate_values(TocTree, **options)
+        return
+    if key in _VALID_TOCTREE_OPTIONS:
+        return
+    validate_values(TocTree, **options)
+    if len(_VALID_TOCTREE_OPTIONS) >= 1024:
+        _VALID_TOCTREE_OPTIONS.clear()
+    _VALID_TOCTREE_OPTIONS.add(key)
+
+
 def _parse_docs_list(
     docs_list: Sequence[Tuple[str, Dict[str, Any]]],
     site_map: SiteMap,
@@ -301,35 +839,47 @@ def _parse_docs_list(
     *,
     depth: int,
     file_format: FileFormat,
+    errors: Optional[List[MalformedError]] = None,
 ):
-    """Parse a list of docs.
+    """Parse a list of docs, and all their descendants.
+
+    The docs are walked depth-first, in ToC order, using an explicit stack
+    rather than recursion, so that the depth of the ToC is not limited by
+    Python's recursion limit.
 
     :param docs_list: sequence of doc items
     :param site_map: site map
     :param defaults: default doc item values
-    :param depth: recursive depth (starts at 0)
+    :param depth: depth of the doc items (starts at 0)
     :param file_format: doc item file format
-    :raises MalformedError: doc file used multiple times
+    :param errors: list to record errors in, skipping invalid docs
+        (or None to raise them)
+    :raises MalformedError: doc file used multiple times (if ``errors`` is None)
     """
-    for child_path, doc_data in docs_list:
+    stack: List[Tuple[int, str, Dict[str, Any]]] = [
+        (depth, child_path, doc_data) for child_path, doc_data in reversed(docs_list)
+    ]
+    while stack:
+        doc_depth, child_path, doc_data = stack.pop()
         docname = doc_data[FILE_KEY]
         if docname in site_map:
-            raise MalformedError(f"document file used multiple times: '{docname}'")
+            _report(
+                errors, f"document file used multiple times: '{docname}'", child_path
+            )
+            continue
         child_item, child_docs_list = _parse_doc_item(
             doc_data,
             defaults,
             child_path,
-            depth=depth,
+            depth=doc_depth,
             file_format=file_format,
+            errors=errors,
         )
+        if child_item is None:
+            continue
         site_map[docname] = child_item
-
-        _parse_docs_list(
-            child_docs_list,
-            site_map,
-            defaults,
-            depth=depth + 1,
-            file_format=file_format,
+        stack.extend(
+            (doc_depth + 1, path, data) for path, data in reversed(child_docs_list)
         )
 
 
@@ -373,6 +923,11 @@ def _docitem_to_dict(
 ) -> Dict[str, Any]:
     """Create ToC dictionary from a `Document` and a `SiteMap`.
 
+    The documents are walked depth-first, in ToC order, using an explicit stack
+    rather than recursion. The dictionary of each child document is added to
+    its parent's items when the parent is converted, then filled in when the
+    child is popped from the stack.
+
     :param doc_item: document instance
     :param site_map: site map
     :param depth: recursive depth (starts at 0)
@@ -385,66 +940,78 @@ def _docitem_to_dict(
     :raises TypeError: invalid ToC item
     :return: parsed ToC dictionary
     """
-    file_key = ROOT_KEY if is_root else FILE_KEY
-    subtrees_key = file_format.get_subtrees_key(depth)
-    items_key = file_format.get_items_key(depth)
-
-    # protect against infinite recursion
     parsed_docnames = parsed_docnames or set()
-    if doc_item.docname in parsed_docnames:
-        raise RecursionError(f"{doc_item.docname!r} in site-map multiple times")
-    parsed_docnames.add(doc_item.docname)
-
-    data: Dict[str, Any] = {}
-
-    data[file_key] = doc_item.docname
-    if doc_item.title is not None:
-        data["title"] = doc_item.title
-
-    if not doc_item.subtrees:
-        return data
-
-    def _parse_item(item):
-        if isinstance(item, FileItem):
-            if item in site_map:
-                return _docitem_to_dict(
-                    site_map[item],
-                    site_map,
-                    depth=depth + 1,
-                    file_format=file_format,
-                    skip_defaults=skip_defaults,
-                    parsed_docnames=parsed_docnames,
-                )
-            return {FILE_KEY: str(item)}
-        if isinstance(item, GlobItem):
-            return {GLOB_KEY: str(item)}
-        if isinstance(item, UrlItem):
-            if item.title is not None:
-                return {URL_KEY: item.url, "title": item.title}
-            return {URL_KEY: item.url}
-        raise TypeError(item)
-
-    data[subtrees_key] = []
-    # TODO handle default_factory
-    _defaults = {f.name: f.default for f in fields(TocTree)}
-    for toctree in doc_item.subtrees:
-        # only add these keys if their value is not the default
-        toctree_data = {
-            key: getattr(toctree, key)
-            for key in TOCTREE_OPTIONS
-            if (not skip_defaults) or getattr(toctree, key) != _defaults[key]
-        }
-        toctree_data[items_key] = [_parse_item(s) for s in toctree.items]
-        data[subtrees_key].append(toctree_data)
-
-    # apply shorthand if possible (one toctree in subtrees)
-    if len(data[subtrees_key]) == 1 and items_key in data[subtrees_key][0]:
-        old_toctree_data = data.pop(subtrees_key)[0]
-        # move options to options key
-        if len(old_toctree_data) > 1:
-            data["options"] = {
-                k: v for k, v in old_toctree_data.items() if k != items_key
-            }
-        data[items_key] = old_toctree_data[items_key]
+    root_data: Dict[str, Any] = {}
+    # (document, dictionary to fill, depth, file key), or (invalid item, ...)
+    stack: List[Tuple[Any, Dict[str, Any], int, str]] = [
+        (doc_item, root_data, depth, ROOT_KEY if is_root else FILE_KEY)
+    ]
+    while stack:
+        doc_item, data, depth, file_key = stack.pop()
+        if not isinstance(doc_item, Document):
+            raise TypeError(doc_item)
 
-    return data
+        # protect against infinite recursion
+        if doc_item.docname in parsed_docnames:
+            raise RecursionError(f"{doc_item.docname!r} in site-map multiple times")
+        parsed_docnames.add(doc_item.docname)
+
+        data[file_key] = str(doc_item.docname)
+        if doc_item.title is not None:
+            data["title"] = doc_item.title
+
+        if not doc_item.subtrees:
+            continue
+
+        items_key = file_format.get_items_key(depth)
+        children: List[Tuple[Any, Dict[str, Any], int, str]] = []
+        subtrees_data = []
+        for toctree in doc_item.subtrees:
+            options = _get_toctree_options(toctree)
+            if skip_defaults:
+                # only add these keys if their value is not the default
+                toctree_data = {
+                    key: value
+                    for (key, default), value in zip(_TOCTREE_DEFAULTS, options)
+                    if value != default
+                }
+            else:
+                toctree_data = dict(zip(TOCTREE_OPTIONS, options))
+            items_data: List[Dict[str, Any]] = []
+            for item in toctree.items:
+                if isinstance(item, FileItem):
+                    if item in site_map:
+                        child_data: Dict[str, Any] = {}
+                        items_data.append(child_data)
+                        children.append(
+                            (site_map[item], child_data, depth + 1, FILE_KEY)
+                        )
+                    else:
+                        items_data.append({FILE_KEY: str(item)})
+                elif isinstance(item, GlobItem):
+                    items_data.append({GLOB_KEY: str(item)})
+                elif isinstance(item, UrlItem):
+                    if item.title is not None:
+                        items_data.append({URL_KEY: item.url, "title": item.title})
+                    else:
+                        items_data.append({URL_KEY: item.url})
+                else:
+                    # raised when reached in ToC order
+                    children.append((item, {}, depth + 1, FILE_KEY))
+            toctree_data[items_key] = items_data
+            subtrees_data.append(toctree_data)
+
+        if len(subtrees_data) == 1:
+            # apply shorthand (one toctree in subtrees)
+            toctree_data = subtrees_data[0]
+            items_data = toctree_data.pop(items_key)
+            # move options to options key
+            if toctree_data:
+                data["options"] = toctree_data
+            data[items_key] = items_data
+        else:
+            data[file_format.get_subtrees_key(depth)] = subtrees_data
+
+        stack.extend(reversed(children))
+
+    return root_data
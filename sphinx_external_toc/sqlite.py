@@ -0,0 +1,651 @@
+"""A `SiteMap` storing its documents in a SQLite database, for very large sites.
+
+The documents, their toctrees and items are stored in tables of a database
+(usually a local file), indexed by document name and by parent,
+and documents are loaded when they are accessed,
+with a cache of the most recently used documents.
+Other processes (e.g. Sphinx build workers) can open the same database,
+with `SqliteSiteMap.open`, and site-maps are pickled as the path to the database.
+"""
+
+from collections import OrderedDict
+from collections.abc import Mapping, MutableMapping
+from contextlib import contextmanager
+import json
+import os
+import sqlite3
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from .api import (
+    Document,
+    FileItem,
+    FrozenDocument,
+    FrozenTocTree,
+    FrozenUrlItem,
+    GlobItem,
+    SiteMap,
+    UrlItem,
+)
+
+# item kinds
+_FILE, _GLOB, _URL = 0, 1, 2
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS properties (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS documents (
+    id INTEGER PRIMARY KEY,
+    docname TEXT NOT NULL UNIQUE,
+    title TEXT
+);
+CREATE TABLE IF NOT EXISTS toctrees (
+    doc_id INTEGER NOT NULL,
+    tree_index INTEGER NOT NULL,
+    caption TEXT,
+    hidden INTEGER NOT NULL,
+    maxdepth INTEGER NOT NULL,
+    numbered TEXT NOT NULL,
+    reversed INTEGER NOT NULL,
+    titlesonly INTEGER NOT NULL,
+    style TEXT NOT NULL,
+    restart_numbering INTEGER,
+    PRIMARY KEY (doc_id, tree_index)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS items (
+    doc_id INTEGER NOT NULL,
+    tree_index INTEGER NOT NULL,
+    item_index INTEGER NOT NULL,
+    kind INTEGER NOT NULL,
+    value TEXT NOT NULL,
+    title TEXT,
+    PRIMARY KEY (doc_id, tree_index, item_index)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS parents (
+    child TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    tree_index INTEGER NOT NULL,
+    item_index INTEGER NOT NULL
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS parents_by_parent ON parents (parent);
+CREATE INDEX IF NOT EXISTS items_by_file ON items (value) WHERE kind = 0;
+"""
+# set the parent of a child to its position in the first document referencing it
+# (using the items_by_file index, so the file kind is not a parameter)
+_REINDEX_PARENT = """
+INSERT OR REPLACE INTO parents
+SELECT items.value, documents.docname, items.tree_index, items.item_index
+FROM items JOIN documents ON documents.id = items.doc_id
+WHERE items.kind = 0 AND items.value = ?
+ORDER BY items.doc_id, items.tree_index, items.item_index
+LIMIT 1
+"""
+_TABLES = ("properties", "documents", "toctrees", "items", "parents")
+
+
+class SqliteDocuments(MutableMapping):
+    """A mapping of document names to documents, stored in a SQLite database.
+
+    Setting a document stores a copy of it, and getting a document returns
+    a new copy (of a cached, immutable document),
+    so changing a returned document in-place has no effect.
+    The parent of each document name (see `SiteMap.position`) is also stored,
+    and updated as documents are set or deleted.
+    As for a dict, documents should not be added or deleted while iterating.
+    """
+
+    __slots__ = ("_path", "_cache_size", "_cache", "_connections", "_depth")
+
+    def __init__(
+        self, path: Union[str, "os.PathLike[str]"] = ":memory:", cache_size: int = 1024
+    ) -> None:
+        """Set up the database, which is connected to on first use
+        (creating its tables if necessary).
+
+        :param path: path to the database file, or ``:memory:``
+        :param cache_size: maximum number of documents to cache
+        """
+        self._path = os.fspath(path)
+        self._cache_size = cache_size
+        # docname -> document, in least to most recently used order
+        self._cache: "OrderedDict[str, FrozenDocument]" = OrderedDict()
+        # process ID -> connection
+        self._connections: Dict[int, sqlite3.Connection] = {}
+        # the number of nested transactions
+        self._depth = 0
+
+    @property
+    def path(self) -> str:
+        """Return the path to the database file."""
+        return self._path
+
+    @property
+    def connection(self) -> sqlite3.Connection:
+        """Return the connection to the database, opened on first use in each process.
+
+        A forked process (e.g. a process pool worker) opens its own connection
+        to a database file. The connections inherited from the parent process
+        are kept, but not used or closed,
+        since closing them would release the parent's locks on the file.
+
+        :raises RuntimeError: an in-memory database, used by another process
+        """
+        connection = self._connections.get(os.getpid())
+        if connection is None:
+            connection = self._connect(_SCHEMA)
+        return connection
+
+    def _connect(self, script: str) -> sqlite3.Connection:
+        """Open the connection of this process, and run a SQL script with it."""
+        if self._connections:
+            if self._path == ":memory:":
+                raise RuntimeError(
+                    "an in-memory database cannot be used by another process"
+                )
+            # the parent's transaction and cache are not those of this process
+            self._depth = 0
+            self._cache.clear()
+        connection = sqlite3.connect(
+            self._path, isolation_level=None, check_same_thread=False
+        )
+        connection.executescript(script)
+        self._connections[os.getpid()] = connection
+        return connection
+
+    @property
+    def in_transaction(self) -> bool:
+        """Return whether a transaction is open (see `transaction`)."""
+        return self._depth > 0
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Group changes in one transaction,
+        which is rolled back if an exception is raised.
+
+        Nested transactions are part of the outermost transaction.
+        """
+        connection = self.connection
+        if self._depth == 0:
+            connection.execute("BEGIN")
+        self._depth += 1
+        try:
+            yield connection
+        except BaseException:
+            self._depth -= 1
+            if self._depth == 0:
+                connection.execute("ROLLBACK")
+                self._cache.clear()
+            raise
+        self._depth -= 1
+        if self._depth == 0:
+            connection.execute("COMMIT")
+
+    def get_property(self, key: str) -> Any:
+        """Return a (JSON) property of the site-map, e.g. its root document name.
+
+        :param key: property name
+        :raises KeyError: property not set
+        """
+        row = self.connection.execute(
+            "SELECT value FROM properties WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(key)
+        return json.loads(row[0])
+
+    def set_property(self, key: str, value: Any) -> None:
+        """Set a (JSON) property of the site-map.
+
+        :param key: property name
+        :param value: property value
+        """
+        self.connection.execute(
+            "INSERT OR REPLACE INTO properties VALUES (?, ?)", (key, json.dumps(value))
+        )
+
+    def clear(self) -> None:
+        """Remove all documents (but not the properties)."""
+        with self.transaction() as connection:
+            for table in _TABLES:
+                if table != "properties":
+                    connection.execute(f"DELETE FROM {table}")
+        self._cache.clear()
+
+    def __contains__(self, docname: object) -> bool:
+        if docname in self._cache:
+            return True
+        if not isinstance(docname, str):
+            return False
+        return (
+            self.connection.execute(
+                "SELECT 1 FROM documents WHERE docname = ?", (docname,)
+            ).fetchone()
+            is not None
+        )
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def __iter__(self) -> Iterator[str]:
+        for (docname,) in self.connection.execute(
+            "SELECT docname FROM documents ORDER BY id"
+        ):
+            yield docname
+
+    def __getitem__(self, docname: str) -> Document:
+        doc = self._cache.get(docname)
+        if doc is None:
+            doc = self._load(docname)
+            self._cache[docname] = doc
+            if len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        else:
+            self._cache.move_to_end(docname)
+        return doc.to_document()
+
+    def _load(self, docname: str) -> FrozenDocument:
+        """Load a document from the database."""
+        if not isinstance(docname, str):
+            raise KeyError(docname)
+        connection = self.connection
+        row = connection.execute(
+            "SELECT id, title FROM documents WHERE docname = ?", (docname,)
+        ).fetchone()
+        if row is None:
+            raise KeyError(docname)
+        doc_id, title = row
+        items: Dict[int, List[Union[GlobItem, FileItem, FrozenUrlItem]]] = {}
+        for tree_index, kind, value, item_title in connection.execute(
+            "SELECT tree_index, kind, value, title FROM items "
+            "WHERE doc_id = ? ORDER BY tree_index, item_index",
+            (doc_id,),
+        ):
+            items.setdefault(tree_index, []).append(
+                FileItem(value)
+                if kind == _FILE
+                else GlobItem(value)
+                if kind == _GLOB
+                else FrozenUrlItem(value, item_title)
+            )
+        subtrees: List[FrozenTocTree] = []
+        for (
+            tree_index,
+            caption,
+            hidden,
+            maxdepth,
+            numbered,
+            reversed_,
+            titlesonly,
+            style,
+            restart_numbering,
+        ) in connection.execute(
+            "SELECT tree_index, caption, hidden, maxdepth, numbered, reversed, "
+            "titlesonly, style, restart_numbering FROM toctrees "
+            "WHERE doc_id = ? ORDER BY tree_index",
+            (doc_id,),
+        ):
+            style = json.loads(style)
+            subtrees.append(
+                FrozenTocTree(
+                    tuple(items.get(tree_index, ())),
+                    caption=caption,
+                    hidden=bool(hidden),
+                    maxdepth=maxdepth,
+                    numbered=json.loads(numbered),
+                    reversed=bool(reversed_),
+                    titlesonly=bool(titlesonly),
+                    style=tuple(style) if isinstance(style, list) else style,
+                    restart_numbering=None
+                    if restart_numbering is None
+                    else bool(restart_numbering),
+                )
+            )
+        return FrozenDocument(str(docname), tuple(subtrees), title)
+
+    def __setitem__(self, docname: str, doc: Document) -> None:
+        docname = str(docname)
+        self._cache.pop(docname, None)
+        with self.transaction() as connection:
+            row = connection.execute(
+                "SELECT id FROM documents WHERE docname = ?", (docname,)
+            ).fetchone()
+            # the children of a replaced document whose parent was unset
+            orphans: List[str] = []
+            if row is None:
+                cursor = connection.execute(
+                    "INSERT INTO documents (docname, title) VALUES (?, ?)",
+                    (docname, doc.title),
+                )
+                # always set after an INSERT
+                assert cursor.lastrowid is not None
+                doc_id = cursor.lastrowid
+            else:
+                doc_id = row[0]
+                connection.execute(
+                    "UPDATE documents SET title = ? WHERE id = ?", (doc.title, doc_id)
+                )
+                orphans = self._delete_children(connection, doc_id, docname)
+            trees: List[Tuple[Any, ...]] = []
+            items: List[Tuple[Any, ...]] = []
+            parents: List[Tuple[str, str, int, int]] = []
+            for tree_index, tree in enumerate(doc.subtrees):
+                trees.append(
+                    (
+                        doc_id,
+                        tree_index,
+                        tree.caption,
+                        tree.hidden,
+                        tree.maxdepth,
+                        json.dumps(tree.numbered),
+                        tree.reversed,
+                        tree.titlesonly,
+                        json.dumps(tree.style),
+                        tree.restart_numbering,
+                    )
+                )
+                for item_index, item in enumerate(tree.items):
+                    if isinstance(item, UrlItem):
+                        kind, value, title = _URL, item.url, item.title
+                    else:
+                        kind = _FILE if isinstance(item, FileItem) else _GLOB
+                        value, title = str(item), None
+                    items.append((doc_id, tree_index, item_index, kind, value, title))
+                    if kind == _FILE:
+                        parents.append((value, docname, tree_index, item_index))
+            if trees:
+                connection.executemany(
+                    "INSERT INTO toctrees VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", trees
+                )
+            if items:
+                connection.executemany(
+                    "INSERT INTO items VALUES (?, ?, ?, ?, ?, ?)", items
+                )
+            if parents:
+                # a child keeps the first parent it was indexed by
+                connection.executemany(
+                    "INSERT OR IGNORE INTO parents VALUES (?, ?, ?, ?)", parents
+                )
+            if row is not None:
+                # a replaced document keeps its place in the order of documents,
+                # so it may now be the first to reference its children,
+                # and the other documents referencing its old children are indexed
+                connection.executemany(
+                    _REINDEX_PARENT,
+                    [
+                        (child,)
+                        for child in {*orphans, *(child for child, *_ in parents)}
+                    ],
+                )
+
+    def __delitem__(self, docname: str) -> None:
+        with self.transaction() as connection:
+            row = connection.execute(
+                "SELECT id FROM documents WHERE docname = ?", (str(docname),)
+            ).fetchone()
+            if row is None:
+                raise KeyError(docname)
+            connection.execute("DELETE FROM documents WHERE id = ?", (row[0],))
+            orphans = self._delete_children(connection, row[0], str(docname))
+            # index the other documents referencing its children
+            connection.executemany(_REINDEX_PARENT, [(child,) for child in orphans])
+        self._cache.pop(docname, None)
+
+    @staticmethod
+    def _delete_children(
+        connection: sqlite3.Connection, doc_id: int, docname: str
+    ) -> List[str]:
+        """Delete the toctrees and items of a document,
+        and unset the parent of its children.
+
+        :return: the children whose parent was unset
+        """
+        orphans = [
+            child
+            for (child,) in connection.execute(
+                "SELECT child FROM parents WHERE parent = ?", (docname,)
+            )
+        ]
+        connection.execute("DELETE FROM toctrees WHERE doc_id = ?", (doc_id,))
+        connection.execute("DELETE FROM items WHERE doc_id = ?", (doc_id,))
+        connection.execute("DELETE FROM parents WHERE parent = ?", (docname,))
+        return orphans
+
+    @property
+    def parents(self) -> "SqliteParents":
+        """Return a mapping of document names to their position in their parent."""
+        return SqliteParents(self)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        """Return the state for pickling: the path to the database file,
+        or the SQL to recreate an in-memory database.
+        """
+        state: Dict[str, Any] = {"path": self._path, "cache_size": self._cache_size}
+        if self._path == ":memory:":
+            state["dump"] = list(self.connection.iterdump())
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        """Restore the state from pickling (connecting on first use)."""
+        self._path, self._cache_size = state["path"], state["cache_size"]
+        self._cache = OrderedDict()
+        self._connections = {}
+        self._depth = 0
+        if "dump" in state:
+            # the dump also creates the tables
+            self._connect("\n".join(state["dump"]))
+
+
+class SqliteParents(Mapping):
+    """A view of the parents table of `SqliteDocuments`,
+    mapping a child name to its (parent docname, toctree index, item index).
+    """
+
+    __slots__ = ("_docs",)
+
+    def __init__(self, docs: SqliteDocuments) -> None:
+        self._docs = docs
+
+    def __getitem__(self, name: str) -> Tuple[str, int, int]:
+        row = self._docs.connection.execute(
+            "SELECT parent, tree_index, item_index FROM parents WHERE child = ?",
+            (str(name),),
+        ).fetchone()
+        if row is None:
+            raise KeyError(name)
+        return row
+
+    def __iter__(self) -> Iterator[str]:
+        for (name,) in self._docs.connection.execute("SELECT child FROM parents"):
+            yield name
+
+    def __len__(self) -> int:
+        return self._docs.connection.execute("SELECT COUNT(*) FROM parents").fetchone()[
+            0
+        ]
+
+
+class SqliteSiteMap(SiteMap):
+    """A `SiteMap`, storing its documents in a SQLite database
+    (see `SqliteDocuments`).
+
+    Only the most recently used documents are held in memory,
+    at the cost of loading documents from the database when they are accessed.
+    Documents are stored as copies, so re-set a document after changing it.
+
+    To parse a ToC to a database file, pass a callable creating the site-map,
+    e.g. ``parse_toc_file(path, site_map_class=partial(SqliteSiteMap, path=db_path))``.
+
+    If a change fails within `bulk_update` (or a single document is not stored),
+    the database transaction is rolled back, and so are the indexes built on demand,
+    the content hashes, and the journal of changes.
+    """
+
+    __slots__ = ()
+
+    def __init__(
+        self,
+        root: Document,
+        meta: Optional[Dict[str, Any]] = None,
+        file_format: Optional[str] = None,
+        *,
+        path: Union[str, "os.PathLike[str]"] = ":memory:",
+        cache_size: int = 1024,
+        overwrite: bool = False,
+    ) -> None:
+        """Create the site-map in a new database.
+
+        A database already holding a site-map is only overwritten if requested,
+        since other site-maps (e.g. opened by other processes, or unpickled)
+        may still be reading it.
+
+        :param root: root document
+        :param meta: site-map metadata
+        :param file_format: format of the file to write to
+        :param path: path to the database file, or ``:memory:``
+        :param cache_size: maximum number of documents to cache in memory
+        :param overwrite: remove any site-map already stored in the database
+        :raises FileExistsError: the database holds a site-map, and not ``overwrite``
+        """
+        self._docs = docs = SqliteDocuments(path, cache_size)
+        with docs.transaction():
+            try:
+                docs.get_property("root")
+            except KeyError:
+                pass
+            else:
+                if not overwrite:
+                    raise FileExistsError(f"database already holds a site-map: {path}")
+                docs.clear()
+            super().__init__(root, meta, file_format)
+            docs.set_property("root", str(root.docname))
+            docs.set_property("meta", self._meta)
+            docs.set_property("file_format", file_format)
+
+    def _create_docs(self) -> SqliteDocuments:
+        """Return the mapping to store documents in (opened in `__init__`)."""
+        return self._docs  # type: ignore[return-value]
+
+    @classmethod
+    def open(
+        cls, path: Union[str, "os.PathLike[str]"], cache_size: int = 1024
+    ) -> "SqliteSiteMap":
+        """Open a site-map stored in a database file, e.g. by another process.
+
+        :param path: path to the database file
+        :param cache_size: maximum number of documents to cache in memory
+        :raises KeyError: the database does not contain a site-map
+        :return: site-map
+        """
+        docs = SqliteDocuments(path, cache_size)
+        site_map = cls.__new__(cls)
+        site_map.__setstate__(
+            {
+                "_docs": docs,
+                "_root": docs[docs.get_property("root")],
+                "_meta": docs.get_property("meta"),
+                "_file_format": docs.get_property("file_format"),
+            }
+        )
+        return site_map
+
+    @classmethod
+    def from_site_map(
+        cls,
+        site_map: SiteMap,
+        *,
+        path: Union[str, "os.PathLike[str]"] = ":memory:",
+        cache_size: int = 1024,
+        overwrite: bool = False,
+    ) -> "SqliteSiteMap":
+        """Create from a site-map.
+
+        :param site_map: site-map to copy
+        :param path: path to the database file, or ``:memory:``
+        :param cache_size: maximum number of documents to cache in memory
+        :param overwrite: remove any site-map already stored in the database
+        :return: SQLite site-map
+        """
+        new = cls(
+            site_map.root,
+            meta=site_map.meta,
+            file_format=site_map.file_format,
+            path=path,
+            cache_size=cache_size,
+            overwrite=overwrite,
+        )
+        with new.bulk_update():
+            for docname, doc in site_map.items():
+                if docname != site_map.root.docname:
+                    new[docname] = doc
+        return new
+
+    def to_site_map(self) -> SiteMap:
+        """Return a site-map, storing documents as objects.
+
+        :return: site-map
+        """
+        site_map = SiteMap(self.root, meta=self.meta, file_format=self.file_format)
+        for docname, doc in self.items():
+            if docname != self.root.docname:
+                site_map[docname] = doc
+        return site_map
+
+    @property
+    def root(self) -> Document:
+        """Return the root document of the ToC tree.
+
+        :return: root document
+        """
+        return self._docs[self._root.docname]
+
+    @contextmanager
+    def bulk_update(self) -> Iterator[None]:
+        """Return a context manager to set or delete many documents
+        in one database transaction.
+
+        If an exception is raised, the transaction is rolled back,
+        and the indexes, content hashes and journal are reset to match.
+        """
+        docs: SqliteDocuments = self._docs  # type: ignore[assignment]
+        journal_length = len(self._journal)
+        try:
+            with docs.transaction():
+                yield
+        except BaseException:
+            # the indexes and hashes are rebuilt on demand
+            for name in self._INDEX_ATTRIBUTES:
+                setattr(self, name, None)
+            self._doc_hashes.clear()
+            self._map_hash = None
+            if not docs.in_transaction:
+                # only the outermost transaction is rolled back
+                del self._journal[journal_length:]
+            raise
+
+    def __setitem__(self, docname: str, item: Document) -> None:
+        """Set a document, rolling back the indexes if it cannot be stored.
+
+        :param docname: document name
+        :param item: document instance
+        """
+        with self.bulk_update():
+            super().__setitem__(docname, item)
+
+    def __delitem__(self, docname: str) -> None:
+        """Remove a document, rolling back the indexes if it cannot be removed.
+
+        :param docname: document name
+        """
+        with self.bulk_update():
+            super().__delitem__(docname)
+
+    def _parent_index(self) -> SqliteParents:  # type: ignore[override]
+        """Return the parents table of the documents."""
+        return self._docs.parents  # type: ignore[attr-defined]
+
+    def _index_children(self, doc: Document, replaced: bool = False) -> None:
+        """Do nothing, since the parents table is updated by the documents."""
+
+    def _unindex_children(self, doc: Document) -> None:
+        """Do nothing, since the parents table is updated by the documents."""
@@ -0,0 +1,422 @@
+"""Parse the ToC from a stream of YAML events,
+creating documents as they are read, rather than loading the whole file first.
+"""
+
+from pathlib import Path
+from typing import IO, Any, Dict, Generator, Iterator, List, Set, Tuple, Union
+
+import yaml
+from yaml.composer import ComposerError
+from yaml.constructor import ConstructorError, SafeConstructor
+from yaml.events import (
+    AliasEvent,
+    DocumentStartEvent,
+    Event,
+    MappingEndEvent,
+    MappingStartEvent,
+    ScalarEvent,
+    SequenceEndEvent,
+    SequenceStartEvent,
+    StreamEndEvent,
+)
+from yaml.resolver import Resolver
+
+from ._compat import YamlSafeLoader
+from .api import Document, SiteMap
+from .parsing import (
+    FILE_FORMAT_KEY,
+    FILE_FORMATS,
+    FILE_KEY,
+    GLOB_KEY,
+    INCLUDE_KEY,
+    URL_KEY,
+    FileFormat,
+    MalformedError,
+    _parse_doc_item,
+    parse_toc_file,
+    parse_toc_yaml,
+)
+
+_MERGE_TAG = "tag:yaml.org,2002:merge"
+_DEFAULT_COLLECTION_TAGS = {
+    None,
+    "!",
+    Resolver.DEFAULT_SEQUENCE_TAG,
+    Resolver.DEFAULT_MAPPING_TAG,
+}
+_OTHER_LINK_KEYS = {GLOB_KEY, URL_KEY}
+# anchor value for nodes containing streamed documents
+_STREAMED = object()
+
+# a parse step yields each completed ``(ToC order, document)``,
+# or a nested parse step to run (whose return value is sent back)
+_DocGenerator = Generator[Union[Tuple[int, Document], "_DocGenerator"], Any, Any]
+
+
+class StreamingUnsupported(Exception):
+    """Raised if the ToC uses a construct that cannot be streamed.
+
+    These are YAML merge keys or explicitly tagged collections,
+    aliases of nodes containing documents, ``include`` entries,
+    and the top-level ``format`` or ``defaults`` keys appearing after the root entries.
+    """
+
+
+def iter_toc_documents(
+    stream: Union[str, bytes, IO], *, loader: type = YamlSafeLoader
+) -> Iterator[Document]:
+    """Parse a ToC from YAML, yielding each document as soon as it is complete.
+
+    Documents are yielded after all their descendants, so the root is last.
+    They are also validated before their ancestors, so for a file with more than
+    one error, the error raised may differ from that of `parse_toc_yaml`.
+
+    :param stream: YAML text or file handle
+    :param loader: the YAML loader class, whose parser is used
+    :raises MalformedError: invalid ToC
+    :raises StreamingUnsupported: the ToC cannot be streamed
+    """
+    for _, doc in _TocStreamParser(stream, loader).documents():
+        yield doc
+
+
+def parse_toc_stream(
+    path: Union[str, Path], encoding: str = "utf8", *, loader: type = YamlSafeLoader
+) -> SiteMap:
+    """Parse the ToC file, building documents as the file is read.
+
+    This gives the same result as `parse_toc_yaml`, but the ToC data is never
+    held in memory as a whole. If the file cannot be streamed,
+    it is parsed with `parse_toc_yaml` instead,
+    and JSON or TOML files are parsed with `parse_toc_file`.
+
+    Since documents are validated before their parents when streamed,
+    an invalid file is also parsed with `parse_toc_yaml`,
+    so that the same (first) error is raised.
+
+    :param path: `_toc.yml` file path
+    :param encoding: `_toc.yml` file character encoding
+    :param loader: the YAML loader class, whose parser is used
+    :return: parsed site map
+    """
+    if Path(path).suffix.lower() in (".json", ".toml"):
+        return parse_toc_file(path, encoding=encoding)
+    with Path(path).open(encoding=encoding) as handle:
+        parser = _TocStreamParser(handle, loader)
+        try:
+            documents = list(parser.documents())
+        except (StreamingUnsupported, MalformedError, yaml.YAMLError):
+            documents = None
+    if documents is None:
+        return parse_toc_yaml(path, encoding=encoding)
+
+    # documents are created children first, so restore the ToC order
+    documents.sort(key=lambda item: item[0])
+    site_map = SiteMap(
+        root=documents[0][1], meta=parser.meta, file_format=parser.file_format
+    )
+    for _, doc in documents[1:]:
+        site_map[doc.docname] = doc
+    return site_map
+
+
+class _TocStreamParser:
+    """Create documents from YAML parser events.
+
+    Each mapping that may be a document is read key by key. The entries of its
+    toctrees are parsed as they are read, and replaced by
+    ``{"file": docname}`` stubs, so that at the end of the mapping the
+    (now shallow) data can be validated by the standard doc item parser.
+
+    Nested mappings and sequences are parsed by nested steps, run with an
+    explicit stack (see `_run`), so deeply nested ToCs do not hit the
+    recursion limit.
+    """
+
+    def __init__(self, stream: Union[str, bytes, IO], loader: type) -> None:
+        self._events: Iterator[Event] = yaml.parse(stream, Loader=loader)
+        self._resolver = Resolver()
+        self._constructor = SafeConstructor()
+        self._anchors: Dict[str, Any] = {}
+        self._seen: Set[str] = set()
+        self._count = 0
+        self._streamed = 0
+        self._format: FileFormat = FILE_FORMATS["default"]
+        self._defaults_data: Dict[str, Any] = {}
+        self._defaults: Dict[str, Any] = {}
+        self.meta: Any = None
+        self.file_format: Any = None
+
+    def documents(self) -> Iterator[Tuple[int, Document]]:
+        """Yield ``(ToC order, document)`` for each document, as it is complete."""
+        next(self._events)  # stream start
+        event = next(self._events)
+        if isinstance(event, StreamEndEvent):
+            raise MalformedError(f"toc is not a mapping: {type(None)}", "/")
+        document_event = event
+        event = next(self._events)
+        if not isinstance(event, MappingStartEvent):
+            data = self._compose(event)
+            raise MalformedError(f"toc is not a mapping: {type(data)}", "/")
+        yield from self._run(self._doc_mapping(event, "/", depth=0, is_root=True))
+        next(self._events)  # document end
+        event = next(self._events)
+        if not isinstance(event, StreamEndEvent):
+            assert isinstance(event, DocumentStartEvent)
+            raise ComposerError(
+                "expected a single document in the stream",
+                document_event.start_mark,
+                "but found another document",
+                event.start_mark,
+            )
+
+    @staticmethod
+    def _run(step: _DocGenerator) -> Iterator[Tuple[int, Document]]:
+        """Run a parse step, and its nested steps, with an explicit stack,
+        yielding the completed documents.
+        """
+        stack = [step]
+        value = None
+        while stack:
+            try:
+                request = stack[-1].send(value)
+            except StopIteration as stop:
+                stack.pop()
+                value = stop.value
+                continue
+            value = None
+            if isinstance(request, tuple):
+                yield request
+            else:
+                stack.append(request)
+
+    def _set_header(self, key: str, value: Any) -> None:
+        """Set the file format or defaults, from the top-level mapping."""
+        if self._streamed:
+            raise StreamingUnsupported(f"'{key}' key after root entries")
+        if key == FILE_FORMAT_KEY:
+            try:
+                self._format = FILE_FORMATS[value]
+            except (KeyError, TypeError):
+                raise MalformedError(
+                    f"'{FILE_FORMAT_KEY}' key value not recognised: '{value}'", "/"
+                )
+        else:
+            self._defaults_data = value
+        self._defaults = {**self._format.toc_defaults, **self._defaults_data}
+
+    def _doc_mapping(
+        self, start: MappingStartEvent, path: str, *, depth: int, is_root: bool = False
+    ) -> _DocGenerator:
+        """Parse a mapping that may be a document, returning its (stub) data."""
+        self._check_tag(start)
+        order = self._count
+        self._count += 1
+        streamed_before = self._streamed
+        data: Dict[str, Any] = {}
+        streamed_keys = set()
+        while True:
+            event = next(self._events)
+            if isinstance(event, MappingEndEvent):
+                break
+            key = self._compose_key(event)
+            value_event = next(self._events)
+            subtrees_key = self._format.get_subtrees_key(depth)
+            items_key = self._format.get_items_key(depth)
+            if key == items_key and isinstance(value_event, SequenceStartEvent):
+                data[key] = yield self._items_sequence(
+                    value_event, f"{path}/{items_key}/", depth=depth
+                )
+                streamed_keys.add(key)
+            elif key == subtrees_key and isinstance(value_event, SequenceStartEvent):
+                data[key] = yield self._subtrees_sequence(
+                    value_event, f"{path}{subtrees_key}/", depth=depth
+                )
+                streamed_keys.add(key)
+            else:
+                data[key] = self._compose(value_event)
+                if is_root and key in (FILE_FORMAT_KEY, "defaults"):
+                    self._set_header(key, data[key])
+
+        if not is_root and (
+            FILE_KEY not in data or _OTHER_LINK_KEYS.intersection(data)
+        ):
+            # not a document, so leave it to the parent to validate
+            if INCLUDE_KEY in data:
+                raise StreamingUnsupported(f"'{INCLUDE_KEY}' entry")
+            self._set_anchor(
+                start, data if self._streamed == streamed_before else _STREAMED
+            )
+            return data
+
+        if is_root:
+            keys = {
+                self._format.get_subtrees_key(depth),
+                self._format.get_items_key(depth),
+            }
+            if keys.intersection(data).difference(streamed_keys):
+                raise StreamingUnsupported(
+                    f"'{FILE_FORMAT_KEY}' key after root entries"
+                )
+            self.meta = data.get("meta")
+            self.file_format = data.get(FILE_FORMAT_KEY)
+        else:
+            docname = data[FILE_KEY]
+            if docname in self._seen:
+                raise MalformedError(
+                    f"document file used multiple times: '{docname}'", path
+                )
+
+        doc_item, _ = _parse_doc_item(
+            data,
+            self._defaults,
+            path,
+            depth=depth,
+            file_format=self._format,
+            is_root=is_root,
+        )
+        assert doc_item is not None  # errors are raised
+        if is_root and doc_item.docname in self._seen:
+            raise MalformedError(
+                f"document file used multiple times: '{doc_item.docname}'", path
+            )
+        self._seen.add(doc_item.docname)
+        self._streamed += 1
+        self._set_anchor(start, _STREAMED)
+        yield order, doc_item
+        return {FILE_KEY: doc_item.docname}
+
+    def _items_sequence(
+        self, start: SequenceStartEvent, path: str, *, depth: int
+    ) -> _DocGenerator:
+        """Parse a sequence of toctree entries."""
+        self._check_tag(start)
+        streamed_before = self._streamed
+        items: List[Any] = []
+        while True:
+            event = next(self._events)
+            if isinstance(event, SequenceEndEvent):
+                break
+            if isinstance(event, MappingStartEvent):
+                item = yield self._doc_mapping(
+                    event, f"{path}{len(items)}/", depth=depth + 1
+                )
+            else:
+                item = self._compose(event)
+            items.append(item)
+        self._set_anchor(
+            start, items if self._streamed == streamed_before else _STREAMED
+        )
+        return items
+
+    def _subtrees_sequence(
+        self, start: SequenceStartEvent, path: str, *, depth: int
+    ) -> _DocGenerator:
+        """Parse a sequence of toctrees."""
+        self._check_tag(start)
+        items_key = self._format.get_items_key(depth)
+        streamed_before = self._streamed
+        subtrees: List[Any] = []
+        while True:
+            event = next(self._events)
+            if isinstance(event, SequenceEndEvent):
+                break
+            if not isinstance(event, MappingStartEvent):
+                subtrees.append(self._compose(event))
+                continue
+            self._check_tag(event)
+            subtree_start = event
+            subtree: Dict[str, Any] = {}
+            while True:
+                event = next(self._events)
+                if isinstance(event, MappingEndEvent):
+                    break
+                key = self._compose_key(event)
+                value_event = next(self._events)
+                if key == items_key and isinstance(value_event, SequenceStartEvent):
+                    subtree[key] = yield self._items_sequence(
+                        value_event, f"{path}{len(subtrees)}/{items_key}/", depth=depth
+                    )
+                else:
+                    subtree[key] = self._compose(value_event)
+            self._set_anchor(subtree_start, _STREAMED)
+            subtrees.append(subtree)
+        self._set_anchor(
+            start, subtrees if self._streamed == streamed_before else _STREAMED
+        )
+        return subtrees
+
+    def _check_tag(self, event: Union[MappingStartEvent, SequenceStartEvent]) -> None:
+        if event.tag not in _DEFAULT_COLLECTION_TAGS:
+            raise StreamingUnsupported(f"tag {event.tag!r}")
+
+    def _set_anchor(self, event: Event, value: Any) -> None:
+        if event.anchor is not None:
+            self._anchors[event.anchor] = value
+
+    def _compose_key(self, event: Event) -> Any:
+        """Compose a mapping key."""
+        if isinstance(event, ScalarEvent) and self._scalar_tag(event) == _MERGE_TAG:
+            raise StreamingUnsupported("merge key")
+        return self._compose(event)
+
+    def _scalar_tag(self, event: ScalarEvent) -> str:
+        if event.tag is None or event.tag == "!":
+            return self._resolver.resolve(yaml.ScalarNode, event.value, event.implicit)
+        return event.tag
+
+    def _compose(self, event: Event) -> Any:
+        """Compose a node into python data, as `yaml.safe_load` would."""
+        if isinstance(event, AliasEvent):
+            if event.anchor not in self._anchors:
+                raise ComposerError(
+                    None,
+                    None,
+                    f"found undefined alias {event.anchor!r}",
+                    event.start_mark,
+                )
+            value = self._anchors[event.anchor]
+            if value is _STREAMED:
+                raise StreamingUnsupported("alias of a node containing documents")
+            return value
+        if isinstance(event, ScalarEvent):
+            tag = self._scalar_tag(event)
+            node = yaml.ScalarNode(
+                tag, event.value, event.start_mark, event.end_mark, style=event.style
+            )
+            constructor = self._constructor.yaml_constructors.get(
+                tag, self._constructor.yaml_constructors[None]
+            )
+            value = constructor(self._constructor, node)
+        elif isinstance(event, SequenceStartEvent):
+            self._check_tag(event)
+            value = []
+            self._set_anchor(event, value)
+            while True:
+                item_event = next(self._events)
+                if isinstance(item_event, SequenceEndEvent):
+                    break
+                value.append(self._compose(item_event))
+        elif isinstance(event, MappingStartEvent):
+            self._check_tag(event)
+            value = {}
+            self._set_anchor(event, value)
+            while True:
+                key_event = next(self._events)
+                if isinstance(key_event, MappingEndEvent):
+                    break
+                key = self._compose_key(key_event)
+                try:
+                    hash(key)
+                except TypeError as exc:
+                    raise ConstructorError(
+                        "while constructing a mapping",
+                        event.start_mark,
+                        "found unhashable key",
+                        key_event.start_mark,
+                    ) from exc
+                value[key] = self._compose(next(self._events))
+        else:
+            raise ComposerError(None, None, f"unexpected event {event}", None)
+        self._set_anchor(event, value)
+        return value
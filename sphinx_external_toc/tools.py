@@ -5,8 +5,7 @@ from itertools import chain
 from pathlib import Path, PurePosixPath
 from typing import Any, Dict, List, Mapping, Optional, Sequence, Tuple, Union
 
-import yaml
-
+from ._compat import trusted_construction, yaml_load
 from .api import Document, FileItem, SiteMap, TocTree
 from .parsing import (
     DEFAULT_ITEMS_KEY,
@@ -14,7 +13,7 @@ from .parsing import (
     MalformedError,
     create_toc_dict,
     parse_toc_data,
-    parse_toc_yaml,
+    parse_toc_file,
 )
 
 
@@ -42,7 +41,7 @@ def create_site_from_toc(
 
     """
     assert default_ext in {".rst", ".md"}
-    site_map = parse_toc_yaml(toc_path)
+    site_map = parse_toc_file(toc_path)
 
     root_path = Path(toc_path).parent if root_path is None else Path(root_path)
     root_path.mkdir(parents=True, exist_ok=True)
@@ -89,6 +88,8 @@ def create_site_from_toc(
     return site_map
 
 
+# documents are created from file paths, so do not need validating
+@trusted_construction()
 def create_site_map_from_path(
     root_path: Union[str, Path],
     *,
@@ -283,7 +284,7 @@ def migrate_jupyter_book(
 
     if isinstance(toc, Path):
         with toc.open(encoding="utf8") as handle:
-            toc = yaml.safe_load(handle)
+            toc = yaml_load(handle)
 
     # convert list to dict
     if isinstance(toc, list):
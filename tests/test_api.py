@@ -1,4 +1,32 @@
-from sphinx_external_toc.api import Document, FileItem, SiteMap, TocTree
+import io
+import json
+import pickle
+
+import pytest
+from sphinx.util.matching import compile_matchers
+
+from sphinx_external_toc.api import (
+    ChangeKind,
+    DocChange,
+    Document,
+    FrozenDocument,
+    FrozenSiteMap,
+    FileItem,
+    GlobItem,
+    SiteMap,
+    TocTree,
+    UrlItem,
+    json_dumps,
+)
+from sphinx_external_toc.columnar import ColumnarSiteMap
+from sphinx_external_toc.parsing import (
+    create_toc_dict,
+    parse_toc_data,
+    parse_toc_yaml,
+)
+from sphinx_external_toc.sqlite import SqliteSiteMap
+from sphinx_external_toc.streaming import parse_toc_stream
+from sphinx_external_toc.tools import create_site_map_from_path
 
 
 def test_sitemap_get_changed_identical():
@@ -54,3 +82,639 @@ def test_sitemap_get_changed_subtrees_numbered():
     root2.subtrees = [TocTree([], numbered=True)]
     sitemap2 = SiteMap(root2)
     assert sitemap1.get_changed(sitemap2) == {"root"}
+
+
+def _nested_sitemap() -> SiteMap:
+    """root -> (a -> (a1, a2), b), with a url and glob in root."""
+    sitemap = SiteMap(
+        Document("root", [TocTree([FileItem("a")]), TocTree([FileItem("b")])])
+    )
+    sitemap["a"] = Document(
+        "a", [TocTree([FileItem("a1"), GlobItem("a*"), FileItem("a2")])]
+    )
+    sitemap["b"] = Document("b")
+    sitemap["a1"] = Document("a1")
+    sitemap["a2"] = Document("a2")
+    return sitemap
+
+
+def test_sitemap_parents():
+    """Test the parent, ancestors and siblings of documents."""
+    sitemap = _nested_sitemap()
+    assert sitemap.parent("root") is None
+    assert sitemap.parent("b") == "root"
+    assert sitemap.position("b") == ("root", 1, 0)
+    assert sitemap.position("a2") == ("a", 0, 2)
+    assert sitemap.ancestors("a2") == ["a", "root"]
+    assert sitemap.ancestors("root") == []
+    assert sitemap.siblings("a1") == ["a2"]
+    assert sitemap.siblings("b") == []
+    assert sitemap.siblings("root") == []
+
+
+def test_sitemap_parents_updated():
+    """Test the parent index is updated when documents are set or deleted."""
+    sitemap = _nested_sitemap()
+    assert sitemap.parent("a1") == "a"
+    sitemap["b"] = Document("b", [TocTree([FileItem("b1")])])
+    sitemap["b1"] = Document("b1")
+    assert sitemap.ancestors("b1") == ["b", "root"]
+    sitemap["a"] = Document("a", [TocTree([FileItem("a2")])])
+    assert sitemap.parent("a1") is None
+    assert sitemap.position("a2") == ("a", 0, 0)
+    del sitemap["b"]
+    assert sitemap.parent("b1") is None
+    with pytest.raises(KeyError):
+        sitemap.parent("b")
+
+
+@pytest.mark.parametrize("site_map_class", [SiteMap, ColumnarSiteMap, SqliteSiteMap])
+def test_sitemap_parents_shared_child(site_map_class):
+    """Test a document listed by two parents is positioned in the first,
+    as the parent index is updated, as when it is built from scratch.
+    """
+    sitemap = site_map_class(
+        Document("root", [TocTree([FileItem("a"), FileItem("b")])])
+    )
+    sitemap["a"] = Document("a", [TocTree([FileItem("c")])])
+    sitemap["b"] = Document("b", [TocTree([FileItem("x"), FileItem("c")])])
+    sitemap["c"] = Document("c")
+
+    def rebuilt_position(name):
+        site_map = SiteMap(sitemap.root)
+        for docname, doc in sitemap.items():
+            site_map[docname] = doc
+        return site_map.position(name)
+
+    assert sitemap.position("c") == ("a", 0, 0)
+    # the first parent no longer lists the child
+    sitemap["a"] = Document("a", title="A")
+    assert sitemap.position("c") == ("b", 0, 1) == rebuilt_position("c")
+    # the first parent lists the child again
+    sitemap["a"] = Document("a", [TocTree([FileItem("c")])])
+    assert sitemap.position("c") == ("a", 0, 0) == rebuilt_position("c")
+    # the second parent is replaced
+    sitemap["b"] = Document("b", [TocTree([FileItem("c")])])
+    assert sitemap.position("c") == ("a", 0, 0) == rebuilt_position("c")
+    # the first parent is deleted
+    del sitemap["a"]
+    assert sitemap.position("c") == ("b", 0, 0) == rebuilt_position("c")
+    del sitemap["b"]
+    assert sitemap.position("c") is None
+
+
+def test_sitemap_parents_pickle():
+    """Test the parent index is not pickled, but rebuilt."""
+    sitemap = _nested_sitemap()
+    assert sitemap.parent("a1") == "a"
+    unpickled = pickle.loads(pickle.dumps(sitemap))
+    assert unpickled._parents is None
+    assert unpickled.parent("a1") == "a"
+
+
+def test_sitemap_pickle_packed():
+    """Test the documents are pickled packed as tuples, and restored unchanged."""
+    root = Document(
+        "root",
+        [
+            TocTree(
+                [FileItem("a"), GlobItem("a*"), UrlItem("https://example.com", "ex")],
+                caption="Caption",
+                numbered=2,
+                style=["alphaupper", "romanlower"],
+                restart_numbering=True,
+            ),
+            TocTree([FileItem("b")]),
+        ],
+        title="Root",
+    )
+    sitemap = SiteMap(root, meta={"key": "value"}, file_format="jb-book")
+    sitemap["a"] = Document("a", title="A")
+    sitemap["b"] = Document("b")
+    sitemap.content_hash()
+    state = sitemap.__getstate__()
+    assert state["_docs"][0] == (
+        "root",
+        "Root",
+        (
+            ("a", ("a*",), ("https://example.com", "ex")),
+            ("Caption", True, -1, 2, False, False, ("alphaupper", "romanlower"), True),
+        ),
+        (("b",), None),
+    )
+    assert state["_root"] == "root"
+    assert isinstance(state["_doc_hashes"], bytes)
+    unpickled = pickle.loads(pickle.dumps(sitemap))
+    assert unpickled.as_json() == sitemap.as_json()
+    assert unpickled.root is unpickled["root"]
+    assert unpickled["root"].subtrees[0].style == ["alphaupper", "romanlower"]
+    assert unpickled._doc_hashes == sitemap._doc_hashes
+    assert next(name for name in unpickled if name == "a") is unpickled["a"].docname
+    assert type(unpickled["root"].subtrees[0].items[0]) is FileItem
+    # site-maps pickled by previous versions, with documents as a dict
+    previous = SiteMap.__new__(SiteMap)
+    previous.__setstate__(
+        {"_docs": dict(sitemap._docs), "_root": root, "_meta": {}, "_file_format": None}
+    )
+    assert previous.as_json()["documents"] == sitemap.as_json()["documents"]
+    # documents pickled directly, or by previous versions
+    assert pickle.loads(pickle.dumps(root)) == root
+    doc = Document.__new__(Document)
+    doc.__setstate__((None, {"docname": "a", "subtrees": [], "title": "A"}))
+    assert doc == sitemap["a"]
+    # documents before the items referencing them are also restored in order
+    sitemap = SiteMap(Document("root", [TocTree([FileItem("b")])]))
+    sitemap["a"] = Document("a")
+    sitemap["b"] = Document("b", [TocTree([FileItem("a")])])
+    unpickled = pickle.loads(pickle.dumps(sitemap))
+    assert list(unpickled) == ["root", "a", "b"]
+    assert type(unpickled["a"].docname) is str
+
+
+def test_sitemap_globs():
+    """Test the cached globs are updated when documents are set or deleted."""
+    sitemap = _nested_sitemap()
+    assert sitemap.globs() == {"a*"}
+    assert sitemap.matches_any_glob("abc")
+    assert not sitemap.matches_any_glob("b")
+    assert sitemap.filter_glob("a*", ["a1", "b", "a/b"]) == ["a1"]
+    assert sitemap.filter_glob("b*", ["a1", "b"]) == ["b"]
+    sitemap["b"] = Document("b", [TocTree([GlobItem("b*"), GlobItem("c/**")])])
+    assert sitemap.globs() == {"a*", "b*", "c/**"}
+    assert sitemap.matches_any_glob("c/d/e")
+    del sitemap["a"]
+    assert sitemap.globs() == {"b*", "c/**"}
+    assert not sitemap.matches_any_glob("abc")
+
+
+def test_sitemap_source_suffixes():
+    """Test documents are indexed by their docname without suffix."""
+    sitemap = SiteMap(Document("root.md"))
+    sitemap["a.rst"] = Document("a.rst")
+    sitemap["a.md"] = Document("a.md")
+    sitemap["b"] = Document("b")
+    sitemap["b.md"] = Document("b.md")
+    sitemap["c.txt"] = Document("c.txt")
+    collisions = sitemap.set_source_suffixes([".md", ".rst"])
+    assert sorted(collisions) == [("a.md", "a.rst"), ("b", "b.md")]
+    assert sitemap.get_by_source_name("root").docname == "root.md"
+    assert sitemap.get_by_source_name("a").docname == "a.md"
+    assert sitemap.get_by_source_name("b").docname == "b"
+    assert sitemap.get_by_source_name("c.txt").docname == "c.txt"
+    assert sitemap.get_by_source_name("c") is None
+    assert sitemap.strip_suffix("a.rst") == "a"
+    assert sitemap.strip_suffix("c.txt") == "c.txt"
+    sitemap["d.rst"] = Document("d.rst")
+    assert sitemap.get_by_source_name("d").docname == "d.rst"
+    del sitemap["a.md"]
+    assert sitemap.get_by_source_name("a").docname == "a.rst"
+    unpickled = pickle.loads(pickle.dumps(sitemap))
+    assert unpickled._suffix_index is None
+    assert unpickled.source_suffixes == (".md", ".rst")
+    assert unpickled.get_by_source_name("d").docname == "d.rst"
+
+
+def test_sitemap_content_hash():
+    """Test the content hashes of documents and site-maps."""
+    sitemap1 = _nested_sitemap()
+    sitemap2 = _nested_sitemap()
+    assert sitemap1.content_hash() == sitemap2.content_hash()
+    assert sitemap1.doc_hash("a") == sitemap2["a"].content_hash()
+    assert sitemap1.doc_hash("a") != sitemap1.doc_hash("b")
+    # item types and options are distinguished
+    assert (
+        TocTree([FileItem("a")]).content_hash()
+        != TocTree([GlobItem("a")]).content_hash()
+    )
+    assert TocTree([], numbered=1).content_hash() != TocTree([]).content_hash()
+    # hashes are updated when documents are set or deleted
+    sitemap2["b"] = Document("b", title="B")
+    assert sitemap1.content_hash() != sitemap2.content_hash()
+    assert sitemap2.get_changed(sitemap1) == {"b"}
+    sitemap2["b"] = Document("b")
+    assert sitemap1.content_hash() == sitemap2.content_hash()
+    del sitemap2["a2"]
+    assert sitemap1.content_hash() != sitemap2.content_hash()
+    # hashes are pickled
+    unpickled = pickle.loads(pickle.dumps(sitemap1))
+    assert unpickled._map_hash == sitemap1.content_hash()
+    assert unpickled.get_changed(sitemap1) == set()
+
+
+def test_sitemap_diff():
+    """Test the typed changes between site-maps."""
+    previous = _nested_sitemap()
+    assert _nested_sitemap().diff(previous) == []
+    sitemap = _nested_sitemap()
+    sitemap["root"] = Document(
+        "root", [TocTree([FileItem("a")]), TocTree([FileItem("c"), FileItem("b")])]
+    )
+    sitemap["a"] = Document(
+        "a", [TocTree([FileItem("a1"), GlobItem("a*")], caption="A")], title="A"
+    )
+    sitemap["c"] = Document("c")
+    del sitemap["a2"]
+    changes = {
+        (change.kind, change.docname): change for change in sitemap.diff(previous)
+    }
+    assert set(changes) == {
+        (ChangeKind.CHILDREN, "root"),
+        (ChangeKind.TITLE, "a"),
+        (ChangeKind.OPTIONS, "a"),
+        (ChangeKind.CHILDREN, "a"),
+        (ChangeKind.MOVED, "b"),
+        (ChangeKind.ADDED, "c"),
+        (ChangeKind.REMOVED, "a2"),
+    }
+    assert changes[ChangeKind.TITLE, "a"].old is None
+    assert changes[ChangeKind.TITLE, "a"].new == "A"
+    assert changes[ChangeKind.OPTIONS, "a"].new[0]["caption"] == "A"
+    assert changes[ChangeKind.CHILDREN, "a"].new == [["a1", "a*"]]
+    assert changes[ChangeKind.MOVED, "b"].old == ("root", 1, 0)
+    assert changes[ChangeKind.MOVED, "b"].new == ("root", 1, 1)
+    assert changes[ChangeKind.REMOVED, "a2"].old == previous["a2"]
+
+
+def test_sitemap_diff_item_type():
+    """Test changing the type of a toctree item is a change of children."""
+    previous = SiteMap(Document("root", [TocTree([FileItem("a")])]))
+    sitemap = SiteMap(Document("root", [TocTree([GlobItem("a")])]))
+    assert [change.kind for change in sitemap.diff(previous)] == [ChangeKind.CHILDREN]
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_sitemap_write_json(use_orjson: bool, monkeypatch: pytest.MonkeyPatch):
+    """Test the streamed JSON is the same as `as_json`."""
+    if not use_orjson:
+        monkeypatch.setitem(json_dumps.__globals__, "orjson", None)
+    sitemap = _nested_sitemap()
+    sitemap["b"] = Document(
+        "b",
+        [TocTree([UrlItem("https://example.com", "é")], style=["alphaupper"])],
+        title="B",
+    )
+    sitemap.meta["key"] = "value"
+    sitemap.file_format = "jb-book"
+    stream = io.StringIO()
+    sitemap.write_json(stream)
+    data = json.loads(stream.getvalue())
+    assert data == sitemap.as_json()
+    assert data["documents"]["b"]["subtrees"][0]["items"] == [
+        {"url": "https://example.com", "title": "é"}
+    ]
+    assert type(sitemap.as_json()["documents"]["a"]["subtrees"][0]["items"][0]) is str
+
+
+def test_sitemap_freeze():
+    """Test frozen snapshots of site-maps."""
+    sitemap = _nested_sitemap()
+    sitemap["b"] = Document("b", [TocTree([UrlItem("https://example.com")])])
+    frozen = sitemap.freeze()
+    assert list(frozen) == list(sitemap)
+    assert frozen.root.docname == "root"
+    assert frozen["a"].child_files() == ["a1", "a2"]
+    assert frozen["a"].child_globs() == ["a*"]
+    with pytest.raises(AttributeError):
+        frozen["a"].title = "A"  # type: ignore[misc]
+    assert frozen.thaw().as_json() == sitemap.as_json()
+    # unchanged documents are shared with a previous snapshot
+    sitemap["b"] = Document("b", title="B")
+    refrozen = sitemap.freeze(frozen)
+    assert refrozen["a"] is frozen["a"]
+    assert refrozen["b"] is not frozen["b"]
+    # but not if the item types differ
+    sitemap["a"] = Document(
+        "a", [TocTree([GlobItem("a1"), GlobItem("a*"), FileItem("a2")])]
+    )
+    assert sitemap.freeze(frozen)["a"] is not frozen["a"]
+
+
+def test_frozen_sitemap_evolve():
+    """Test deriving snapshots shares unchanged documents."""
+    sitemap = SiteMap(
+        Document("root", [TocTree([FileItem(f"d{i}") for i in range(100)])])
+    )
+    for i in range(100):
+        sitemap[f"d{i}"] = Document(f"d{i}")
+    frozen = sitemap.freeze()
+    evolved = frozen.evolve(
+        {"d1": Document("d1", title="D1"), "d2": None, "new": Document("new")}
+    )
+    assert len(frozen) == 101
+    assert len(evolved) == 101
+    assert evolved["d1"].title == "D1"
+    assert frozen["d1"].title is None
+    assert "d2" not in evolved
+    assert "d2" in frozen
+    assert evolved["d3"] is frozen["d3"]
+    assert list(evolved)[-1] == "new"
+    # the changes are merged into a new base, once there are enough of them
+    for i in range(3, 20):
+        evolved = evolved.evolve({f"d{i}": None})
+        assert len(evolved) == 101 - (i - 2)
+        assert len(evolved._delta) ** 2 <= len(evolved._base)
+    assert evolved["d50"] is frozen["d50"]
+    assert set(evolved) == {"root", "d0", "d1", "new"} | {
+        f"d{i}" for i in range(20, 100)
+    }
+    with pytest.raises(KeyError):
+        evolved.evolve({"d2": None})
+    with pytest.raises(KeyError):
+        evolved.evolve({"root": None})
+    with pytest.raises(ValueError):
+        evolved.evolve({"d0": Document("other")})
+    assert evolved.evolve(root="d0").root.docname == "d0"
+
+
+def test_frozen_sitemap_evolve_cost():
+    """Test single-document edits copy amortized O(sqrt(N)) entries each."""
+    n_docs, n_edits = 10_000, 1_000
+    frozen = FrozenSiteMap(
+        {f"d{i}": FrozenDocument(f"d{i}") for i in range(n_docs)}, "d0"
+    )
+    copied = 0
+    for i in range(n_edits):
+        evolved = frozen.evolve({f"d{i}": FrozenDocument(f"d{i}", title="T")})
+        # the changes are copied, or merged with the base into a new base
+        copied += (
+            len(evolved) if evolved._base is not frozen._base else len(evolved._delta)
+        )
+        frozen = evolved
+    assert copied / n_edits <= 3 * n_docs**0.5
+    assert all(frozen[f"d{i}"].title == "T" for i in range(n_edits))
+
+
+def test_sitemap_copy():
+    site_map = SiteMap(Document("root", [TocTree([FileItem("a")])]))
+    site_map["a"] = Document("a")
+    site_map.set_fragments({"a.yml": ("key", "key")}, {"a": "a.yml"})
+    copied = site_map.copy()
+    assert copied.as_json() == site_map.as_json()
+    assert copied["a"] is not site_map["a"]
+    # documents changed in-place are not changed in the original
+    copied["root"].subtrees[0].items.append(FileItem("c"))
+    copied["root"].title = "Root"
+    assert site_map["root"].subtrees[0].items == ["a"]
+    assert site_map["root"].title is None
+    assert copied.root is copied["root"]
+    copied.set_title("a", "A")
+    copied.insert_child("root", "b")
+    assert site_map["a"].title is None
+    assert "b" not in site_map
+    assert site_map.parent("a") == "root"
+    assert site_map.get_changed(copied) == {"a", "root"}
+    assert copied.journal and not site_map.journal
+    with pytest.raises(TypeError, match="cannot copy a ColumnarSiteMap"):
+        ColumnarSiteMap.from_site_map(site_map).copy()
+
+
+def test_sitemap_docnames():
+    """Test each document name is stored once, keeping its type."""
+    sitemap = parse_toc_data(
+        {"root": "root", "entries": [{"file": "a", "entries": [{"file": "b"}]}]}
+    )
+    assert type(sitemap["a"].docname) is str
+    assert next(name for name in sitemap if name == "a") is sitemap["a"].docname
+    assert type(sitemap["root"].subtrees[0].items[0]) is FileItem
+    data = sitemap.as_json()
+    assert list(data["documents"]) == ["a", "b", "root"]
+    assert all(type(name) is str for name in data["documents"])
+    assert type(sitemap.as_json()["documents"]["a"]["docname"]) is str
+    # the names are also stored once when unpickled
+    unpickled = pickle.loads(pickle.dumps(sitemap))
+    assert next(name for name in unpickled if name == "b") is unpickled["b"].docname
+
+
+@pytest.mark.parametrize("parse", ["data", "stream", "path"])
+def test_parsed_types(parse, tmp_path):
+    """Test parsing gives plain str document names and keys, and `FileItem` items."""
+    if parse == "path":
+        tmp_path.joinpath("root.md").write_text("")
+        tmp_path.joinpath("a").mkdir()
+        tmp_path.joinpath("a", "b.md").write_text("")
+        sitemap = create_site_map_from_path(tmp_path)
+    else:
+        content = "root: root\nentries:\n- file: a\n  entries:\n  - file: b\n"
+        tmp_path.joinpath("_toc.yml").write_text(content)
+        parser = parse_toc_yaml if parse == "data" else parse_toc_stream
+        sitemap = parser(tmp_path / "_toc.yml")
+    for sitemaps in (sitemap, pickle.loads(pickle.dumps(sitemap))):
+        for docname, doc in sitemaps.items():
+            assert type(docname) is str
+            assert type(doc.docname) is str
+            for tree in doc.subtrees:
+                assert all(type(item) is FileItem for item in tree.items)
+    sitemap.insert_child("root", "c")
+    assert type(sitemap["c"].docname) is str
+    assert all(type(name) is str for name in sitemap)
+
+
+def test_slots():
+    """Test the site-map objects do not have an instance dictionary."""
+    sitemap = _nested_sitemap()
+    for obj in (
+        sitemap,
+        sitemap.root,
+        sitemap.root.subtrees[0],
+        UrlItem("https://example.com"),
+        sitemap.freeze(),
+        sitemap.freeze().root,
+    ):
+        assert not hasattr(obj, "__dict__"), type(obj)
+
+
+def test_sitemap_walk():
+    """Test walking the documents in ToC order."""
+    sitemap = _nested_sitemap()
+    sitemap["a1"] = Document("a1", [TocTree([FileItem("a11"), FileItem("root")])])
+    assert list(sitemap.walk()) == [
+        (0, None, None, "root"),
+        (1, "root", 0, "a"),
+        (2, "a", 0, "a1"),
+        (3, "a1", 0, "a11"),
+        (2, "a", 0, "a2"),
+        (1, "root", 1, "b"),
+    ]
+    assert [item[3] for item in sitemap.walk(max_depth=1)] == ["root", "a", "b"]
+    assert [item[3] for item in sitemap.walk(max_depth=0)] == ["root"]
+    assert list(sitemap.walk_breadth_first()) == [
+        (0, None, None, "root"),
+        (1, "root", 0, "a"),
+        (1, "root", 1, "b"),
+        (2, "a", 0, "a1"),
+        (2, "a", 0, "a2"),
+        (3, "a1", 0, "a11"),
+    ]
+    assert [item[3] for item in sitemap.walk_breadth_first(max_depth=2)] == [
+        "root",
+        "a",
+        "b",
+        "a1",
+        "a2",
+    ]
+
+
+def test_sitemap_toc_index():
+    """Test the positions of documents in ToC order."""
+    sitemap = _nested_sitemap()
+    assert sorted(["b", "a2", "root", "a"], key=sitemap.toc_index) == [
+        "root",
+        "a",
+        "a2",
+        "b",
+    ]
+    sitemap["root"] = Document(
+        "root", [TocTree([FileItem("b")]), TocTree([FileItem("a")])]
+    )
+    assert sitemap.toc_index("b") == 1
+    assert sitemap.toc_index("a2") == 4
+    sitemap["orphan"] = Document("orphan")
+    with pytest.raises(KeyError):
+        sitemap.toc_index("orphan")
+
+
+@pytest.mark.parametrize(
+    "prefix,pattern",
+    [
+        ("api/", None),
+        ("api", None),
+        ("api/nu", None),
+        ("", None),
+        ("other/", None),
+        (None, "api/*"),
+        (None, "api/*/*"),
+        (None, "*"),
+        (None, "api/**"),
+        (None, "**/index"),
+        (None, "api/[mn]*/index.md"),
+        (None, "api/numpy/ind?x"),
+        (None, "api/numpy"),
+        ("api/numpy/", "api/*/index"),
+    ],
+)
+def test_sitemap_query(prefix, pattern):
+    """Test querying documents by prefix and glob gives the same as a scan."""
+    sitemap = SiteMap(Document("index"))
+    for docname in [
+        "api",
+        "api/numpy",
+        "api/numpy/index",
+        "api/numpy/array",
+        "api/numpy/linalg/index",
+        "api/matplotlib/index.md",
+        "api/scipy/index",
+        "apis/index",
+        "guide/index",
+    ]:
+        sitemap[docname] = Document(docname)
+    del sitemap["api/scipy/index"]
+
+    def scan():
+        match = compile_matchers([pattern])[0] if pattern else (lambda name: True)
+        return {
+            name for name in sitemap if name.startswith(prefix or "") and match(name)
+        }
+
+    assert sitemap.query(prefix=prefix, pattern=pattern) == scan()
+    # the trie is updated when documents are set or deleted
+    sitemap["api/numpy/fft/index"] = Document("api/numpy/fft/index")
+    del sitemap["api/numpy/index"]
+    del sitemap["api"]
+    assert sitemap.query(prefix=prefix, pattern=pattern) == scan()
+    # and rebuilt when unpickled
+    unpickled = pickle.loads(pickle.dumps(sitemap))
+    assert unpickled._path_trie is None
+    assert unpickled.query(prefix=prefix, pattern=pattern) == scan()
+
+
+@pytest.mark.parametrize("site_map_class", [SiteMap, ColumnarSiteMap, SqliteSiteMap])
+def test_sitemap_mutation(site_map_class):
+    """Test the mutation methods keep the indexes, and record their changes."""
+    sitemap = parse_toc_data(
+        {
+            "root": "root",
+            "entries": [
+                {"file": "a", "entries": [{"file": "a1"}, {"file": "a2"}]},
+                {"file": "b", "entries": [{"file": "b1"}]},
+                {"file": "c"},
+            ],
+        },
+        site_map_class=site_map_class,
+    )
+    previous = pickle.loads(pickle.dumps(sitemap))
+    assert sitemap.insert_child("a", "new", position=0, title="New").title == "New"
+    assert sitemap.position("new") == ("a", 0, 0)
+    assert sitemap.position("a2") == ("a", 0, 2)
+    sitemap.insert_child("c", "c1")
+    assert sitemap["c"].subtrees[0].items == ["c1"]
+    sitemap.move("a2", "b", position=0)
+    assert sitemap.position("a2") == ("b", 0, 0)
+    assert sitemap.position("b1") == ("b", 0, 1)
+    sitemap.set_title("c", "C")
+    assert sitemap["c"].title == "C"
+    assert sitemap.remove_subtree("a") == ["a", "new", "a1"]
+    assert set(sitemap) == {"root", "b", "b1", "c", "a2", "c1"}
+    assert sitemap.position("b") == ("root", 0, 0)
+    assert sitemap.query(prefix="a") == {"a2"}
+    # uniqueness is kept
+    with pytest.raises(ValueError):
+        sitemap.insert_child("c", "b1")
+    with pytest.raises(ValueError):
+        sitemap.move("b", "a2")
+    with pytest.raises(ValueError):
+        sitemap.remove_subtree("root")
+    sitemap["o"] = Document("o", [TocTree([FileItem("p")])])
+    sitemap["p"] = Document("p")
+    with pytest.raises(ValueError):
+        sitemap.insert_child("o", "o")
+    with pytest.raises(ValueError):
+        sitemap.insert_child("p", "o")
+    del sitemap["o"], sitemap["p"]
+    # the changes are the same as those from diff, with the intermediate ones
+    journal = {(change.kind, change.docname) for change in sitemap.journal}
+    changes = {(change.kind, change.docname) for change in sitemap.diff(previous)}
+    assert changes <= journal
+    assert journal - changes == {
+        (ChangeKind.ADDED, "new"),
+        (ChangeKind.REMOVED, "new"),
+        (ChangeKind.MOVED, "a1"),
+        (ChangeKind.CHILDREN, "a"),
+    }
+    assert sitemap.clear_journal()[0] == DocChange(
+        ChangeKind.CHILDREN,
+        "a",
+        [["a1", "a2"]],
+        [["new", "a1", "a2"]],
+    )
+    assert sitemap.journal == []
+
+
+@pytest.mark.parametrize("site_map_class", [SiteMap, ColumnarSiteMap, SqliteSiteMap])
+def test_sitemap_mutation_root(site_map_class):
+    """Test editing the root document updates the root."""
+    sitemap = parse_toc_data(
+        {"root": "intro", "entries": [{"file": "a"}]}, site_map_class=site_map_class
+    )
+    sitemap.insert_child("intro", "b", title="B")
+    sitemap.set_title("intro", "Intro")
+    assert sitemap.root == sitemap["intro"]
+    assert sitemap.root.title == "Intro"
+    assert create_toc_dict(sitemap) == {
+        "root": "intro",
+        "title": "Intro",
+        "entries": [{"file": "a"}, {"file": "b", "title": "B"}],
+    }
+    unpickled = pickle.loads(pickle.dumps(sitemap))
+    assert unpickled.root == unpickled["intro"]
+    assert unpickled.root.title == "Intro"
+    assert create_toc_dict(unpickled) == create_toc_dict(sitemap)
+
+
+def test_unique_docnames():
+    """Test documents and toctrees cannot reference a document twice, or themselves."""
+    with pytest.raises(ValueError, match="duplicate"):
+        TocTree([FileItem("a"), GlobItem("a*"), FileItem("a")])
+    with pytest.raises(ValueError, match="duplicate"):
+        Document("doc", [TocTree([FileItem("a")]), TocTree([FileItem("a")])])
+    with pytest.raises(ValueError, match="itself"):
+        Document("doc", [TocTree([FileItem("doc")])])
@@ -0,0 +1,226 @@
+from pathlib import Path
+import pickle
+
+import pytest
+
+from sphinx_external_toc import cache, parsing
+from sphinx_external_toc.api import Document, SiteMap
+from sphinx_external_toc.cache import (
+    clear_memory_cache,
+    content_key,
+    parse_toc_cached,
+)
+from sphinx_external_toc.parsing import parse_toc_yaml
+
+TOC_PATH = Path(__file__).parent.joinpath("_toc_files", "basic.yml")
+
+
+@pytest.fixture(autouse=True)
+def _clear_cache():
+    clear_memory_cache()
+    yield
+    clear_memory_cache()
+
+
+@pytest.fixture()
+def toc_path(tmp_path: Path) -> Path:
+    path = tmp_path / "_toc.yml"
+    path.write_bytes(TOC_PATH.read_bytes())
+    return path
+
+
+def _toc_key(path: Path) -> str:
+    return content_key(path.read_bytes(), str(path.resolve()))
+
+
+def test_parse_matches_uncached(toc_path: Path, tmp_path: Path):
+    site_map = parse_toc_cached(toc_path, cache_dir=tmp_path / "cache")
+    assert site_map.as_json() == parse_toc_yaml(toc_path).as_json()
+
+
+def test_memory_cache(toc_path: Path, monkeypatch):
+    site_map = parse_toc_cached(toc_path)
+    monkeypatch.setattr(parsing, "parse_toc_data", pytest.fail)
+    cached = parse_toc_cached(toc_path)
+    # each caller gets its own copy, including of the documents
+    assert cached is not site_map
+    assert cached.root is not site_map.root
+    assert cached.content_hash() == site_map.content_hash()
+    site_map.set_title(site_map.root.docname, "Changed")
+    site_map.set_source_suffixes([".md"])
+    assert parse_toc_cached(toc_path).root.title != "Changed"
+    assert cached.root.title != "Changed"
+    assert cached.source_suffixes is None
+    cached.root.title = "Changed in-place"
+    assert parse_toc_cached(toc_path).root.title != "Changed in-place"
+
+
+def test_disk_cache(toc_path: Path, tmp_path: Path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    site_map = parse_toc_cached(toc_path, cache_dir=cache_dir)
+    cache_file = cache_dir / f"{_toc_key(toc_path)}.yml.pickle"
+    assert cache_file.exists()
+    assert not list(cache_dir.glob("*.tmp"))
+    clear_memory_cache()
+    monkeypatch.setattr(parsing, "parse_toc_data", pytest.fail)
+    cached = parse_toc_cached(toc_path, cache_dir=cache_dir)
+    assert cached is not site_map
+    assert cached.as_json() == site_map.as_json()
+
+
+def test_content_change(toc_path: Path, tmp_path: Path):
+    cache_dir = tmp_path / "cache"
+    parse_toc_cached(toc_path, cache_dir=cache_dir)
+    toc_path.write_text("root: other\n", encoding="utf8")
+    assert parse_toc_cached(toc_path, cache_dir=cache_dir).root.docname == "other"
+    assert len(list(cache_dir.glob("*.pickle"))) == 2
+
+
+def test_corrupt_cache_file(toc_path: Path, tmp_path: Path):
+    cache_dir = tmp_path / "cache"
+    cache_dir.mkdir()
+    cache_file = cache_dir / f"{_toc_key(toc_path)}.yml.pickle"
+    cache_file.write_bytes(b"not a pickle")
+    site_map = parse_toc_cached(toc_path, cache_dir=cache_dir)
+    assert site_map.root.docname == "intro"
+    with cache_file.open("rb") as handle:
+        assert pickle.load(handle).as_json() == site_map.as_json()
+
+
+def test_version_in_key(monkeypatch):
+    key = content_key(b"root: intro\n")
+    monkeypatch.setattr(cache, "__version__", "0.0.0")
+    assert content_key(b"root: intro\n") != key
+
+
+def test_path_in_key(tmp_path: Path):
+    """Test ToC files with the same content, but different includes, are not shared."""
+    cache_dir = tmp_path / "cache"
+    for name in ("a", "b"):
+        tmp_path.joinpath(name).mkdir()
+        tmp_path.joinpath(name, "_toc.yml").write_text(
+            "root: intro\nentries:\n- include: part.yml\n", encoding="utf8"
+        )
+        tmp_path.joinpath(name, "part.yml").write_text(
+            f"file: {name}\n", encoding="utf8"
+        )
+    for name in ("a", "b"):
+        site_map = parse_toc_cached(tmp_path / name / "_toc.yml", cache_dir=cache_dir)
+        assert list(site_map) == ["intro", name]
+    assert len(list(cache_dir.glob("*.pickle"))) == 2
+
+
+def test_prune(toc_path: Path, tmp_path: Path, monkeypatch):
+    cache_dir = tmp_path / "cache"
+    monkeypatch.setattr(cache, "CACHE_MAX_ENTRIES", 2)
+    for index in range(4):
+        toc_path.write_text(f"root: doc{index}\n", encoding="utf8")
+        parse_toc_cached(toc_path, cache_dir=cache_dir)
+    assert len(list(cache_dir.glob("*.pickle"))) == 2
+
+
+def test_fragments(tmp_path: Path, monkeypatch):
+    src = tmp_path / "src"
+    src.mkdir()
+    src.joinpath("_toc.yml").write_text(
+        "root: intro\nentries:\n- include: a.yml\n- include: b.yml\n", encoding="utf8"
+    )
+    src.joinpath("a.yml").write_text("file: a\n", encoding="utf8")
+    src.joinpath("b.yml").write_text("file: b\n", encoding="utf8")
+    cache_dir = tmp_path / "cache"
+    site_map = parse_toc_cached(src / "_toc.yml", cache_dir=cache_dir)
+    assert list(site_map) == ["intro", "a", "b"]
+    assert len(list(cache_dir.joinpath("fragments").glob("*.pickle"))) == 2
+
+    # the in-process cache is invalidated by a change to a fragment
+    src.joinpath("b.yml").write_text("file: b\ntitle: B\n", encoding="utf8")
+    # and only the changed fragment is loaded
+    loaded = []
+    load_contents = cache._load_contents
+
+    def _load_contents(contents, *args):
+        loaded.extend(content for content, _ in contents)
+        return load_contents(contents, *args)
+
+    monkeypatch.setattr(cache, "_load_contents", _load_contents)
+    site_map2 = parse_toc_cached(src / "_toc.yml", cache_dir=cache_dir)
+    assert loaded == [b"file: b\ntitle: B\n"]
+    assert site_map2["b"].title == "B"
+    # only the documents not in unchanged fragments are compared
+    hashed = []
+    doc_hash = SiteMap.doc_hash
+
+    def _doc_hash(self, docname):
+        hashed.append(docname)
+        return doc_hash(self, docname)
+
+    monkeypatch.setattr(SiteMap, "doc_hash", _doc_hash)
+    assert site_map2.get_changed(site_map) == {"b"}
+    assert "a" not in hashed
+    # unless a document of the fragment is assigned
+    site_map3 = parse_toc_yaml(src / "_toc.yml")
+    site_map3["a"] = Document("a", title="A")
+    hashed.clear()
+    assert site_map3.get_changed(site_map2) == {"a"}
+    assert "a" in hashed
+    del site_map3["a"]
+    assert site_map3.get_changed(site_map2) == set()
+    monkeypatch.undo()
+
+    # the on-disk cache is also invalidated by a change to a fragment
+    clear_memory_cache()
+    src.joinpath("a.yml").write_text("file: a\ntitle: A\n", encoding="utf8")
+    assert parse_toc_cached(src / "_toc.yml", cache_dir=cache_dir)["a"].title == "A"
+
+
+def test_load_fragments_parallel(tmp_path: Path):
+    paths = []
+    for index in range(4):
+        path = tmp_path / f"{index}.yml"
+        path.write_text(f"file: doc{index}\n", encoding="utf8")
+        paths.append(path)
+    result = cache.load_fragments(paths, max_workers=2)
+    assert [data for _, data in result] == [{"file": f"doc{i}"} for i in range(4)]
+    assert [key for key, _ in result] == [
+        content_key(path.read_bytes()) for path in paths
+    ]
+
+
+def test_load_fragments_error(tmp_path: Path):
+    import yaml
+
+    for index in range(2):
+        tmp_path.joinpath(f"{index}.yml").write_text("a: [", encoding="utf8")
+    with pytest.raises(yaml.YAMLError):
+        cache.load_fragments([tmp_path / "0.yml", tmp_path / "1.yml"])
+
+
+def test_load_fragments_broken_pool(tmp_path: Path, monkeypatch, caplog):
+    from concurrent.futures.process import BrokenProcessPool
+
+    class _BrokenExecutor:
+        def __init__(self, *args, **kwargs):
+            raise BrokenProcessPool("broken")
+
+    monkeypatch.setattr(cache, "ProcessPoolExecutor", _BrokenExecutor)
+    for index in range(2):
+        tmp_path.joinpath(f"{index}.yml").write_text(
+            f"file: doc{index}\n", encoding="utf8"
+        )
+    result = cache.load_fragments([tmp_path / "0.yml", tmp_path / "1.yml"])
+    assert [data for _, data in result] == [{"file": "doc0"}, {"file": "doc1"}]
+    assert "loading serially: broken" in caplog.text
+
+
+def test_load_fragments_unexpected_error(tmp_path: Path, monkeypatch):
+    class _FailingExecutor:
+        def __init__(self, *args, **kwargs):
+            raise RuntimeError("unexpected")
+
+    monkeypatch.setattr(cache, "ProcessPoolExecutor", _FailingExecutor)
+    for index in range(2):
+        tmp_path.joinpath(f"{index}.yml").write_text(
+            f"file: doc{index}\n", encoding="utf8"
+        )
+    with pytest.raises(RuntimeError, match="unexpected"):
+        cache.load_fragments([tmp_path / "0.yml", tmp_path / "1.yml"])
@@ -126,3 +126,20 @@ def test_migrate_toc(invoke_cli):
     )
     result = invoke_cli(migrate_toc, [path])
     assert "root: index" in result.output
+
+
+def test_parse_toc_all_errors(tmp_path, invoke_cli):
+    path = tmp_path / "_toc.yml"
+    path.write_text(
+        "root: intro\nentries:\n- file: doc1\n  unknown: 1\n- url: example.com\n",
+        encoding="utf8",
+    )
+    result = invoke_cli(parse_toc, ["--all-errors", str(path)], assert_exit=False)
+    assert result.exit_code == 1
+    assert "/entries/0/: Unknown keys found" in result.output
+    assert "/entries/1: entry validation" in result.output
+    assert "2 error(s) found" in result.output
+
+    path.write_text("root: intro\n", encoding="utf8")
+    result = invoke_cli(parse_toc, ["--all-errors", str(path)])
+    assert "intro" in result.output
@@ -0,0 +1,96 @@
+from pathlib import Path
+import pickle
+
+import pytest
+
+from sphinx_external_toc.api import Document, FileItem, GlobItem, TocTree, UrlItem
+from sphinx_external_toc.columnar import ColumnarSiteMap
+from sphinx_external_toc.parsing import create_toc_dict, parse_toc_yaml
+
+TOC_FILES = list(Path(__file__).parent.joinpath("_toc_files").glob("*.yml"))
+
+
+@pytest.mark.parametrize(
+    "path", TOC_FILES, ids=[path.name.rsplit(".", 1)[0] for path in TOC_FILES]
+)
+def test_parse_columnar(path: Path):
+    """Test parsing to a columnar site-map gives the same documents."""
+    site_map = parse_toc_yaml(path)
+    columnar = parse_toc_yaml(path, site_map_class=ColumnarSiteMap)
+    assert isinstance(columnar, ColumnarSiteMap)
+    assert columnar.as_json() == site_map.as_json()
+    assert create_toc_dict(columnar) == create_toc_dict(site_map)
+    assert columnar.to_site_map().as_json() == site_map.as_json()
+    for docname in site_map:
+        assert columnar[docname] == site_map[docname]
+        assert columnar.position(docname) == site_map.position(docname)
+    assert columnar.content_hash() == site_map.content_hash()
+
+
+def test_columnar_documents():
+    """Test documents are stored as copies, with all their options."""
+    root = Document(
+        "root",
+        [
+            TocTree(
+                [FileItem("a"), GlobItem("a*"), UrlItem("https://example.com", "ex")],
+                caption="Caption",
+                hidden=False,
+                maxdepth=2,
+                numbered=3,
+                reversed=True,
+                titlesonly=True,
+                style=["alphaupper", "romanlower"],
+                restart_numbering=False,
+            ),
+            TocTree([FileItem("b")], numbered=True, restart_numbering=True),
+        ],
+        title="Root",
+    )
+    site_map = ColumnarSiteMap(root, meta={"key": "value"})
+    site_map["a"] = Document("a")
+    assert site_map["root"] == root
+    assert site_map["root"] is not root
+    assert site_map["root"].subtrees[1].numbered is True
+    assert site_map["root"].subtrees[0].numbered == 3
+    assert not hasattr(site_map._docs, "__dict__")
+    # changing a returned document has no effect, until it is set
+    doc = site_map["a"]
+    doc.title = "A"
+    assert site_map["a"].title is None
+    site_map["a"] = doc
+    assert site_map["a"].title == "A"
+    assert list(site_map) == ["root", "a"]
+    assert "b" not in site_map
+    unpickled = pickle.loads(pickle.dumps(site_map))
+    assert unpickled.as_json() == site_map.as_json()
+    assert unpickled.parent("a") == "root"
+
+
+def test_columnar_mutation():
+    """Test setting and deleting documents updates the parents,
+    and the columns are compacted.
+    """
+    site_map = ColumnarSiteMap(
+        Document("root", [TocTree([FileItem("a"), FileItem("b")])])
+    )
+    site_map["a"] = Document("a", [TocTree([FileItem("c")])])
+    site_map["b"] = Document("b", [TocTree([FileItem("c")])])
+    site_map["c"] = Document("c")
+    assert site_map.ancestors("c") == ["a", "root"]
+    del site_map["a"]
+    # c is still listed by b
+    assert site_map.position("c") == ("b", 0, 0)
+    assert list(site_map) == ["root", "b", "c"]
+    with pytest.raises(KeyError):
+        site_map["a"]
+    site_map["a"] = Document("a")
+    assert list(site_map) == ["root", "b", "c", "a"]
+    # replace documents, until the columns are compacted
+    for index in range(3000):
+        site_map["b"] = Document("b", [TocTree([FileItem("c")], caption=str(index))])
+    assert len(site_map._docs._tree_item_start) < 3000
+    assert site_map["b"].subtrees[0].caption == "2999"
+    # c stays indexed by b, when b is set again
+    assert site_map.position("c") == ("b", 0, 0)
+    assert list(site_map) == ["root", "b", "c", "a"]
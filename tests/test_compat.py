@@ -689,3 +689,232 @@ class TestCompatFinal:
             name = "numbers"
 
         validator(None, MockAttr(), [1, 2, 3, 4, 5])
+
+
+class TestCompatYaml:
+    """Test the YAML loader layer."""
+
+    def test_yaml_load_prefers_libyaml(self):
+        """Test the C loader is used when PyYAML was built with libyaml."""
+        import yaml
+
+        if yaml.__with_libyaml__:
+            assert _compat.YamlSafeLoader is yaml.CSafeLoader
+        else:
+            assert _compat.YamlSafeLoader is yaml.SafeLoader
+
+    @pytest.mark.parametrize("loader_name", ["SafeLoader", "CSafeLoader"])
+    def test_yaml_load_matches_safe_load(self, loader_name):
+        """Test all loaders give the same output as ``yaml.safe_load``."""
+        from pathlib import Path
+
+        import yaml
+
+        loader = getattr(yaml, loader_name, None)
+        if loader is None:
+            pytest.skip(f"{loader_name} not available")
+        for path in Path(__file__).parent.glob("_*toc_files/*.yml"):
+            text = path.read_text("utf8")
+            assert _compat.yaml_load(text, loader=loader) == yaml.safe_load(text)
+
+    def test_yaml_load_logs_loader(self, caplog):
+        """Test the loader used is reported in the debug log."""
+        import logging
+
+        with caplog.at_level(logging.DEBUG):
+            _compat.yaml_load("a: 1")
+        assert _compat.YamlSafeLoader.__name__ in caplog.text
+
+
+class TestCompatTrustedConstruction:
+    """Test skipping validation with trusted_construction."""
+
+    def test_validation_skipped(self):
+        """Test invalid values are accepted within the context only."""
+        # the module may have been re-imported by other tests
+        from sphinx_external_toc.api import Document, trusted_construction
+
+        with trusted_construction():
+            assert Document(1).docname == 1
+        with pytest.raises(TypeError, match="'docname' must be"):
+            Document(1)
+
+    def test_reset_on_error(self):
+        """Test the context is reset if an exception is raised."""
+        from sphinx_external_toc.api import Document, trusted_construction
+
+        with pytest.raises(KeyError):
+            with trusted_construction():
+                raise KeyError
+        with pytest.raises(TypeError):
+            Document(1)
+
+    def test_validate_values(self):
+        """Test values are validated with the same errors as construction."""
+        from sphinx_external_toc.api import TocTree
+
+        _compat.validate_values(TocTree, hidden=False, unknown=1)
+        with pytest.raises(TypeError) as direct:
+            _compat.validate_values(TocTree, maxdepth="a")
+        with pytest.raises(TypeError) as constructed:
+            TocTree([], maxdepth="a")
+        assert str(direct.value) == str(constructed.value)
+
+
+class TestCompatCompileValidators:
+    """Test compiling the validators of a dataclass."""
+
+    @pytest.mark.parametrize(
+        "kwargs",
+        [
+            {"items": "a"},
+            {"items": [1]},
+            {"items": [], "caption": 1},
+            {"items": [], "hidden": 1},
+            {"items": [], "numbered": "a"},
+            {"items": [], "style": "other"},
+            {"items": [], "style": ["numerical", "other"]},
+            {"items": [], "restart_numbering": "a"},
+            {"items": [1], "caption": 1},
+        ],
+    )
+    def test_same_errors(self, kwargs):
+        """Test the compiled validators raise the same errors."""
+        from sphinx_external_toc.api import TocTree, trusted_construction
+
+        with pytest.raises((TypeError, ValueError)) as compiled:
+            TocTree(**kwargs)
+        with trusted_construction():
+            tree = TocTree(**kwargs)
+        with pytest.raises(type(compiled.value)) as slow:
+            _compat._validate_fields_slow(tree)
+        assert str(compiled.value) == str(slow.value)
+
+    def test_url_item(self):
+        """Test the regex check of a URL item."""
+        from sphinx_external_toc.api import UrlItem
+
+        UrlItem("https://example.com")
+        with pytest.raises(ValueError, match="must match regex"):
+            UrlItem("example.com")
+
+    def test_nested_and_custom(self):
+        """Test nested iterables and custom validators are compiled."""
+        calls = []
+
+        def custom(inst, attr, value):
+            calls.append(value)
+
+        @_compat.dc.dataclass
+        class Nested:
+            values: list = _compat.field(
+                validator=[
+                    _compat.deep_iterable(
+                        _compat.deep_iterable(
+                            _compat.optional(_compat.instance_of(int))
+                        )
+                    ),
+                    custom,
+                ]
+            )
+
+            def __post_init__(self):
+                _compat.validate_fields(self)
+
+        assert Nested([[1, None], [2]]).values == [[1, None], [2]]
+        assert calls == [[[1, None], [2]]]
+        with pytest.raises(TypeError, match="'values' must be <class 'int'>"):
+            Nested([[1], ["a"]])
+        assert Nested in _compat._COMPILED_VALIDATORS
+
+    def test_single_typed_field(self):
+        """Test a single type check, and an optional custom validator."""
+        calls = []
+
+        def custom(inst, attr, value):
+            calls.append(value)
+
+        @_compat.dc.dataclass
+        class Single:
+            name: str = _compat.field(validator=_compat.instance_of(str))
+            extra: object = _compat.field(
+                default=None, validator=_compat.optional(custom)
+            )
+
+            def __post_init__(self):
+                _compat.validate_fields(self)
+
+        Single("a")
+        Single("a", 1)
+        assert calls == [1]
+        with pytest.raises(TypeError, match="'name' must be <class 'str'>"):
+            Single(1)
+
+    @pytest.mark.parametrize("dumper_name", ["SafeDumper", "CSafeDumper"])
+    def test_yaml_dump_matches_dump(self, dumper_name):
+        """Test all dumpers give the same output as ``yaml.dump``."""
+        from pathlib import Path
+
+        import yaml
+
+        from sphinx_external_toc.parsing import create_toc_dict, parse_toc_yaml
+
+        dumper = getattr(yaml, dumper_name, None)
+        if dumper is None:
+            pytest.skip(f"{dumper_name} not available")
+        for path in Path(__file__).parent.glob("_toc_files/*.yml"):
+            site_map = parse_toc_yaml(path)
+            for data in (site_map.as_json(), create_toc_dict(site_map)):
+                expected = yaml.dump(data, sort_keys=False, default_flow_style=False)
+                assert _compat.yaml_dump(data, dumper=dumper) == expected
+
+    @pytest.mark.parametrize("dumper_name", ["SafeDumper", "CSafeDumper"])
+    @pytest.mark.parametrize(
+        "title",
+        ["Ünïcödé: " + "wörd " * 40, "Tab\t" + "word " * 40, "Plain: " + "word " * 40],
+    )
+    def test_yaml_dump_long_escaped(self, dumper_name, title):
+        """Test long double-quoted scalars are dumped the same as ``yaml.dump``."""
+        import yaml
+
+        dumper = getattr(yaml, dumper_name, None)
+        if dumper is None:
+            pytest.skip(f"{dumper_name} not available")
+        data = {"file": "doc", "title": title, "entries": [{"file": title}]}
+        expected = yaml.dump(data, sort_keys=False, default_flow_style=False)
+        assert _compat.yaml_dump(data, dumper=dumper) == expected
+
+    def test_yaml_dump_stream(self):
+        """Test dumping to a stream, and str subclasses as plain strings."""
+        import io
+
+        from sphinx_external_toc.api import FileItem
+
+        stream = io.StringIO()
+        assert _compat.yaml_dump({"file": FileItem("doc")}, stream) is None
+        assert stream.getvalue() == "file: doc\n"
+
+    @pytest.mark.parametrize("frozen", [False, True])
+    def test_add_slots(self, frozen):
+        """Test adding slots to a dataclass, as before Python 3.10."""
+        import dataclasses
+        import pickle
+
+        @dataclasses.dataclass(frozen=frozen)
+        class Data:
+            name: str
+            items: list = dataclasses.field(default_factory=list)
+            title: str = "title"
+
+        globals()["Data"] = Data = _compat.add_slots(Data)
+        Data.__qualname__ = "Data"
+        try:
+            assert Data.__slots__ == ("name", "items", "title")
+            obj = Data("name")
+            assert not hasattr(obj, "__dict__")
+            assert (obj.name, obj.items, obj.title) == ("name", [], "title")
+            assert obj == Data("name", [], "title")
+            assert pickle.loads(pickle.dumps(obj)) == obj
+            assert _compat.add_slots(Data) is Data
+        finally:
+            del globals()["Data"]
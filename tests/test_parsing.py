@@ -1,10 +1,20 @@
+import json
 from pathlib import Path
+import re
+import sys
 
 import pytest
+import yaml
 
+from sphinx_external_toc import _compat
+from sphinx_external_toc.api import FileItem, TocTree
 from sphinx_external_toc.parsing import (
     MalformedError,
     create_toc_dict,
+    parse_toc_data,
+    parse_toc_data_with_errors,
+    parse_toc_file,
+    parse_toc_file_with_errors,
     parse_toc_yaml,
 )
 
@@ -57,3 +67,287 @@ def test_malformed_file_parse(path: Path):
     message = ERROR_MESSAGES[path.name]
     with pytest.raises(MalformedError, match=message):
         parse_toc_yaml(path)
+
+
+@pytest.mark.parametrize(
+    "path",
+    TOC_FILES_BAD,
+    ids=[path.name.rsplit(".", 1)[0] for path in TOC_FILES_BAD],
+)
+def test_malformed_file_parse_with_errors(path: Path):
+    message = ERROR_MESSAGES[path.name]
+    _, errors = parse_toc_file_with_errors(path)
+    assert len(errors) == 1
+    assert re.search(message, str(errors[0]))
+    assert f"@ '{errors[0].path}'" in str(errors[0]) or errors[0].path == "/"
+
+
+def test_parse_with_errors():
+    data = {
+        "root": "intro",
+        "unknown": 1,
+        "subtrees": [
+            {
+                "entries": [
+                    {"file": "doc1", "entries": [{"file": "doc1a"}, {"other": 1}]},
+                    {"url": "example.com"},
+                    {"file": "doc2", "title": 1, "entries": [{"file": "doc2a"}]},
+                    {"file": "intro"},
+                    {"file": "doc3"},
+                ]
+            },
+            {"entries": [{"file": "doc4"}], "titlesonly": "a"},
+            {"caption": "no entries"},
+        ],
+    }
+    site_map, errors = parse_toc_data_with_errors(data)
+    assert [(error.path, str(error).split(" @ ")[0]) for error in errors] == [
+        ("/", str(errors[0]).split(" @ ")[0]),
+        ("/subtrees/0/entries/1", "entry validation"),
+        ("/subtrees/1/", "toctree validation"),
+        ("/subtrees/2/", "entry not a mapping containing 'entries' key"),
+        ("/subtrees/0/entries/0/entries/1", str(errors[4]).split(" @ ")[0]),
+        ("/subtrees/0/entries/2/", "doc validation"),
+        ("/subtrees/0/entries/3/", "document file used multiple times: 'intro'"),
+    ]
+    assert str(errors[0]).startswith("Unknown keys found: {'unknown'}")
+    assert str(errors[4]).startswith("entry does not contain one of")
+    assert list(site_map) == ["intro", "doc1", "doc1a", "doc3"]
+    assert site_map["intro"].child_files() == ["doc1", "doc2", "intro", "doc3"]
+    assert site_map["doc1"].child_files() == ["doc1a"]
+
+
+def test_parse_deep_toc():
+    """Test ToC depth is not limited by the recursion limit."""
+    depth = sys.getrecursionlimit() * 2
+    data = {"root": "index"}
+    parent = data
+    for level in range(1, depth):
+        child = {"file": f"level{level}"}
+        parent["entries"] = [child]
+        parent = child
+    site_map = parse_toc_data(data)
+    assert len(site_map) == depth
+    assert site_map[f"level{depth - 1}"].subtrees == []
+    assert site_map["level1"].child_files() == ["level2"]
+    toc_data = create_toc_dict(site_map)
+    for level in range(1, depth):
+        toc_data = toc_data["entries"]
+        assert len(toc_data) == 1
+        toc_data = toc_data[0]
+        assert toc_data["file"] == f"level{level}"
+    assert toc_data == {"file": f"level{depth - 1}"}
+
+
+def test_create_toc_dict_errors():
+    """Test documents in the site-map multiple times, and invalid items."""
+    site_map = parse_toc_data(
+        {"root": "index", "entries": [{"file": "a", "entries": [{"file": "b"}]}]}
+    )
+    site_map["b"].subtrees[:] = [TocTree([FileItem("a")])]
+    with pytest.raises(RecursionError, match="'a' in site-map multiple times"):
+        create_toc_dict(site_map)
+    site_map["b"].subtrees[0].items[0] = 1
+    with pytest.raises(TypeError):
+        create_toc_dict(site_map)
+
+
+def test_create_toc_dict_defaults():
+    site_map = parse_toc_data(
+        {"root": "index", "entries": [{"file": "a"}], "options": {"maxdepth": 1}}
+    )
+    assert create_toc_dict(site_map)["options"] == {"maxdepth": 1}
+    assert create_toc_dict(site_map, skip_defaults=False)["options"] == {
+        "caption": None,
+        "hidden": True,
+        "maxdepth": 1,
+        "numbered": False,
+        "reversed": False,
+        "titlesonly": False,
+        "style": "numerical",
+        "restart_numbering": None,
+    }
+
+
+def test_parse_order_and_duplicates():
+    """Test documents are added in ToC order, and duplicates are reported."""
+    data = {
+        "root": "index",
+        "entries": [
+            {"file": "a", "entries": [{"file": "a1"}, {"file": "a2"}]},
+            {"file": "b", "entries": [{"file": "b1"}]},
+        ],
+    }
+    assert list(parse_toc_data(data)) == ["index", "a", "a1", "a2", "b", "b1"]
+    data["entries"][1]["entries"].append({"file": "a1"})
+    with pytest.raises(MalformedError, match="document file used multiple times: 'a1'"):
+        parse_toc_data(data)
+
+
+def _write_files(root: Path, files: dict) -> None:
+    for name, content in files.items():
+        root.joinpath(name).parent.mkdir(parents=True, exist_ok=True)
+        root.joinpath(name).write_text(content, encoding="utf8")
+
+
+INCLUDE_FILES = {
+    "_toc.yml": """
+format: jb-book
+root: intro
+parts:
+- caption: Part
+  chapters:
+  - file: chapter1
+  - include: api/_toc.yml
+  - file: chapter3
+""",
+    "api/_toc.yml": """
+file: api/index
+sections:
+- file: api/module1
+- include: more.yml
+""",
+    "api/more.yml": """
+- file: api/module2
+- file: api/module3
+""",
+}
+
+
+def test_include(tmp_path: Path):
+    _write_files(tmp_path, INCLUDE_FILES)
+    site_map = parse_toc_yaml(tmp_path / "_toc.yml", max_workers=1)
+    assert site_map["intro"].child_files() == ["chapter1", "api/index", "chapter3"]
+    assert site_map["api/index"].child_files() == [
+        "api/module1",
+        "api/module2",
+        "api/module3",
+    ]
+    # jb-book defaults apply to the included documents
+    assert site_map["api/index"].subtrees[0].titlesonly is True
+    assert list(site_map.fragments) == [
+        str((tmp_path / "api" / "_toc.yml").resolve()),
+        str((tmp_path / "api" / "more.yml").resolve()),
+    ]
+    # same as if the fragments were written inline
+    inline = {
+        "format": "jb-book",
+        "root": "intro",
+        "parts": [
+            {
+                "caption": "Part",
+                "chapters": [
+                    {"file": "chapter1"},
+                    {
+                        "file": "api/index",
+                        "sections": [{"file": f"api/module{i}"} for i in range(1, 4)],
+                    },
+                    {"file": "chapter3"},
+                ],
+            }
+        ],
+    }
+    assert site_map.as_json() == parse_toc_data(inline).as_json()
+
+
+def test_include_get_changed(tmp_path: Path):
+    _write_files(tmp_path, INCLUDE_FILES)
+    previous = parse_toc_yaml(tmp_path / "_toc.yml")
+    _write_files(
+        tmp_path,
+        {"api/more.yml": "- file: api/module2\n  title: New\n- file: api/module3\n"},
+    )
+    site_map = parse_toc_yaml(tmp_path / "_toc.yml")
+    keys = {path: key for path, (_, key) in site_map.fragments.items()}
+    previous_keys = {path: key for path, (_, key) in previous.fragments.items()}
+    # the structural key of the including fragment also changes
+    assert all(keys[path] != previous_keys[path] for path in keys)
+    assert site_map.get_changed(previous) == {"api/module2"}
+
+
+@pytest.mark.parametrize(
+    "files,message",
+    [
+        ({"_toc.yml": "root: intro\nentries:\n- include: missing.yml\n"}, "not found"),
+        ({"_toc.yml": "root: intro\nentries:\n- include: 1\n"}, "not a string"),
+        (
+            {
+                "_toc.yml": "root: intro\nentries:\n- include: a.yml\n",
+                "a.yml": "file: a\nentries:\n- include: a.yml\n",
+            },
+            "cycle",
+        ),
+        (
+            {"_toc.yml": "root: intro\nentries:\n- include: a.yml\n", "a.yml": "a"},
+            "not a mapping or list",
+        ),
+        (
+            {
+                "_toc.yml": "root: intro\nentries:\n- include: a.yml\n- include: a.yml\n",
+                "a.yml": "file: a\n",
+            },
+            "used multiple times",
+        ),
+    ],
+    ids=["missing", "not_string", "cycle", "not_mapping", "duplicate"],
+)
+def test_include_malformed(tmp_path: Path, files: dict, message: str):
+    _write_files(tmp_path, files)
+    with pytest.raises(MalformedError, match=message):
+        parse_toc_yaml(tmp_path / "_toc.yml")
+
+
+def test_toctree_options_validated_once():
+    valid = {"root": "index", "entries": [{"file": "a"}], "options": {"hidden": True}}
+    invalid = {"root": "index", "entries": [{"file": "a"}], "options": {"hidden": 1}}
+    parse_toc_data(valid)
+    # 1 == True, but is not valid
+    with pytest.raises(MalformedError, match="'hidden' must be"):
+        parse_toc_data(invalid)
+    with pytest.raises(MalformedError, match="'hidden' must be"):
+        parse_toc_data(invalid)
+
+
+@pytest.mark.parametrize(
+    "path", TOC_FILES, ids=[path.name.rsplit(".", 1)[0] for path in TOC_FILES]
+)
+def test_parse_toc_file_json(path: Path, tmp_path: Path):
+    data = yaml.safe_load(path.read_text("utf8"))
+    try:
+        content = json.dumps(data)
+    except TypeError:
+        pytest.skip("not JSON serializable")
+    json_path = tmp_path / "_toc.json"
+    json_path.write_text(content, encoding="utf8")
+    assert parse_toc_file(json_path).as_json() == parse_toc_yaml(path).as_json()
+
+
+def test_parse_toc_file_json_without_orjson(tmp_path: Path, monkeypatch):
+    monkeypatch.setattr(_compat, "orjson", None)
+    json_path = tmp_path / "_toc.json"
+    json_path.write_text('{"root": "intro", "entries": [{"file": "a"}]}')
+    assert parse_toc_file(json_path)["intro"].child_files() == ["a"]
+
+
+def test_parse_toc_file_toml(tmp_path: Path):
+    toml_path = tmp_path / "_toc.toml"
+    toml_path.write_text(
+        """
+format = "jb-book"
+root = "intro"
+
+[[parts]]
+caption = "Part"
+
+[[parts.chapters]]
+file = "chapter1"
+
+[[parts.chapters]]
+include = "more.yml"
+""",
+        encoding="utf8",
+    )
+    tmp_path.joinpath("more.yml").write_text("- file: chapter2\n", encoding="utf8")
+    site_map = parse_toc_file(toml_path)
+    assert site_map["intro"].child_files() == ["chapter1", "chapter2"]
+    assert site_map["intro"].subtrees[0].caption == "Part"
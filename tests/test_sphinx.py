@@ -174,3 +174,44 @@ external_toc_path = {Path(os.path.abspath(toc_path)).as_posix()!r}
     # run sphinx
     builder = sphinx_build_factory(src_dir)
     builder.build()
+    # the index.html redirect is to the root docname, without its suffix
+    assert 'url=intro.html"' in builder.outdir.joinpath("index.html").read_text(
+        encoding="utf8"
+    )
+
+
+@pytest.mark.parametrize("use_cache", [True, False])
+def test_cache(tmp_path: Path, sphinx_build_factory, use_cache: bool):
+    """Test the parsed ToC is cached in the doctree directory."""
+    src_dir = tmp_path / "srcdir"
+    toc_path = Path(__file__).parent.joinpath("_toc_files", "basic.yml")
+    create_site_from_toc(toc_path, root_path=src_dir)
+    src_dir.joinpath("conf.py").write_text(
+        CONF_CONTENT + f"external_toc_cache = {use_cache}\n", encoding="utf8"
+    )
+    builder = sphinx_build_factory(src_dir)
+    builder.build()
+    cache_dir = Path(builder.app.doctreedir) / "external_toc"
+    assert bool(list(cache_dir.glob("*.pickle"))) is use_cache
+
+
+@pytest.mark.parametrize("suffix", [".json", ".toml"])
+def test_json_and_toml(tmp_path: Path, sphinx_build_factory, suffix: str):
+    """Test `external_toc_path` can be a JSON or TOML file."""
+    src_dir = tmp_path / "srcdir"
+    toc_path = Path(__file__).parent.joinpath("_toc_files", "basic.yml")
+    create_site_from_toc(toc_path, root_path=src_dir, toc_name=None)
+    if suffix == ".json":
+        content = '{"root": "intro", "entries": [{"file": "doc1"}]}'
+    else:
+        content = 'root = "intro"\n\n[[entries]]\nfile = "doc1"\n'
+    src_dir.joinpath(f"_toc{suffix}").write_text(content, encoding="utf8")
+    src_dir.joinpath("conf.py").write_text(
+        CONF_CONTENT.replace("_toc.yml", f"_toc{suffix}")
+        + "external_toc_exclude_missing = True\n",
+        encoding="utf8",
+    )
+    builder = sphinx_build_factory(src_dir)
+    builder.build()
+    assert builder.app.env.external_site_map["intro"].child_files() == ["doc1"]
+    assert builder.app.config.external_site_map is builder.app.env.external_site_map
@@ -0,0 +1,170 @@
+from functools import partial
+import os
+from pathlib import Path
+import pickle
+
+import pytest
+
+from sphinx_external_toc.api import Document, FileItem, GlobItem, TocTree, UrlItem
+from sphinx_external_toc.parsing import create_toc_dict, parse_toc_yaml
+from sphinx_external_toc.sqlite import SqliteSiteMap
+
+TOC_FILES = list(Path(__file__).parent.joinpath("_toc_files").glob("*.yml"))
+
+
+@pytest.mark.parametrize(
+    "path", TOC_FILES, ids=[path.name.rsplit(".", 1)[0] for path in TOC_FILES]
+)
+def test_parse_sqlite(path: Path, tmp_path: Path):
+    """Test parsing to a SQLite site-map gives the same documents."""
+    site_map = parse_toc_yaml(path)
+    stored = parse_toc_yaml(
+        path, site_map_class=partial(SqliteSiteMap, path=tmp_path / "toc.db")
+    )
+    assert isinstance(stored, SqliteSiteMap)
+    assert stored.as_json() == site_map.as_json()
+    assert create_toc_dict(stored) == create_toc_dict(site_map)
+    assert stored.to_site_map().as_json() == site_map.as_json()
+    for docname in site_map:
+        assert stored[docname] == site_map[docname]
+        assert stored.position(docname) == site_map.position(docname)
+    assert stored.content_hash() == site_map.content_hash()
+    opened = SqliteSiteMap.open(tmp_path / "toc.db")
+    assert opened.as_json() == site_map.as_json()
+    assert opened.root == site_map.root
+
+
+def test_sqlite_documents():
+    """Test documents are stored as copies, with all their options."""
+    root = Document(
+        "root",
+        [
+            TocTree(
+                [FileItem("a"), GlobItem("a*"), UrlItem("https://example.com", "ex")],
+                caption="Caption",
+                hidden=False,
+                maxdepth=2,
+                numbered=3,
+                reversed=True,
+                titlesonly=True,
+                style=["alphaupper", "romanlower"],
+                restart_numbering=False,
+            ),
+            TocTree([FileItem("b")], numbered=True, restart_numbering=True),
+        ],
+        title="Root",
+    )
+    site_map = SqliteSiteMap(root, meta={"key": "value"})
+    site_map["a"] = Document("a")
+    assert site_map["root"] == root
+    assert site_map["root"] is not root
+    assert site_map["root"].subtrees[1].numbered is True
+    assert site_map["root"].subtrees[0].numbered == 3
+    # changing a returned document has no effect, until it is set
+    doc = site_map["a"]
+    doc.title = "A"
+    assert site_map["a"].title is None
+    site_map["a"] = doc
+    assert site_map["a"].title == "A"
+    assert list(site_map) == ["root", "a"]
+    assert "b" not in site_map
+    unpickled = pickle.loads(pickle.dumps(site_map))
+    assert unpickled.as_json() == site_map.as_json()
+    assert unpickled.parent("a") == "root"
+
+
+def test_sqlite_mutation(tmp_path: Path):
+    """Test setting and deleting documents updates the parents,
+    a failed bulk update is rolled back, and documents are cached.
+    """
+    site_map = SqliteSiteMap(
+        Document("root", [TocTree([FileItem("a"), FileItem("b")])]),
+        path=tmp_path / "toc.db",
+        cache_size=2,
+    )
+    site_map["a"] = Document("a", [TocTree([FileItem("c")])])
+    site_map["b"] = Document("b", [TocTree([FileItem("c")])])
+    site_map["c"] = Document("c")
+    assert site_map.ancestors("c") == ["a", "root"]
+    del site_map["a"]
+    # c is still listed by b
+    assert site_map.position("c") == ("b", 0, 0)
+    assert list(site_map) == ["root", "b", "c"]
+    with pytest.raises(KeyError):
+        site_map["a"]
+    site_map["a"] = Document("a")
+    assert list(site_map) == ["root", "b", "c", "a"]
+    # c stays indexed by b, when b is set again
+    site_map["b"] = Document("b", [TocTree([FileItem("c")], caption="B")])
+    assert site_map.position("c") == ("b", 0, 0)
+    # only the most recently used documents are cached
+    for docname in ["root", "a", "b", "c"]:
+        site_map[docname]
+    assert list(site_map._docs._cache) == ["b", "c"]
+    # a failed bulk update is rolled back, with the indexes and journal
+    assert site_map.query(prefix="") == {"root", "a", "b", "c"}
+    hash_before = site_map.content_hash()
+    with pytest.raises(RuntimeError):
+        with site_map.bulk_update():
+            site_map.insert_child("b", "d")
+            site_map.set_title("c", "C")
+            assert site_map.query(prefix="d") == {"d"}
+            raise RuntimeError
+    assert "d" not in site_map
+    assert site_map["c"].title is None
+    assert site_map.query(prefix="") == {"root", "a", "b", "c"}
+    assert "d" not in site_map._parent_index()
+    assert site_map.content_hash() == hash_before
+    assert site_map.journal == []
+    # pickled as the path to the database file
+    assert len(pickle.dumps(site_map)) < 1000
+    unpickled = pickle.loads(pickle.dumps(site_map))
+    assert unpickled["b"].subtrees[0].caption == "B"
+    assert unpickled.position("c") == ("b", 0, 0)
+
+
+def test_sqlite_overwrite(tmp_path: Path):
+    """Test a database holding a site-map is only overwritten if requested."""
+    path = tmp_path / "toc.db"
+    site_map = SqliteSiteMap(Document("root", [TocTree([FileItem("a")])]), path=path)
+    site_map["a"] = Document("a")
+    with pytest.raises(FileExistsError):
+        SqliteSiteMap(Document("other"), path=path)
+    assert SqliteSiteMap.open(path).as_json() == site_map.as_json()
+    SqliteSiteMap(Document("other"), path=path, overwrite=True)
+    assert list(SqliteSiteMap.open(path)) == ["other"]
+
+
+def _in_fork(func) -> str:
+    """Call a function in a forked process, returning its result or error."""
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        try:
+            result = repr(func())
+        except Exception as exc:
+            result = type(exc).__name__
+        os.write(write_fd, result.encode("utf8"))
+        os._exit(0)
+    os.close(write_fd)
+    os.waitpid(pid, 0)
+    with os.fdopen(read_fd, "rb") as handle:
+        return handle.read().decode("utf8")
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_sqlite_fork(tmp_path: Path):
+    """Test a forked process opens its own connection to the database."""
+    site_map = SqliteSiteMap(
+        Document("root", [TocTree([FileItem("a")])]), path=tmp_path / "toc.db"
+    )
+    site_map["a"] = Document("a", title="A")
+    connection = site_map._docs.connection
+    with site_map.bulk_update():
+        assert _in_fork(lambda: site_map._docs.connection is connection) == "False"
+        assert _in_fork(lambda: site_map["a"].title) == "'A'"
+    # the parent's connection is unaffected
+    assert site_map._docs.connection is connection
+    assert site_map["a"].title == "A"
+    in_memory = SqliteSiteMap(Document("root"))
+    assert _in_fork(lambda: len(in_memory)) == "RuntimeError"
@@ -0,0 +1,170 @@
+from pathlib import Path
+import sys
+
+import pytest
+
+from sphinx_external_toc.parsing import MalformedError, parse_toc_yaml
+from sphinx_external_toc.streaming import (
+    StreamingUnsupported,
+    iter_toc_documents,
+    parse_toc_stream,
+)
+
+TOC_FILES = [
+    *Path(__file__).parent.joinpath("_toc_files").glob("*.yml"),
+    *Path(__file__).parent.joinpath("_jb_migrate_toc_files").glob("*.yml"),
+]
+TOC_FILES_BAD = list(Path(__file__).parent.joinpath("_bad_toc_files").glob("*.yml"))
+
+
+@pytest.mark.parametrize(
+    "path", TOC_FILES, ids=[path.name.rsplit(".", 1)[0] for path in TOC_FILES]
+)
+def test_same_as_parse_toc_yaml(path: Path):
+    try:
+        expected = parse_toc_yaml(path)
+    except MalformedError as exc:
+        with pytest.raises(MalformedError) as exc_info:
+            parse_toc_stream(path)
+        assert str(exc_info.value) == str(exc)
+    else:
+        site_map = parse_toc_stream(path)
+        assert site_map.as_json() == expected.as_json()
+        assert list(site_map) == list(expected)
+
+
+@pytest.mark.parametrize(
+    "path", TOC_FILES_BAD, ids=[path.name.rsplit(".", 1)[0] for path in TOC_FILES_BAD]
+)
+def test_malformed_same_as_parse_toc_yaml(path: Path):
+    with pytest.raises(MalformedError) as expected:
+        parse_toc_yaml(path)
+    with pytest.raises(MalformedError) as exc_info:
+        parse_toc_stream(path)
+    assert str(exc_info.value) == str(expected.value)
+
+
+def test_iter_documents_order():
+    content = """
+root: index
+entries:
+- file: a
+  entries:
+  - file: a1
+- file: b
+"""
+    assert [doc.docname for doc in iter_toc_documents(content)] == [
+        "a1",
+        "a",
+        "b",
+        "index",
+    ]
+
+
+def test_parse_deep_toc(tmp_path: Path):
+    """Test ToC depth is not limited by the recursion limit."""
+    depth = sys.getrecursionlimit() * 2
+    content = (
+        "root: index\nentries: "
+        + "".join(f"[{{file: level{level}, entries: " for level in range(1, depth - 1))
+        + f"[{{file: level{depth - 1}}}]"
+        + "}]" * (depth - 2)
+    )
+    path = tmp_path / "_toc.yml"
+    path.write_text(content)
+    site_map = parse_toc_stream(path)
+    assert len(site_map) == depth
+    assert site_map["level1"].child_files() == ["level2"]
+    assert site_map.as_json() == parse_toc_yaml(path).as_json()
+
+
+def test_iter_documents_lazy():
+    """Test documents are yielded before the rest of the file is read."""
+    content = "root: index\nentries:\n- file: a\n- file: b\n- [invalid\n"
+    documents = iter_toc_documents(content)
+    assert next(documents).docname == "a"
+    assert next(documents).docname == "b"
+
+
+def test_duplicate_root():
+    with pytest.raises(MalformedError, match="used multiple times: 'index'"):
+        list(iter_toc_documents("root: index\nentries:\n- file: index\n"))
+
+
+def test_scalar_types_and_aliases(tmp_path: Path):
+    content = """
+root: index
+defaults:
+  numbered: &num 2
+subtrees:
+- caption: &cap Caption
+  titlesonly: yes
+  entries:
+  - file: a
+    title: *cap
+- numbered: *num
+  entries:
+  - url: https://example.com
+meta:
+  date: 2021-01-01
+"""
+    path = tmp_path / "_toc.yml"
+    path.write_text(content, encoding="utf8")
+    site_map = parse_toc_stream(path)
+    assert site_map.as_json() == parse_toc_yaml(path).as_json()
+    assert site_map["index"].subtrees[0].numbered == 2
+    assert site_map["index"].subtrees[0].titlesonly is True
+    assert site_map["a"].title == "Caption"
+    assert str(site_map.meta["date"]) == "2021-01-01"
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        "root: index\nentries:\n- file: a\nformat: jb-book\n",
+        "root: index\nentries:\n- file: a\ndefaults:\n  titlesonly: true\n",
+        "root: index\nentries:\n- &doc\n  file: a\n- *doc\n",
+        "root: index\nentries:\n- <<: {file: a}\n",
+        "root: index\nmeta: !!set {a}\n",
+        "root: index\nentries:\n- include: missing.yml\n",
+    ],
+)
+def test_unsupported_fallback(content: str, tmp_path: Path):
+    with pytest.raises(StreamingUnsupported):
+        list(iter_toc_documents(content))
+    path = tmp_path / "_toc.yml"
+    path.write_text(content, encoding="utf8")
+    try:
+        expected = parse_toc_yaml(path).as_json()
+    except MalformedError as exc:
+        with pytest.raises(MalformedError, match=str(exc)):
+            parse_toc_stream(path)
+    else:
+        assert parse_toc_stream(path).as_json() == expected
+
+
+@pytest.mark.parametrize(
+    "content",
+    [
+        # an unknown root key, and an unknown key in a child
+        "root: index\nbad: 1\nentries:\n- file: a\n  foo: 1\n",
+        # a bad toctree option, and a bad child title
+        "root: index\nsubtrees:\n- maxdepth: a\n  entries:\n  - file: a\n    title: 1\n",
+        # a duplicate document, nested below its first use
+        "root: index\nentries:\n- file: a\n- file: b\n  entries:\n  - file: a\n",
+        "root: index\nentries:\n- file: a\n  entries:\n  - file: a\n",
+        "root: index\nentries:\n- file: a\n  entries:\n  - url: x\n- file: a\n",
+        "root: index\nentries:\n- [a]\n",
+        "root: index\nentries: [{file: a, entries: [{file: b, foo: 1}]}, {foo: 1}]\n",
+    ],
+)
+def test_first_error_same_as_parse_toc_yaml(content: str, tmp_path: Path):
+    """Test the first error of a file with several errors is the same."""
+    path = tmp_path / "_toc.yml"
+    path.write_text(content, encoding="utf8")
+    with pytest.raises(MalformedError) as expected:
+        parse_toc_yaml(path)
+    with pytest.raises(MalformedError) as exc_info:
+        parse_toc_stream(path)
+    assert str(exc_info.value) == str(expected.value)
+    assert exc_info.value.path == expected.value.path